@@ -5,7 +5,7 @@
 详细调试爬虫程序的问题
 """
 
-import requests
+from douban_transport import get_transport
 from bs4 import BeautifulSoup
 import time
 
@@ -23,7 +23,7 @@ def debug_crawler_issue():
     
     try:
         print(f"正在请求: {url}")
-        response = requests.get(url, headers=headers, timeout=15)
+        response = get_transport().get(url, headers=headers, timeout=15)
         response.raise_for_status()
         
         print(f"响应状态码: {response.status_code}")
@@ -107,7 +107,7 @@ def test_simple_parsing():
     }
     
     try:
-        response = requests.get('https://movie.douban.com/top250', headers=headers, timeout=15)
+        response = get_transport().get('https://movie.douban.com/top250', headers=headers, timeout=15)
         response.raise_for_status()
         
         soup = BeautifulSoup(response.text, 'html.parser')
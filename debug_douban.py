@@ -5,7 +5,7 @@
 用于查看豆瓣页面的实际HTML结构
 """
 
-import requests
+from douban_transport import get_transport
 from bs4 import BeautifulSoup
 import json
 
@@ -20,7 +20,7 @@ def debug_movie_list():
     }
     
     try:
-        response = requests.get('https://movie.douban.com/top250', headers=headers, timeout=10)
+        response = get_transport().get('https://movie.douban.com/top250', headers=headers, timeout=10)
         response.raise_for_status()
         
         soup = BeautifulSoup(response.text, 'html.parser')
@@ -84,7 +84,7 @@ def debug_movie_detail():
     test_url = 'https://movie.douban.com/subject/1292052/'
     
     try:
-        response = requests.get(test_url, headers=headers, timeout=15)
+        response = get_transport().get(test_url, headers=headers, timeout=15)
         response.raise_for_status()
         
         soup = BeautifulSoup(response.text, 'html.parser')
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+布隆过滤器
+放在已爬取集合前面做快速预判：过滤器说"不存在"时一定没有爬取过，不必再查精确集合；
+说"存在"时才去精确集合确认。误判率可配置，整个过滤器以二进制文件保存。
+"""
+
+import hashlib
+import math
+import os
+import struct
+
+MAGIC = b'DBLM'
+# 魔数、版本、位数、哈希函数个数、已加入元素数、误判率
+HEADER = struct.Struct('<4sIQIQd')
+
+
+class BloomFilter:
+    """使用双重哈希的布隆过滤器"""
+
+    def __init__(self, capacity=10000000, error_rate=0.001):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        # m = -n·ln(p) / (ln2)²，k = m/n·ln2
+        self.num_bits = max(8, int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))))
+        self.num_hashes = max(1, int(round(self.num_bits / capacity * math.log(2))))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        # 已加入的元素数，由调用方保证不重复加入
+        self.count = 0
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(str(value).encode('utf-8'), digest_size=16).digest()
+        h1, h2 = struct.unpack('<QQ', digest)
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, value):
+        """加入一个元素；返回False表示该元素可能已经存在"""
+        added = False
+        for position in self._positions(value):
+            mask = 1 << (position & 7)
+            if not self.bits[position >> 3] & mask:
+                self.bits[position >> 3] |= mask
+                added = True
+        self.count += 1
+        return added
+
+    def __contains__(self, value):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+    def __len__(self):
+        return self.count
+
+    def save(self, path):
+        """保存为二进制文件（先写临时文件再替换）"""
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, 1, self.num_bits, self.num_hashes, self.count, self.error_rate))
+            f.write(self.bits)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """从二进制文件加载，文件格式不对时抛出ValueError"""
+        with open(path, 'rb') as f:
+            header = f.read(HEADER.size)
+            bits = bytearray(f.read())
+
+        if len(header) < HEADER.size:
+            raise ValueError(f"布隆过滤器文件不完整: {path}")
+        magic, version, num_bits, num_hashes, count, error_rate = HEADER.unpack(header)
+        if magic != MAGIC or version != 1 or len(bits) != (num_bits + 7) // 8:
+            raise ValueError(f"布隆过滤器文件格式错误: {path}")
+
+        bloom = cls.__new__(cls)
+        bloom.num_bits = num_bits
+        bloom.num_hashes = num_hashes
+        bloom.error_rate = error_rate
+        bloom.capacity = int(round(-num_bits * (math.log(2) ** 2) / math.log(error_rate)))
+        bloom.bits = bits
+        bloom.count = count
+        return bloom
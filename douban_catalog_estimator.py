@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+标记重捕法估计可爬取的电影总数和剩余产出
+每个标签（以及Top250）的列表页看作一次独立的"捕获"，同一部电影在多个标签中出现即为"重捕"：
+- Lincoln–Petersen / Chapman：两个来源之间的重叠估计总数，汇总时取"每个标签 vs 其余标签"的中位数
+- Chao2：按出现在1个、2个来源中的电影数（f1、f2）估计还没见过的电影数
+同时按最近的列表页统计每1000个请求发现的新电影数，低于阈值时可以停止翻页或把请求配额分给其他来源。
+标签列表按热度排序而不是随机抽样，估计值偏向"这些标签能覆盖到的电影"，应作为下限参考。
+"""
+
+import statistics
+from collections import Counter, deque
+
+
+class CatalogEstimator:
+    """根据各来源列表页的重叠估计电影总数"""
+
+    def __init__(self, window=100, source_window=5):
+        # 每部电影出现过的来源，按位记录
+        self._incidence = {}
+        self._source_index = {}
+        # 出现在k个来源中的电影数
+        self._frequency = Counter()
+        self.samples = 0
+        self.requests = 0
+        self.new_subjects = 0
+        # 最近window个列表页的 (请求数, 新电影数)
+        self._recent = deque(maxlen=window)
+        # 每个来源最近几页的新电影数
+        self._source_recent = {}
+        self._source_pages = Counter()
+        self.source_window = source_window
+
+    def _source_bit(self, source):
+        index = self._source_index.get(source)
+        if index is None:
+            index = self._source_index[source] = len(self._source_index)
+            self._source_recent[source] = deque(maxlen=self.source_window)
+        return 1 << index
+
+    def observe(self, source, subject_ids, new=None, requests=1):
+        """记录一个列表页：来源、页中的条目ID、新电影数（默认为第一次见到的数量）、花费的请求数"""
+        bit = self._source_bit(source)
+        first_seen = 0
+        for subject_id in subject_ids:
+            mask = self._incidence.get(subject_id, 0)
+            if mask & bit:
+                continue
+            if mask:
+                count = bin(mask).count('1')
+                self._frequency[count] -= 1
+                self._frequency[count + 1] += 1
+            else:
+                first_seen += 1
+                self._frequency[1] += 1
+            self._incidence[subject_id] = mask | bit
+
+        new = first_seen if new is None else new
+        self.samples += 1
+        self.requests += requests
+        self.new_subjects += new
+        self._recent.append((requests, new))
+        self._source_recent[source].append(new)
+        self._source_pages[source] += 1
+
+    @property
+    def observed(self):
+        """已经见到的不同电影数"""
+        return len(self._incidence)
+
+    def _source_counts(self):
+        """一次遍历统计每个来源的电影数，以及其中也出现在其他来源的数量"""
+        sizes = Counter()
+        shared = Counter()
+        for mask in self._incidence.values():
+            index = 0
+            while mask >> index:
+                if mask >> index & 1:
+                    sizes[index] += 1
+                    if mask != 1 << index:
+                        shared[index] += 1
+                index += 1
+        return sizes, shared
+
+    def _pair_counts(self, a, b):
+        bit_a, bit_b = 1 << self._source_index[a], 1 << self._source_index[b]
+        n_a = n_b = overlap = 0
+        for mask in self._incidence.values():
+            in_a, in_b = bool(mask & bit_a), bool(mask & bit_b)
+            n_a += in_a
+            n_b += in_b
+            overlap += in_a and in_b
+        return n_a, n_b, overlap
+
+    def lincoln_petersen(self, a, b):
+        """两个来源的Lincoln–Petersen估计 n_a·n_b/m，没有重叠时返回None"""
+        n_a, n_b, overlap = self._pair_counts(a, b)
+        return n_a * n_b / overlap if overlap else None
+
+    def chapman(self, a, b):
+        """Chapman修正的两来源估计，重叠很少时比Lincoln–Petersen偏差小"""
+        n_a, n_b, overlap = self._pair_counts(a, b)
+        return (n_a + 1) * (n_b + 1) / (overlap + 1) - 1
+
+    def pooled_chapman(self):
+        """每个来源与其余来源合并后做Chapman估计，取中位数；来源少于2个时返回None"""
+        if len(self._source_index) < 2:
+            return None
+        sizes, shared = self._source_counts()
+        observed = self.observed
+        estimates = []
+        for index in sizes:
+            # 其余来源合并后的电影数
+            rest = observed - sizes[index] + shared[index]
+            estimates.append((sizes[index] + 1) * (rest + 1) / (shared[index] + 1) - 1)
+        return statistics.median(estimates)
+
+    def chao2(self):
+        """按出现在1个、2个来源中的电影数估计总数（偏差修正形式，f2为0时也可用）"""
+        sources = len(self._source_index)
+        if sources < 2:
+            return None
+        f1, f2 = self._frequency[1], self._frequency[2]
+        return self.observed + (sources - 1) / sources * f1 * (f1 - 1) / (2 * (f2 + 1))
+
+    def new_per_1000_requests(self):
+        """最近的列表页中每1000个请求发现的新电影数"""
+        requests = sum(count for count, _ in self._recent)
+        if not requests:
+            return None
+        return 1000 * sum(new for _, new in self._recent) / requests
+
+    def warmed_up(self):
+        """最近窗口已经填满，产出估计可以用来做决定"""
+        return len(self._recent) == self._recent.maxlen
+
+    def source_stats(self):
+        """每个来源的页数、电影数、只在这个来源中出现的电影数和最近每页新电影数，按最近产出排序"""
+        sizes, shared = self._source_counts()
+        stats = []
+        for source, index in self._source_index.items():
+            recent = self._source_recent[source]
+            stats.append({
+                'source': source,
+                'pages': self._source_pages[source],
+                'seen': sizes[index],
+                'unique': sizes[index] - shared[index],
+                'recent_yield': sum(recent) / len(recent) if recent else 0.0,
+            })
+        stats.sort(key=lambda item: item['recent_yield'], reverse=True)
+        return stats
+
+    def summary(self):
+        chao2 = self.chao2()
+        return {
+            'samples': self.samples,
+            'requests': self.requests,
+            'observed': self.observed,
+            'chao2': chao2,
+            'chapman': self.pooled_chapman(),
+            'remaining': None if chao2 is None else max(chao2 - self.observed, 0),
+            'new_per_1000_requests': self.new_per_1000_requests(),
+        }
+
+    def print_summary(self, limit=5):
+        """打印估计结果和产出最高的几个来源"""
+        summary = self.summary()
+        print(f"目录规模估计: 已见 {summary['observed']} 部电影（{summary['samples']} 个列表页，"
+              f"{summary['requests']} 个请求）")
+        if summary['chao2'] is not None:
+            print(f"  Chao2估计总数 {summary['chao2']:.0f}，Chapman估计 {summary['chapman']:.0f}，"
+                  f"预计还有 {summary['remaining']:.0f} 部未发现")
+        if summary['new_per_1000_requests'] is not None:
+            print(f"  最近每1000个请求发现 {summary['new_per_1000_requests']:.0f} 部新电影")
+        for item in self.source_stats()[:limit]:
+            print(f"  {item['source']}: {item['pages']} 页，{item['seen']} 部（独有 {item['unique']} 部），"
+                  f"最近每页新电影 {item['recent_yield']:.1f} 部")
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+爬取模拟器：不访问豆瓣，离线预测一次"爬取所有电影"需要的时间、请求数和能发现的电影数
+按离散事件推进模拟时钟：
+- 任务调度使用真实的任务队列（内存中的SQLite），失败重试和指数退避与实际爬取相同；
+  初始任务、标签翻页的优先级和停止条件（空页、最大页数、增量模式连续低新颖度、目录产出低于阈值）
+  以及推荐关系发现的层数和优先级都调用爬虫本身的调度函数
+- 限速使用真实的自适应限速控制器（传入模拟时钟），也可以关闭自动调整，按固定速率模拟
+- 每个列表页从可爬取的全部电影中随机抽取，标签之间的重叠由电影总数决定
+- 延迟、失败率、限流率、缓存命中率和电影总数可以从以往的运行记录（crawl_runs.jsonl）中估计
+不模拟的部分：列表页评分对详情任务优先级的加成（只影响顺序，不影响请求数）、刷新已爬取的电影、
+标签翻页进度（tag_cursors）和列表页预取
+"""
+
+import heapq
+import math
+import random
+
+from douban_catalog_estimator import CatalogEstimator
+from douban_frontier import CrawlFrontier
+from douban_movie_crawler_unlimited import (POPULAR_TAGS, PRIORITY_DETAIL, PRIORITY_TOP250_DETAIL,
+                                            catalog_yield_below, next_tag_page, push_tag_page,
+                                            related_detail_priority, seed_frontier)
+from douban_rate_controller import AdaptiveRateController
+from douban_run_metrics import load_run_metrics
+
+# 热门标签数与爬虫的标签列表一致，以及标签列表页和Top250列表页每页的电影数
+TAG_COUNT = len(POPULAR_TAGS)
+TAG_PAGE_SIZE = 20
+TOP250_PAGE_SIZE = 25
+# 缓存命中时的耗时（秒），不占用请求配额
+CACHE_HIT_TIME = 0.01
+
+
+def estimate_population(listed, new):
+    """按随机抽样模型 new = N·(1 - exp(-listed/N)) 从列表条目数和新电影数反推电影总数；没有重叠时返回None"""
+    if new <= 0 or new >= listed:
+        return None
+
+    def expected_new(population):
+        return population * (1 - math.exp(-listed / population))
+
+    low = high = float(new)
+    while expected_new(high) < new:
+        high *= 2
+    for _ in range(60):
+        middle = (low + high) / 2
+        if expected_new(middle) < new:
+            low = middle
+        else:
+            high = middle
+    return round(high)
+
+
+def calibrate(runs):
+    """根据以往的运行记录估计模拟参数；记录中没有的参数不返回，使用模拟器的默认值"""
+    requests = sum(run.get('requests', 0) for run in runs)
+    if not requests:
+        return {}
+
+    # 限流次数包含请求失败（超时、连接错误），其余的4xx/5xx作为普通错误
+    throttled = sum(stats.get('throttled', 0) for run in runs for stats in run.get('rate', {}).values())
+    errors = sum(run.get('errors', 0) for run in runs)
+    cache_hits = sum(run.get('cache_hits', 0) for run in runs)
+    params = {
+        'latency': sum(run.get('avg_time', 0.0) * run.get('requests', 0) for run in runs) / requests,
+        'throttle_rate': throttled / requests,
+        'error_rate': max(errors - throttled, 0) / requests,
+        'cache_hit_rate': cache_hits / (cache_hits + requests),
+    }
+
+    # 电影总数：优先使用最近一次的目录规模估计，否则按最近一次的标签列表重叠程度反推
+    for run in reversed(runs):
+        population = run.get('catalog_estimate') or estimate_population(
+            run.get('listing_pages', 0) * TAG_PAGE_SIZE, run.get('listing_new', 0))
+        if population:
+            params['population'] = round(population)
+            break
+    return params
+
+
+class CrawlSimulator:
+    """模拟一次任务队列模式的爬取（crawl_all_movies）"""
+
+    def __init__(self, concurrency=1, adaptive=True, budgets=None, latency=0.8, error_rate=0.0,
+                 throttle_rate=0.0, cache_hit_rate=0.0, population=None, max_tags=None, max_pages=30,
+                 max_attempts=3, retry_delay=60.0, tag_pages=None, novelty_threshold=None, novelty_patience=3,
+                 min_new_per_1000=None, catalog_window=100, graph_discovery=False, graph_max_depth=None,
+                 recommendations=10, seed=0):
+        if graph_discovery and population is None and graph_max_depth is None:
+            raise ValueError("电影总数不限时推荐关系发现需要设置最大深度")
+        # 同时执行的任务数：无上限版本为1，异步版本为并发请求数
+        self.concurrency = concurrency
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.cache_hit_rate = cache_hit_rate
+        # 可爬取的电影总数，None表示不限（每个列表页都是新电影）
+        self.population = population
+        self.tag_count = min(max_tags or TAG_COUNT, TAG_COUNT)
+        self.max_pages = max_pages
+        # 每个标签有内容的页数，之后是空页；None表示一直到max_pages都有内容
+        self.tag_pages = tag_pages
+        # 增量模式：连续novelty_patience页未爬取的比例低于novelty_threshold时停止该标签，None表示不启用
+        self.novelty_threshold = novelty_threshold
+        self.novelty_patience = novelty_patience
+        # 每1000个请求发现的新电影低于min_new_per_1000时停止所有标签翻页
+        self.min_new_per_1000 = min_new_per_1000
+        self.catalog_estimator = CatalogEstimator(catalog_window) if min_new_per_1000 is not None else None
+        self.catalog_exhausted = False
+        # 推荐关系发现：每个详情页推荐recommendations部电影
+        self.graph_discovery = graph_discovery
+        self.graph_max_depth = graph_max_depth
+        self.recommendations = recommendations
+        self.random = random.Random(seed)
+
+        self.now = 0.0
+        if adaptive:
+            self.rate_controller = AdaptiveRateController(budgets, clock=self._clock)
+        else:
+            # 固定速率：保留令牌桶和Retry-After暂停，不做AIMD调整
+            self.rate_controller = AdaptiveRateController(budgets, increase_step=0.0, decrease_factor=1.0,
+                                                          latency_decrease_factor=1.0, clock=self._clock)
+        self.frontier = CrawlFrontier(':memory:', max_attempts, retry_delay)
+        self._crawled = set()
+        self._next_subject = 0
+        self.stats = {'listing': 0, 'detail': 0, 'cache_hits': 0, 'throttled': 0, 'errors': 0,
+                      'failed_tasks': 0, 'movies': 0, 'graph_discovered': 0,
+                      'stopped_tags': {'empty': 0, 'max_pages': 0, 'low_novelty': 0, 'catalog': 0}}
+
+    @classmethod
+    def from_runs(cls, runs=None, **overrides):
+        """用以往运行记录估计的参数创建模拟器，overrides中的参数优先"""
+        params = calibrate(load_run_metrics() if runs is None else runs)
+        params.update(overrides)
+        return cls(**params)
+
+    def _clock(self):
+        return self.now
+
+    def _draw(self, count):
+        """一个列表页或一个详情页推荐的电影"""
+        if self.population is None:
+            self._next_subject += count
+            return list(range(self._next_subject - count, self._next_subject))
+        return [self.random.randrange(self.population) for _ in range(count)]
+
+    def _tag_page(self, page):
+        """一个标签列表页中的电影，超过标签的页数时为空页"""
+        if self.tag_pages is not None and page >= self.tag_pages:
+            return []
+        return self._draw(TAG_PAGE_SIZE)
+
+    def _enqueue(self, subject_ids, priority, depth=0):
+        """与 _enqueue_movie_links 相同：未爬取的电影加入任务队列，已在队列中的不重复加入"""
+        added = 0
+        for subject_id in subject_ids:
+            if subject_id in self._crawled:
+                continue
+            if self.frontier.push('detail', f"detail:{subject_id}", priority=priority,
+                                  payload={'subject': subject_id, 'depth': depth}):
+                added += 1
+        return added
+
+    def _observe_listing(self, source, subject_ids, added):
+        """与 _observe_listing 相同：交给目录规模估计，返回True表示产出已低于阈值"""
+        if self.catalog_estimator is None or not subject_ids:
+            return False
+        self.catalog_estimator.observe(source, subject_ids, added, 1 + added)
+        if not self.catalog_exhausted:
+            self.catalog_exhausted = catalog_yield_below(self.catalog_estimator, self.min_new_per_1000) is not None
+        return self.catalog_exhausted
+
+    def _finish_tag_page(self, payload):
+        """与 _finish_listing_task 相同：加入详情任务，按爬虫的规则决定是否加入下一页"""
+        subject_ids = self._tag_page(payload['page'])
+        novelty = (sum(1 for subject_id in subject_ids if subject_id not in self._crawled) / len(subject_ids)
+                   if subject_ids else 0.0)
+        added = self._enqueue(subject_ids, PRIORITY_DETAIL)
+        _, next_payload, stop_reason = next_tag_page(payload, len(subject_ids), added, novelty,
+                                                     self.novelty_threshold, self.novelty_patience)
+        if self._observe_listing(payload['tag'], subject_ids, added):
+            self.stats['stopped_tags']['catalog'] += 1
+        elif next_payload is not None:
+            push_tag_page(self.frontier, next_payload)
+        else:
+            self.stats['stopped_tags'][stop_reason] += 1
+
+    def _finish_detail(self, payload):
+        """一部电影爬取成功；启用推荐关系发现时，推荐的电影按下一层的优先级加入任务队列"""
+        self._crawled.add(payload['subject'])
+        self.stats['movies'] += 1
+        if not self.graph_discovery:
+            return
+        depth = payload['depth'] + 1
+        priority = related_detail_priority(depth, self.graph_max_depth)
+        if priority is not None:
+            self.stats['graph_discovered'] += self._enqueue(self._draw(self.recommendations), priority, depth)
+
+    def _start(self, task):
+        """发出任务的请求，返回 (完成时间, 请求类别, 延迟, 状态码)；缓存命中时延迟为None"""
+        kind = 'detail' if task['kind'] == 'detail' else 'listing'
+        if self.random.random() < self.cache_hit_rate:
+            self.stats['cache_hits'] += 1
+            return self.now + CACHE_HIT_TIME, kind, None, 200
+
+        wait = self.rate_controller.reserve(kind)
+        self.stats[kind] += 1
+        latency = self.latency * self.random.uniform(0.5, 1.5)
+        roll = self.random.random()
+        if roll < self.throttle_rate:
+            status_code = 429
+        elif roll < self.throttle_rate + self.error_rate:
+            status_code = 500
+        else:
+            status_code = 200
+        return self.now + wait + latency, kind, latency, status_code
+
+    def _finish(self, task, kind, latency, status_code):
+        """请求完成：反馈给限速控制器，成功时加入新任务"""
+        if latency is not None:
+            self.rate_controller.record(kind, latency, status_code)
+        if status_code != 200:
+            self.stats['throttled' if status_code == 429 else 'errors'] += 1
+            if task['attempts'] + 1 >= self.frontier.max_attempts:
+                self.stats['failed_tasks'] += 1
+            self.frontier.fail(task['task_id'], f"HTTP {status_code}", now=self.now)
+            return
+
+        if task['kind'] == 'detail':
+            self._finish_detail(task['payload'])
+        elif task['kind'] == 'top250':
+            subject_ids = self._draw(TOP250_PAGE_SIZE)
+            self._observe_listing('Top250', subject_ids, self._enqueue(subject_ids, PRIORITY_TOP250_DETAIL))
+        else:
+            self._finish_tag_page(task['payload'])
+        self.frontier.complete(task['task_id'])
+
+    def run(self):
+        """运行模拟直到任务队列清空，返回预测结果"""
+        seed_frontier(self.frontier, range(self.tag_count), self.max_pages)
+        # 正在执行的任务：(完成时间, 序号, 任务, 请求类别, 延迟, 状态码)
+        running = []
+        sequence = 0
+        while True:
+            while len(running) < self.concurrency:
+                task = self.frontier.pop(self.now)
+                if task is None:
+                    break
+                sequence += 1
+                finished_at, kind, latency, status_code = self._start(task)
+                heapq.heappush(running, (finished_at, sequence, task, kind, latency, status_code))
+            if running:
+                finished_at, _, task, kind, latency, status_code = heapq.heappop(running)
+                self.now = finished_at
+                self._finish(task, kind, latency, status_code)
+                continue
+
+            wait = self.frontier.next_wait(self.now)
+            if wait is None:
+                break
+            self.now += wait
+
+        self.frontier.close()
+        return self.result()
+
+    def result(self):
+        requests = self.stats['listing'] + self.stats['detail']
+        return dict(self.stats, elapsed=self.now, requests=requests,
+                    new_per_1000_requests=1000 * self.stats['movies'] / requests if requests else 0.0)
+
+
+def format_duration(seconds):
+    hours, remainder = divmod(int(seconds), 3600)
+    return f"{hours}小时{remainder // 60}分钟" if hours else f"{remainder // 60}分{remainder % 60}秒"
+
+
+def print_simulation(result):
+    """打印模拟结果"""
+    print(f"预计用时: {format_duration(result['elapsed'])}")
+    print(f"预计请求数: {result['requests']}（列表 {result['listing']}，详情 {result['detail']}），"
+          f"缓存命中 {result['cache_hits']}")
+    print(f"预计被限流 {result['throttled']} 次，其他错误 {result['errors']} 次，最终失败的任务 {result['failed_tasks']} 个")
+    print(f"预计爬取 {result['movies']} 部电影，平均每1000个请求 {result['new_per_1000_requests']:.0f} 部")
+    if result['graph_discovered']:
+        print(f"预计通过推荐关系发现 {result['graph_discovered']} 部电影")
+    stopped = result['stopped_tags']
+    print(f"标签停止翻页: 空页 {stopped['empty']} 个，到达最大页数 {stopped['max_pages']} 个，"
+          f"增量模式 {stopped['low_novelty']} 个，目录产出过低 {stopped['catalog']} 个")
+
+
+def main():
+    """主函数"""
+    print("豆瓣爬取模拟器")
+    print("=" * 60)
+
+    runs = load_run_metrics()
+    params = calibrate(runs)
+    if params:
+        print(f"根据 {len(runs)} 次运行记录估计: 平均延迟 {params['latency']:.2f}s，"
+              f"限流率 {params['throttle_rate']:.1%}，错误率 {params['error_rate']:.1%}，"
+              f"缓存命中率 {params['cache_hit_rate']:.1%}，电影总数 {params.get('population') or '未知'}")
+    else:
+        print("没有运行记录，使用默认参数")
+
+    concurrency = int(input("请输入并发请求数 (默认1，即无上限版本): ") or "1")
+    max_tags = input("请输入最大标签数量 (直接回车模拟所有标签): ").strip()
+    max_pages = int(input("请输入每个标签的最大页数 (默认30): ") or "30")
+    adaptive = input("是否使用自适应限速（否则按初始速率固定不变）？(Y/n): ").strip().lower() != 'n'
+    incremental = input("是否使用增量模式，连续多页没有新电影时停止翻页？(y/N): ").strip().lower() == 'y'
+    min_new = input("每1000个请求发现的新电影少于多少部时停止翻页？(直接回车不停止): ").strip()
+
+    simulator = CrawlSimulator.from_runs(runs, concurrency=concurrency, adaptive=adaptive,
+                                         max_tags=int(max_tags) if max_tags else None, max_pages=max_pages,
+                                         novelty_threshold=0.1 if incremental else None,
+                                         min_new_per_1000=int(min_new) if min_new else None)
+    print("\n模拟中...")
+    print_simulation(simulator.run())
+
+if __name__ == "__main__":
+    main()
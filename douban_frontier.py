@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+持久化的爬取任务队列（frontier）
+列表页和详情页都作为任务保存在SQLite中，每个任务有优先级、已尝试次数和最早可执行时间：
+- 工作者按优先级从高到低取出可执行的任务，数量与任务列表无关
+- 失败的任务按指数退避推迟重试，超过最大次数后标记为失败
+- 中断后重新打开时，执行到一半的任务回到待执行状态，从中断的地方继续
+"""
+
+import json
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    task_id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    task_key TEXT NOT NULL UNIQUE,
+    url TEXT,
+    payload TEXT,
+    priority REAL NOT NULL DEFAULT 0,
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_eligible REAL NOT NULL DEFAULT 0,
+    last_error TEXT,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_pending ON tasks(state, priority DESC, task_id);
+"""
+
+# 只有执行中的任务时，等待它们产生新任务的轮询间隔（秒）
+POLL_INTERVAL = 0.5
+
+
+class CrawlFrontier:
+    """SQLite任务队列，任务状态为 pending / in_progress / done / failed"""
+
+    def __init__(self, path='crawl_frontier.db', max_attempts=3, retry_delay=60.0):
+        self.path = path
+        # 最多尝试次数，以及第一次重试前的等待时间（之后每次翻倍）
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+
+        # 上次中断时正在执行的任务重新排队
+        with self.conn:
+            resumed = self.conn.execute(
+                "UPDATE tasks SET state = 'pending' WHERE state = 'in_progress'"
+            ).rowcount
+        if resumed:
+            print(f"恢复了 {resumed} 个上次未完成的任务")
+
+    def push(self, kind, task_key, url=None, payload=None, priority=0.0):
+        """加入任务；相同task_key的任务已存在时只在待执行状态下提高优先级，返回是否新加入"""
+        with self._lock, self.conn:
+            cursor = self.conn.execute(
+                "INSERT OR IGNORE INTO tasks (kind, task_key, url, payload, priority, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (kind, task_key, url, json.dumps(payload or {}, ensure_ascii=False), priority, time.time())
+            )
+            if cursor.rowcount:
+                return True
+            self.conn.execute(
+                "UPDATE tasks SET priority = ? WHERE task_key = ? AND state = 'pending' AND priority < ?",
+                (priority, task_key, priority)
+            )
+            return False
+
+    def pop(self, now=None):
+        """取出优先级最高的可执行任务并标记为执行中，没有时返回None"""
+        now = time.time() if now is None else now
+        with self._lock, self.conn:
+            row = self.conn.execute(
+                "SELECT task_id, kind, task_key, url, payload, priority, attempts FROM tasks "
+                "WHERE state = 'pending' AND next_eligible <= ? "
+                "ORDER BY priority DESC, task_id LIMIT 1",
+                (now,)
+            ).fetchone()
+            if row is None:
+                return None
+            self.conn.execute(
+                "UPDATE tasks SET state = 'in_progress', updated_at = ? WHERE task_id = ?",
+                (now, row[0])
+            )
+
+        task_id, kind, task_key, url, payload, priority, attempts = row
+        return {
+            'task_id': task_id,
+            'kind': kind,
+            'task_key': task_key,
+            'url': url,
+            'payload': json.loads(payload) if payload else {},
+            'priority': priority,
+            'attempts': attempts,
+        }
+
+    def complete(self, task_id):
+        with self._lock, self.conn:
+            self.conn.execute(
+                "UPDATE tasks SET state = 'done', updated_at = ? WHERE task_id = ?",
+                (time.time(), task_id)
+            )
+
+    def fail(self, task_id, error=None, now=None):
+        """记录一次失败：推迟重试，超过最大次数后标记为失败"""
+        now = time.time() if now is None else now
+        with self._lock, self.conn:
+            attempts = self.conn.execute(
+                "SELECT attempts FROM tasks WHERE task_id = ?", (task_id,)
+            ).fetchone()[0] + 1
+            state = 'failed' if attempts >= self.max_attempts else 'pending'
+            next_eligible = now + self.retry_delay * 2 ** (attempts - 1)
+            self.conn.execute(
+                "UPDATE tasks SET state = ?, attempts = ?, next_eligible = ?, last_error = ?, updated_at = ? "
+                "WHERE task_id = ?",
+                (state, attempts, next_eligible, error, now, task_id)
+            )
+
+    def next_wait(self, now=None):
+        """距离下一个任务可执行还要等待的秒数；没有待执行和执行中的任务时返回None"""
+        now = time.time() if now is None else now
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT MIN(next_eligible) FROM tasks WHERE state = 'pending'"
+            ).fetchone()
+            if row[0] is not None:
+                return max(0.0, row[0] - now)
+            in_progress = self.conn.execute(
+                "SELECT COUNT(*) FROM tasks WHERE state = 'in_progress'"
+            ).fetchone()[0]
+        return POLL_INTERVAL if in_progress else None
+
+    def has_unfinished(self):
+        """是否还有待执行或执行中的任务"""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT 1 FROM tasks WHERE state IN ('pending', 'in_progress') LIMIT 1"
+            ).fetchone()
+        return row is not None
+
+    def clear_finished(self):
+        """删除已完成和已失败的任务，开始新一轮爬取"""
+        with self._lock, self.conn:
+            return self.conn.execute("DELETE FROM tasks WHERE state IN ('done', 'failed')").rowcount
+
+    def counts(self):
+        """按状态统计任务数"""
+        with self._lock:
+            rows = self.conn.execute("SELECT state, COUNT(*) FROM tasks GROUP BY state").fetchall()
+        return dict(rows)
+
+    def print_status(self):
+        counts = self.counts()
+        print(f"任务队列: 待执行 {counts.get('pending', 0)}，执行中 {counts.get('in_progress', 0)}，"
+              f"已完成 {counts.get('done', 0)}，失败 {counts.get('failed', 0)}")
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
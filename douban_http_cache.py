@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+磁盘HTTP缓存
+保存响应内容以及ETag / Last-Modified / Cache-Control等元数据：
+- 缓存未过期时直接返回，不发起网络请求
+- 缓存过期后发起条件请求，服务器返回304时复用本地内容
+- 按URL类别（Top250列表、标签搜索JSON、电影详情页）设置不同的有效期
+- 总大小超过上限时先删除已过期的条目，再删除最早保存的条目
+- 没有电影的标签列表页不缓存，以免之后继续爬取时误判该标签已经爬完
+"""
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import zlib
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+
+# 按URL类别的缓存有效期（秒），按顺序匹配
+DEFAULT_TTL_POLICIES = [
+    ('top250', re.compile(r'/top250'), 24 * 3600),
+    ('search_subjects', re.compile(r'/j/search_subjects'), 6 * 3600),
+    ('subject', re.compile(r'/subject/\d+'), 7 * 24 * 3600),
+]
+
+# 标签搜索JSON，subjects为空时不缓存
+LISTING_PATTERN = re.compile(r'/j/search_subjects')
+
+# 缓存总大小的默认上限（字节），超过后删除到上限的90%
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+# 超过这个时间（秒）的临时文件是之前中断的写入留下的，清理时删除
+STALE_TMP_AGE = 3600
+
+# 需要保存的响应头
+CACHED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Cache-Control', 'Date', 'Expires')
+
+
+def _parse_max_age(cache_control):
+    """从Cache-Control中解析max-age，没有时返回None"""
+    match = re.search(r'max-age=(\d+)', cache_control or '')
+    return int(match.group(1)) if match else None
+
+
+class HttpCache:
+    """以URL的哈希为键、保存在磁盘上的HTTP缓存"""
+
+    def __init__(self, cache_dir='http_cache', ttl_policies=None, default_ttl=0, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.ttl_policies = DEFAULT_TTL_POLICIES if ttl_policies is None else ttl_policies
+        # 未匹配任何URL类别且响应没有max-age时的有效期，0表示每次都重新验证
+        self.default_ttl = default_ttl
+        # 缓存总大小上限，None表示不限制；size为当前总大小的估计，清理时重新统计
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._size_lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self.prune()
+
+    def _paths(self, url):
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        directory = os.path.join(self.cache_dir, key[:2])
+        return directory, os.path.join(directory, key + '.json'), os.path.join(directory, key + '.body')
+
+    def get_ttl(self, url, meta=None):
+        """返回URL的缓存有效期：优先按URL类别，其次按响应的max-age"""
+        for _, pattern, ttl in self.ttl_policies:
+            if pattern.search(url):
+                return ttl
+
+        if meta:
+            max_age = _parse_max_age(meta['headers'].get('Cache-Control'))
+            if max_age is not None:
+                return max_age
+        return self.default_ttl
+
+    def lookup(self, url):
+        """读取缓存条目的元数据，不存在时返回None"""
+        _, meta_path, body_path = self._paths(url)
+        if not os.path.exists(meta_path) or not os.path.exists(body_path):
+            return None
+
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if meta.get('url') != url:
+            return None
+        return meta
+
+    def is_fresh(self, url, meta, now=None):
+        """缓存条目是否仍在有效期内"""
+        now = time.time() if now is None else now
+        return now - meta['stored_at'] < self.get_ttl(url, meta)
+
+    def conditional_headers(self, meta):
+        """生成条件请求头"""
+        headers = {}
+        if meta['headers'].get('ETag'):
+            headers['If-None-Match'] = meta['headers']['ETag']
+        if meta['headers'].get('Last-Modified'):
+            headers['If-Modified-Since'] = meta['headers']['Last-Modified']
+        return headers
+
+    def _write_atomic(self, path, data):
+        # 每次写入使用不同的临时文件，多个线程或协程同时保存同一个URL时互不影响
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def _write_meta(self, meta_path, meta):
+        data = json.dumps(meta, ensure_ascii=False).encode('utf-8')
+        self._write_atomic(meta_path, data)
+        return len(data)
+
+    def store(self, url, response):
+        """保存一个200响应"""
+        cache_control = response.headers.get('Cache-Control', '')
+        if 'no-store' in cache_control or self._is_empty_listing(url, response):
+            return
+
+        directory, meta_path, body_path = self._paths(url)
+        os.makedirs(directory, exist_ok=True)
+
+        meta = {
+            'url': url,
+            'stored_at': time.time(),
+            'encoding': response.encoding,
+            'headers': {name: response.headers[name] for name in CACHED_HEADERS if name in response.headers},
+        }
+        # 先写内容再写元数据，元数据存在即表示条目完整
+        body = zlib.compress(response.content)
+        self._write_atomic(body_path, body)
+        self._grow(len(body) + self._write_meta(meta_path, meta))
+
+    def _is_empty_listing(self, url, response):
+        """标签列表页没有电影（或无法解析）"""
+        if not LISTING_PATTERN.search(url):
+            return False
+        try:
+            return not response.json().get('subjects')
+        except (ValueError, AttributeError):
+            return True
+
+    def _grow(self, added):
+        """记录新写入的大小，超过上限时清理"""
+        with self._size_lock:
+            self.size += added
+            over = self.max_bytes is not None and self.size > self.max_bytes
+        if over:
+            self.prune()
+
+    def _entries(self):
+        """遍历缓存目录，返回 [(保存时间, 是否过期, 元数据路径, 内容路径, 大小)]，顺便删除残留的临时文件"""
+        entries = []
+        now = time.time()
+        for directory, _, names in os.walk(self.cache_dir):
+            for name in names:
+                path = os.path.join(directory, name)
+                if name.endswith('.tmp'):
+                    try:
+                        if now - os.path.getmtime(path) > STALE_TMP_AGE:
+                            os.remove(path)
+                    except OSError:
+                        pass
+                    continue
+                if not name.endswith('.json'):
+                    continue
+                body_path = path[:-len('.json')] + '.body'
+                try:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        meta = json.load(f)
+                    size = os.path.getsize(path) + os.path.getsize(body_path)
+                    stored_at = meta['stored_at']
+                    expired = not self.is_fresh(meta['url'], meta, now)
+                except (OSError, ValueError, KeyError):
+                    # 不完整的条目视为已过期，清理时最先删除
+                    stored_at, expired, size = 0.0, True, 0
+                entries.append((stored_at, expired, path, body_path, size))
+        return entries
+
+    def prune(self):
+        """总大小超过上限时，先删除已过期的条目，再按保存时间从早到晚删除，直到上限的90%；返回清理后的总大小"""
+        with self._size_lock:
+            entries = self._entries()
+            size = sum(entry[4] for entry in entries)
+            if self.max_bytes is not None and size > self.max_bytes:
+                target = self.max_bytes * 0.9
+                # 过期的排在前面，同类中保存时间早的排在前面
+                for stored_at, expired, meta_path, body_path, entry_size in sorted(
+                        entries, key=lambda entry: (not entry[1], entry[0])):
+                    if size <= target:
+                        break
+                    for path in (meta_path, body_path):
+                        try:
+                            os.remove(path)
+                        except OSError:
+                            pass
+                    size -= entry_size
+            self.size = size
+            return size
+
+    def refresh(self, url, meta, response):
+        """服务器返回304时，更新缓存条目的时间和验证信息"""
+        _, meta_path, _ = self._paths(url)
+        meta['stored_at'] = time.time()
+        for name in CACHED_HEADERS:
+            if name in response.headers:
+                meta['headers'][name] = response.headers[name]
+        self._write_meta(meta_path, meta)
+
+    def build_response(self, url, meta):
+        """用缓存内容构造一个requests.Response对象"""
+        _, _, body_path = self._paths(url)
+        with open(body_path, 'rb') as f:
+            content = zlib.decompress(f.read())
+
+        response = requests.Response()
+        response.status_code = 200
+        response.reason = 'OK'
+        response.url = url
+        response._content = content
+        response.headers = CaseInsensitiveDict(meta['headers'])
+        response.encoding = meta.get('encoding')
+        response.from_cache = True
+        return response
@@ -6,7 +6,6 @@
 输出为JSON格式
 """
 
-import requests
 import json
 import time
 import random
@@ -15,6 +14,8 @@ from urllib.parse import urljoin
 import os
 from datetime import datetime
 
+from douban_transport import get_transport
+
 class DoubanMovieCrawler:
     def __init__(self):
         self.base_url = "https://movie.douban.com"
@@ -26,14 +27,14 @@ class DoubanMovieCrawler:
             'Connection': 'keep-alive',
             'Upgrade-Insecure-Requests': '1',
         }
-        self.session = requests.Session()
-        self.session.headers.update(self.headers)
+        # 共享连接池
+        self.transport = get_transport()
         
     def get_movie_list(self, start=0, count=50):
         """获取电影列表页面"""
         url = f"{self.base_url}/top250?start={start}&filter="
         try:
-            response = self.session.get(url, timeout=10)
+            response = self.transport.get(url, headers=self.headers, timeout=10)
             response.raise_for_status()
             return response.text
         except Exception as e:
@@ -71,7 +72,7 @@ class DoubanMovieCrawler:
             # 添加随机延迟，避免被反爬
             time.sleep(random.uniform(1, 3))
             
-            response = self.session.get(movie_url, timeout=15)
+            response = self.transport.get(movie_url, headers=self.headers, timeout=15)
             response.raise_for_status()
             
             soup = BeautifulSoup(response.text, 'html.parser')
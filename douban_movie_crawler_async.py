@@ -0,0 +1,419 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+豆瓣电影爬虫 - 异步并发版本
+基于无上限版本，使用asyncio同时保持多个请求在途，
+并通过全局的按主机限速控制请求频率，吞吐量随并发数提升而不是靠休眠等待。
+抓取阶段只产出原始页面字节，解析阶段默认在线程池中运行，两者之间用有界队列连接，
+解析队列满时抓取协程等待，不会无限堆积未解析的页面。
+默认的jsonld解析只读取页面中的一段JSON，把页面传给子进程的开销比解析本身还大；
+使用较慢的解析后端时可以指定解析进程数，在进程池中解析。
+"""
+
+import asyncio
+import functools
+import itertools
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from douban_movie_crawler_unlimited import DoubanMovieCrawlerUnlimited, choose_crawl, configure_crawler, run_crawl
+from douban_parsers import parse_detail_page
+from douban_single_flight import AsyncSingleFlight
+from douban_subject_id import canonical_subject_url, subject_key
+
+
+class AsyncHostRateLimiter:
+    """按主机的全局限速器，保证同一主机每秒发起的请求数不超过上限"""
+
+    def __init__(self, max_rate):
+        # max_rate 为每个主机每秒最多发起的请求数，0或None表示不限速
+        self.interval = 1.0 / max_rate if max_rate else 0.0
+        self._next_start = {}
+        self._lock = asyncio.Lock()
+
+    async def wait(self, url):
+        """等待直到可以向该URL所在主机发起请求"""
+        if not self.interval:
+            return
+
+        host = urlparse(url).netloc
+        loop = asyncio.get_running_loop()
+
+        # 只在预约时间槽时持锁，休眠期间不占用锁
+        async with self._lock:
+            now = loop.time()
+            start = max(now, self._next_start.get(host, 0.0))
+            self._next_start[host] = start + self.interval
+
+        delay = start - now
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class DoubanMovieCrawlerAsync(DoubanMovieCrawlerUnlimited):
+    def __init__(self, concurrency=8, max_rate=2.0, parser='jsonld', parse_workers=0,
+                 parse_queue_size=None, listing_window=2):
+        super().__init__(parser)
+
+        # 同时在途的最大请求数
+        self.concurrency = concurrency
+        # 每个主机每秒最多发起的请求数，是自适应限速之上的硬性上限
+        self.max_rate = max_rate
+
+        self.rate_limiter = AsyncHostRateLimiter(max_rate)
+        self._semaphore = asyncio.Semaphore(concurrency)
+        # requests是阻塞库，放到线程池中执行
+        self._executor = ThreadPoolExecutor(max_workers=concurrency)
+
+        # 解析进程数，默认为0，在线程池中解析
+        self.parse_workers = parse_workers
+        self._parse_pool = ProcessPoolExecutor(max_workers=self.parse_workers) if self.parse_workers else None
+        # 已下载但尚未解析的页面数上限
+        self.parse_queue_size = parse_queue_size or concurrency * 2
+        # 协程在同一个事件循环中运行，使用asyncio版本的请求合并
+        self.detail_flight = AsyncSingleFlight()
+        # 列表页最多比正在抓取详情的页领先的页数
+        self.listing_window = listing_window
+
+    async def _fetch(self, url, kind, timeout, use_cache=True):
+        """在并发上限和限速约束下发起一次GET请求"""
+        # 缓存未过期时不占用请求配额；刷新时跳过，仍会用条件请求验证缓存
+        response = self.transport.get_cached(url) if use_cache else None
+        if response is not None:
+            return response
+
+        async with self._semaphore:
+            await self.rate_controller.acquire_async(kind)
+            await self.rate_limiter.wait(url)
+            loop = asyncio.get_running_loop()
+            try:
+                response = await loop.run_in_executor(
+                    self._executor,
+                    functools.partial(self.transport.get, url, headers=self.headers, timeout=timeout)
+                )
+            except Exception:
+                self.rate_controller.record(kind, None, None)
+                raise
+
+            self.rate_controller.record(kind, response.request_time, response.status_code,
+                                        response.headers.get('Retry-After'))
+            response.raise_for_status()
+            return response
+
+    async def get_movie_list_from_tag(self, tag, start=0, sort='recommend'):
+        """通过标签获取电影列表"""
+        tag_url = f"https://movie.douban.com/j/search_subjects?type=movie&tag={tag}&sort={sort}&page_limit=20&page_start={start}"
+        try:
+            response = await self._fetch(tag_url, 'listing', timeout=15)
+            return response.json()
+        except Exception as e:
+            print(f"获取标签 '{tag}' 电影失败: {e}")
+            return None
+
+    async def get_movie_list_from_top250(self, start=0):
+        """从Top250获取电影列表"""
+        url = f"{self.base_url}/top250?start={start}&filter="
+        try:
+            response = await self._fetch(url, 'listing', timeout=15)
+            return response.text
+        except Exception as e:
+            print(f"获取Top250电影列表失败: {e}")
+            return None
+
+    async def _fetch_detail_page(self, movie_url, use_cache=True):
+        """抓取阶段：下载详情页并写入归档，返回原始字节和编码"""
+        response = await self._fetch(movie_url, 'detail', timeout=20, use_cache=use_cache)
+
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self._archive_page, movie_url, response)
+        return response.content, response.encoding
+
+    async def _parse_detail_page(self, movie_url, content, encoding):
+        """解析阶段：指定了解析进程数时在进程池中解析，否则在线程池中解析"""
+        loop = asyncio.get_running_loop()
+        executor = self._parse_pool or self._executor
+        return await loop.run_in_executor(
+            executor, parse_detail_page, content, encoding, movie_url, self.parser_name, self.graph_discovery
+        )
+
+    async def get_movie_detail(self, movie_url, force=False):
+        """获取电影详细信息；force为True时即使已经爬取过也重新抓取
+
+        同一部电影正在抓取时等待它完成并返回None，结果由发起请求的一方写入
+        """
+        movie_url = canonical_subject_url(movie_url)
+        # 检查是否已经爬取过；检查和领取之间没有await，不会被其他协程插入
+        if not force and self._is_crawled(movie_url):
+            return None
+
+        movie_info, shared = await self.detail_flight.do(
+            subject_key(movie_url), functools.partial(self._fetch_movie_detail, movie_url, force)
+        )
+        return None if shared else movie_info
+
+    async def _fetch_movie_detail(self, movie_url, force):
+        """领取到这部电影后抓取并解析详情页"""
+        try:
+            content, encoding = await self._fetch_detail_page(movie_url, use_cache=not force)
+            movie_info = await self._parse_detail_page(movie_url, content, encoding)
+
+            # 标记为已爬取
+            self._mark_crawled(movie_url)
+
+            return movie_info
+
+        except Exception as e:
+            print(f"获取电影详情失败 {movie_url}: {e}")
+            return None
+
+    async def _fetch_worker(self, link_queue, page_queue):
+        """抓取阶段的工作协程：从链接队列取任务，把原始页面放入解析队列"""
+        while True:
+            movie_link = await link_queue.get()
+            if movie_link is None:
+                return
+
+            movie_url = movie_link['url']
+            force = self._should_refetch(movie_link)
+            if not force and self._is_crawled(movie_url):
+                continue
+            # 同一部电影已经在抓取或解析中时跳过，不重复占用请求配额
+            key = subject_key(movie_url)
+            if not self.detail_flight.claim(key):
+                continue
+
+            try:
+                content, encoding = await self._fetch_detail_page(movie_url, use_cache=not force)
+            except Exception as e:
+                self.detail_flight.release(key)
+                print(f"获取电影详情失败 {movie_url}: {e}")
+                continue
+
+            # 解析队列已满时在这里等待，限制内存中未解析页面的数量
+            await page_queue.put((movie_url, content, encoding))
+
+    async def _parse_worker(self, page_queue, results):
+        """解析阶段的工作协程：从解析队列取出原始页面并解析"""
+        while True:
+            page = await page_queue.get()
+            if page is None:
+                return
+
+            movie_url, content, encoding = page
+            key = subject_key(movie_url)
+            try:
+                movie_info = await self._parse_detail_page(movie_url, content, encoding)
+            except Exception as e:
+                self.detail_flight.release(key)
+                print(f"解析电影详情失败 {movie_url}: {e}")
+                continue
+
+            # 标记为已爬取
+            self._mark_crawled(movie_url)
+            self.detail_flight.release(key, movie_info)
+            self._collect(results, movie_info)
+            print(f"✓ 成功爬取: {movie_info.get('title', movie_url)}")
+
+    async def _crawl_movie_links(self, movie_links):
+        """爬取一组电影详情：抓取和解析分两个阶段并发执行，中间用有界队列连接"""
+        if not movie_links:
+            return []
+
+        link_queue = asyncio.Queue()
+        page_queue = asyncio.Queue(maxsize=self.parse_queue_size)
+        results = []
+
+        fetch_count = min(self.concurrency, len(movie_links))
+        for movie_link in movie_links:
+            link_queue.put_nowait(movie_link)
+        for _ in range(fetch_count):
+            link_queue.put_nowait(None)
+
+        fetchers = [asyncio.create_task(self._fetch_worker(link_queue, page_queue))
+                    for _ in range(fetch_count)]
+        parsers = [asyncio.create_task(self._parse_worker(page_queue, results))
+                   for _ in range(self.parse_workers or self.concurrency)]
+
+        await asyncio.gather(*fetchers)
+        for _ in parsers:
+            await page_queue.put(None)
+        await asyncio.gather(*parsers)
+
+        return results
+
+    async def _iter_listing_pages(self, fetch, keys):
+        """按顺序逐个返回 (key, await fetch(key))；之后的 listing_window 个列表页提前发起请求"""
+        keys = iter(keys)
+        pending = deque((key, asyncio.ensure_future(fetch(key)))
+                        for key in itertools.islice(keys, self.listing_window + 1))
+        try:
+            while pending:
+                key, task = pending.popleft()
+                yield key, await task
+                # 这一页处理完后再请求下一页，保持最多领先 listing_window 页
+                for next_key in itertools.islice(keys, 1):
+                    pending.append((next_key, asyncio.ensure_future(fetch(next_key))))
+        finally:
+            # 提前停止时取消还没有完成的请求
+            for _, task in pending:
+                task.cancel()
+
+    async def crawl_from_tag(self, tag, max_pages=50, resume=False, sort='recommend'):
+        """从指定标签爬取电影；resume为True时从上次完成的页继续"""
+        all_movies = []
+        start_count = self.collected_count
+
+        page = self._resume_page(tag, sort) if resume else 0
+        if page is None:
+            return all_movies
+
+        print(f"开始从标签 '{tag}' 爬取电影...")
+
+        progress = self._tag_progress()
+        pages = self._iter_listing_pages(functools.partial(self.get_movie_list_from_tag, tag, sort=sort),
+                                         range(page * 20, max_pages * 20, 20))
+        try:
+            async for start, tag_data in pages:
+                movie_links = self._tag_page_links(tag, sort, start, tag_data, progress)
+                if movie_links is None:
+                    break
+
+                novelty = self._page_novelty(movie_links)
+                page_movies = await self._crawl_movie_links(movie_links)
+                all_movies.extend(page_movies)
+                if self._finish_tag_page(tag, sort, start, movie_links, novelty, len(page_movies), progress,
+                                         max_pages):
+                    break
+        finally:
+            await pages.aclose()
+
+        print(f"标签 '{tag}' 爬取完成，共 {self.collected_count - start_count} 部电影")
+        return all_movies
+
+    async def crawl_tag_listings(self, tag, max_pages=50, sort='recommend'):
+        """快速模式：只保存列表页中的信息（每个请求约20部电影），不抓取详情页"""
+        all_movies = []
+        start_count = self.collected_count
+
+        print(f"开始从标签 '{tag}' 快速爬取列表...")
+
+        for page in self._listing_pages(max_pages):
+            tag_data = await self.get_movie_list_from_tag(tag, page * 20, sort)
+            if self._tag_listing_page(tag, page, tag_data, all_movies):
+                break
+
+        print(f"标签 '{tag}' 快速爬取完成，共 {self.collected_count - start_count} 部电影")
+        return all_movies
+
+    async def crawl_listings(self, max_tags=None, max_pages=30):
+        """快速模式爬取所有标签，各个标签同时进行"""
+        tags_to_crawl = self.popular_tags[:max_tags] if max_tags else self.popular_tags
+        results = await asyncio.gather(*(self.crawl_tag_listings(tag, max_pages) for tag in tags_to_crawl))
+        return [movie for tag_movies in results for movie in tag_movies]
+
+    async def crawl_from_top250(self):
+        """从Top250爬取电影"""
+        all_movies = []
+        start_count = self.collected_count
+
+        print("开始从Top250爬取电影...")
+
+        # 十个列表页的位置事先已知，提前请求
+        pages = self._iter_listing_pages(self.get_movie_list_from_top250, range(0, 250, 25))
+        try:
+            async for start, html in pages:
+                movie_links = self._top250_page_links(start, html)
+                if movie_links is None:
+                    break
+
+                all_movies.extend(await self._crawl_movie_links(movie_links))
+        finally:
+            await pages.aclose()
+
+        print(f"Top250爬取完成，共 {self.collected_count - start_count} 部电影")
+        return all_movies
+
+    async def crawl_all_movies(self, max_tags=None):
+        """爬取所有可能的电影：Top250和各个标签的列表页作为任务加入队列，按优先级执行"""
+        self._seed_frontier(max_tags)
+        return await self.crawl_frontier()
+
+    async def refresh_by_change_likelihood(self, daily_budget=500):
+        """在每日请求预算内并发重新抓取最可能已经变化的电影"""
+        movies = []
+
+        async def refresh(item):
+            self._finish_refresh(movies, await self.get_movie_detail(item['url'], force=True))
+
+        await asyncio.gather(*(refresh(item) for item in self._plan_refresh(daily_budget)))
+        return movies
+
+    async def _run_frontier_task(self, task, results):
+        """执行一个任务，成功返回True"""
+        if task['kind'] == 'detail':
+            if self._detail_task_done(task):
+                return True
+            movie_info = await self.get_movie_detail(task['url'], task['payload'].get('force', False))
+            return self._finish_detail_task(task, movie_info, results)
+
+        return self._finish_listing_task(task, await self._listing_task_request(task)())
+
+    async def _frontier_worker(self, results):
+        """任务队列的工作协程"""
+        while True:
+            task = self.frontier.pop()
+            if task is None:
+                wait = self.frontier.next_wait()
+                if wait is None:
+                    return
+                # 其他工作协程可能还会加入新任务
+                await asyncio.sleep(wait)
+                continue
+
+            self._settle_frontier_task(task, await self._run_frontier_task(task, results))
+
+    async def crawl_frontier(self):
+        """用与并发数相同的工作协程从任务队列中取任务执行，直到队列为空"""
+        all_movies = []
+        start_count = self.collected_count
+
+        workers = [asyncio.create_task(self._frontier_worker(all_movies))
+                   for _ in range(self.concurrency)]
+        await asyncio.gather(*workers)
+
+        self.frontier.print_status()
+        self.rate_controller.print_status()
+        print(f"任务队列已清空，共爬取 {self.collected_count - start_count} 部电影")
+        return all_movies
+
+    def close(self):
+        """释放线程池和解析进程池"""
+        self._executor.shutdown(wait=False)
+        if self._parse_pool is not None:
+            self._parse_pool.shutdown()
+
+
+def main():
+    """主函数"""
+    print("豆瓣电影爬虫 - 异步并发版本")
+    print("=" * 60)
+
+    concurrency = int(input("请输入并发请求数 (默认8): ") or "8")
+    max_rate = float(input("请输入每秒最大请求数 (默认2): ") or "2")
+    listing_window = int(input("请输入列表页预取窗口 (默认2，0为不预取): ") or "2")
+    parse_workers = int(input("请输入解析进程数 (默认0，在线程中解析): ") or "0")
+
+    crawler = DoubanMovieCrawlerAsync(concurrency=concurrency, max_rate=max_rate,
+                                      parse_workers=parse_workers, listing_window=listing_window)
+    try:
+        configure_crawler(crawler)
+        crawl = choose_crawl(crawler)
+        if crawl is None:
+            return
+        run_crawl(crawler, lambda: asyncio.run(crawl()))
+    finally:
+        crawler.close()
+
+if __name__ == "__main__":
+    main()
@@ -5,13 +5,14 @@
 基于成功测试结果的爬虫程序
 """
 
-import requests
 import json
 import time
 import random
 from bs4 import BeautifulSoup
 from datetime import datetime
 
+from douban_transport import get_transport
+
 class DoubanMovieCrawlerFinal:
     def __init__(self):
         self.base_url = "https://movie.douban.com"
@@ -21,6 +22,8 @@ class DoubanMovieCrawlerFinal:
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
             'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
         }
+        # 共享连接池
+        self.transport = get_transport()
         
     def get_movie_list(self, start=0):
         """获取电影列表页面"""
@@ -28,7 +31,7 @@ class DoubanMovieCrawlerFinal:
         try:
             # 添加随机延迟
             time.sleep(random.uniform(2, 4))
-            response = requests.get(url, headers=self.headers, timeout=15)
+            response = self.transport.get(url, headers=self.headers, timeout=15)
             response.raise_for_status()
             return response.text
         except Exception as e:
@@ -70,7 +73,7 @@ class DoubanMovieCrawlerFinal:
             # 添加随机延迟
             time.sleep(random.uniform(3, 5))
             
-            response = requests.get(movie_url, headers=self.headers, timeout=20)
+            response = self.transport.get(movie_url, headers=self.headers, timeout=20)
             response.raise_for_status()
             
             soup = BeautifulSoup(response.text, 'html.parser')
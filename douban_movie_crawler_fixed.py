@@ -5,13 +5,14 @@
 基于实际页面结构修正的爬虫程序
 """
 
-import requests
 import json
 import time
 import random
 from bs4 import BeautifulSoup
 from datetime import datetime
 
+from douban_transport import get_transport
+
 class DoubanMovieCrawlerFixed:
     def __init__(self):
         self.base_url = "https://movie.douban.com"
@@ -23,8 +24,8 @@ class DoubanMovieCrawlerFixed:
             'Connection': 'keep-alive',
             'Upgrade-Insecure-Requests': '1',
         }
-        self.session = requests.Session()
-        self.session.headers.update(self.headers)
+        # 共享连接池
+        self.transport = get_transport()
         
     def get_movie_list(self, start=0):
         """获取电影列表页面"""
@@ -32,7 +33,7 @@ class DoubanMovieCrawlerFixed:
         try:
             # 添加随机延迟
             time.sleep(random.uniform(2, 4))
-            response = self.session.get(url, timeout=15)
+            response = self.transport.get(url, headers=self.headers, timeout=15)
             response.raise_for_status()
             return response.text
         except Exception as e:
@@ -79,7 +80,7 @@ class DoubanMovieCrawlerFixed:
             # 添加随机延迟
             time.sleep(random.uniform(3, 5))
             
-            response = self.session.get(movie_url, timeout=20)
+            response = self.transport.get(movie_url, headers=self.headers, timeout=20)
             response.raise_for_status()
             
             soup = BeautifulSoup(response.text, 'html.parser')
@@ -5,7 +5,6 @@
 使用更稳健的方法爬取豆瓣电影信息
 """
 
-import requests
 import json
 import time
 import random
@@ -13,6 +12,8 @@ from bs4 import BeautifulSoup
 import re
 from datetime import datetime
 
+from douban_transport import get_transport
+
 class DoubanMovieCrawlerSimple:
     def __init__(self):
         self.base_url = "https://movie.douban.com"
@@ -29,8 +30,8 @@ class DoubanMovieCrawlerSimple:
             'Sec-Fetch-User': '?1',
             'Cache-Control': 'max-age=0',
         }
-        self.session = requests.Session()
-        self.session.headers.update(self.headers)
+        # 共享连接池
+        self.transport = get_transport()
         
     def get_movie_list(self, start=0):
         """获取电影列表页面"""
@@ -38,7 +39,7 @@ class DoubanMovieCrawlerSimple:
         try:
             # 添加随机延迟
             time.sleep(random.uniform(2, 5))
-            response = self.session.get(url, timeout=15)
+            response = self.transport.get(url, headers=self.headers, timeout=15)
             response.raise_for_status()
             return response.text
         except Exception as e:
@@ -81,7 +82,7 @@ class DoubanMovieCrawlerSimple:
             # 添加随机延迟
             time.sleep(random.uniform(3, 6))
             
-            response = self.session.get(movie_url, timeout=20)
+            response = self.transport.get(movie_url, headers=self.headers, timeout=20)
             response.raise_for_status()
             
             soup = BeautifulSoup(response.text, 'html.parser')
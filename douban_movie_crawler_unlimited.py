@@ -5,43 +5,471 @@
 专门用于爬取大量电影信息，无数量限制
 """
 
-import requests
+import functools
+import itertools
 import json
 import time
-import random
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
 from bs4 import BeautifulSoup
-from datetime import datetime
+from datetime import datetime, timedelta
 import os
+import threading
+
+from douban_bloom_filter import BloomFilter
+from douban_catalog_estimator import CatalogEstimator
+from douban_frontier import CrawlFrontier
+from douban_page_archive import PageArchive
+from douban_parsers import build_movie_info, get_detail_parser
+from douban_rate_controller import AdaptiveRateController
+from douban_refresh_scheduler import RefreshScheduler
+from douban_result_sink import LISTING_RECORD, JsonlResultSink, is_listing_record
+from douban_run_metrics import save_run_metrics
+from douban_single_flight import SingleFlight
+from douban_sqlite_store import SqliteMovieStore
+from douban_subject_id import canonical_subject_url, extract_subject_id, subject_key
+from douban_subject_set import SubjectIdSet
+from douban_tag_cursor import TagCursorStore
+from douban_transport import get_transport
+
+# 已爬取电影的位图文件，以及旧版本使用的URL列表文件
+CRAWLED_SUBJECTS_FILE = 'crawled_subjects.bitmap'
+LEGACY_CRAWLED_URLS_FILE = 'crawled_urls_unlimited.json'
+
+# 任务队列优先级：详情页优先（评分越高越先爬），其次是Top250列表，最后是标签列表
+PRIORITY_DETAIL = 100
+PRIORITY_TOP250_DETAIL = 110
+PRIORITY_TOP250_LISTING = 50
+# 各标签的第一页先全部爬完；之后的页按该标签最近的新电影比例排在 0~PRIORITY_TAG_LISTING 之间
+PRIORITY_TAG_FIRST_PAGE = 20
+PRIORITY_TAG_LISTING = 10
+# 新电影比例的指数加权平均中本页所占的权重
+TAG_YIELD_SMOOTHING = 0.5
+# 推荐关系发现：第一层推荐的详情页优先级，每深一层降低一档，先广度后深度
+PRIORITY_RELATED_DETAIL = 90
+RELATED_DEPTH_STEP = 10
+
+# 热门标签列表
+POPULAR_TAGS = [
+    '热门', '最新', '经典', '可播放', '豆瓣高分', '冷门佳片', 
+    '华语', '欧美', '韩国', '日本', '动作', '喜剧', '爱情', 
+    '科幻', '悬疑', '恐怖', '动画', '纪录片', '短片', '情色',
+    '音乐', '歌舞', '家庭', '儿童', '传记', '历史', '战争',
+    '西部', '奇幻', '冒险', '灾难', '武侠', '古装', '运动',
+    '黑色电影', '犯罪', '剧情', '惊悚', '同性', '女性', '青春'
+]
 
 class DoubanMovieCrawlerUnlimited:
-    def __init__(self):
+    def __init__(self, parser='jsonld'):
         self.base_url = "https://movie.douban.com"
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
             'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
         }
+        # 共享连接池
+        self.transport = get_transport()
+        # 自适应限速，列表页和详情页分别计算速率
+        self.rate_controller = AdaptiveRateController()
+        # 详情页解析后端：jsonld（默认，ld+json快速路径）、lxml 或 bs4
+        self.parser_name = parser
+        self.detail_parser = get_detail_parser(parser)
+        # 详情页原始HTML归档，默认关闭
+        self.page_archive = None
+        # 流式结果输出，默认关闭；开启后可以不在内存中保留结果
+        self.result_sink = None
+        self.keep_in_memory = True
+        self.collected_count = 0
         
-        # 已爬取的电影URL集合，避免重复
-        self.crawled_urls = set()
+        # 已爬取的电影集合，按条目ID记录，避免重复
+        self.crawled_urls = SubjectIdSet()
+        self._crawled_lock = threading.Lock()
+        # 按条目ID合并同时在途的详情页请求
+        self.detail_flight = SingleFlight()
+        # 本次快速模式中已写入列表记录的电影
+        self.listed_urls = SubjectIdSet()
+        # 可选的布隆过滤器，大规模爬取时先用它排除没爬过的电影
+        self.seen_filter = None
+        self.seen_filter_path = None
+        # 每个标签的翻页进度，crawl_from_tag 断点续爬使用
+        self.tag_cursors = TagCursorStore()
+        # 持久化任务队列，crawl_all_movies 使用
+        self.frontier = None
+        # 增量模式：标签连续多页新电影比例过低时提前停止翻页
+        self.incremental = False
+        self.novelty_threshold = 0.1
+        self.novelty_patience = 3
+        self.listing_requests_saved = 0
+        # 任务队列模式下每个标签的列表请求数和新加入的电影数
+        self.tag_yields = {}
+        # 列表页预取窗口：抓取详情页期间在后台提前请求之后的列表页，0表示不预取
+        self.listing_window = 0
+        # 刷新模式：已爬取的电影只有列表信息变化或记录过旧时才重新抓取详情页
+        self.refresh_index = None
+        self.refresh_max_age = None
+        self.refresh_stats = {'changed': 0, 'stale': 0, 'unchanged': 0}
+        # 本次已经安排刷新的电影，同一部电影出现在多个标签中时只刷新一次
+        self.refreshed_urls = SubjectIdSet()
+        # 按变化可能性安排刷新：记录每部电影的评价人数和评分历史
+        self.refresh_scheduler = None
+        # 推荐关系发现：把详情页"喜欢这部电影的人也喜欢"中的电影加入任务队列
+        self.graph_discovery = False
+        self.graph_max_depth = None
+        self.graph_discovered = 0
+        # 目录规模估计：按各标签列表页的重叠估计可爬取的电影总数，产出过低时停止翻页
+        self.catalog_estimator = None
+        self.min_new_per_1000 = None
+        self.catalog_report_every = 50
+        self.catalog_exhausted = False
         
         # 热门标签列表
-        self.popular_tags = [
-            '热门', '最新', '经典', '可播放', '豆瓣高分', '冷门佳片', 
-            '华语', '欧美', '韩国', '日本', '动作', '喜剧', '爱情', 
-            '科幻', '悬疑', '恐怖', '动画', '纪录片', '短片', '情色',
-            '音乐', '歌舞', '家庭', '儿童', '传记', '历史', '战争',
-            '西部', '奇幻', '冒险', '灾难', '武侠', '古装', '运动',
-            '黑色电影', '犯罪', '剧情', '惊悚', '同性', '女性', '青春'
-        ]
-        
-    def get_movie_list_from_tag(self, tag, start=0):
+        self.popular_tags = list(POPULAR_TAGS)
+        
+    def use_http_cache(self, cache_dir='http_cache'):
+        """启用磁盘HTTP缓存，重复爬取时未变化的页面不再完整下载"""
+        self.transport.enable_cache(cache_dir)
+        print(f"已启用HTTP缓存: {cache_dir}")
+    
+    def use_page_archive(self, archive_dir='page_archive'):
+        """启用详情页归档，之后可以离线重新解析而无需重新爬取"""
+        self.page_archive = PageArchive(archive_dir)
+        print(f"已启用详情页归档: {archive_dir}")
+    
+    def use_result_sink(self, path='douban_movies_unlimited.jsonl', keep_in_memory=False):
+        """启用流式JSONL输出，每爬到一部电影立即追加写入，中断时不丢失已爬取的结果"""
+        self.result_sink = JsonlResultSink(path)
+        self.keep_in_memory = keep_in_memory
+        print(f"结果将实时写入: {path}")
+    
+    def use_sqlite_store(self, path='douban_movies.db', keep_in_memory=False):
+        """把结果写入SQLite数据库，按条目ID插入或更新，便于按年份、评分、类型查询"""
+        self.result_sink = SqliteMovieStore(path)
+        self.keep_in_memory = keep_in_memory
+        print(f"结果将写入SQLite数据库: {path}")
+    
+    def use_bloom_filter(self, path='crawled_subjects.bloom', capacity=10000000, error_rate=0.001):
+        """在已爬取集合前面加一层布隆过滤器，应在加载已爬取记录之后调用
+        已爬取记录保存在位图文件中时，没有爬取过的电影只查内存中的过滤器，不再读取映射的位图页"""
+        seen_filter = None
+        if os.path.exists(path):
+            try:
+                seen_filter = BloomFilter.load(path)
+            except (OSError, ValueError) as e:
+                print(f"加载布隆过滤器失败: {e}")
+        
+        # 与已爬取集合不一致（例如上次没有正常保存）时重新生成
+        if seen_filter is None or seen_filter.count != len(self.crawled_urls):
+            seen_filter = BloomFilter(capacity, error_rate)
+            for subject_id in self.crawled_urls:
+                seen_filter.add(subject_id)
+            print(f"已根据 {seen_filter.count} 部已爬取电影生成布隆过滤器")
+        
+        self.seen_filter = seen_filter
+        self.seen_filter_path = path
+        print(f"已启用布隆过滤器: {path}（{len(seen_filter.bits) // 1024} KB，误判率 {seen_filter.error_rate}）")
+    
+    def use_listing_prefetch(self, window=2):
+        """按标签或Top250爬取时，列表页最多比正在抓取详情的页领先window页，详情页不再等待列表请求"""
+        self.listing_window = window
+        print(f"已启用列表页预取，窗口: {window} 页")
+    
+    def _iter_listing_pages(self, fetch, keys):
+        """按顺序逐个返回 (key, fetch(key))；启用预取时在后台线程中提前请求之后的列表页"""
+        if not self.listing_window:
+            for key in keys:
+                yield key, fetch(key)
+            return
+        
+        keys = iter(keys)
+        # 单个线程按顺序请求，请求频率仍由限速控制器控制
+        executor = ThreadPoolExecutor(max_workers=1)
+        pending = deque((key, executor.submit(fetch, key))
+                        for key in itertools.islice(keys, self.listing_window + 1))
+        try:
+            while pending:
+                key, future = pending.popleft()
+                yield key, future.result()
+                # 这一页处理完后再请求下一页，保持最多领先window页
+                for next_key in itertools.islice(keys, 1):
+                    pending.append((next_key, executor.submit(fetch, next_key)))
+        finally:
+            # 提前停止时取消还没有开始的请求
+            for _, future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+    
+    def use_incremental(self, novelty_threshold=0.1, patience=3):
+        """启用增量模式：某个标签连续patience页中新电影的比例都低于阈值时不再继续翻页"""
+        self.incremental = True
+        self.novelty_threshold = novelty_threshold
+        self.novelty_patience = patience
+        print(f"已启用增量模式: 连续 {patience} 页新电影比例低于 {novelty_threshold:.0%} 时停止")
+    
+    def _page_novelty(self, movie_links):
+        """列表页中尚未爬取的电影所占比例"""
+        if not movie_links:
+            return 0.0
+        new_count = sum(1 for movie_link in movie_links if not self._is_crawled(movie_link['url']))
+        return new_count / len(movie_links)
+    
+    def _low_novelty_streak(self, streak, novelty):
+        """更新连续低新颖度页数"""
+        return low_novelty_streak(streak, novelty, self.novelty_threshold)
+    
+    def _stop_tag_early(self, tag, page, max_pages, prefetched=0):
+        """记录提前停止节省的列表请求数；prefetched 为已经提前请求的页数"""
+        saved = max(max_pages - page - prefetched, 0)
+        self.listing_requests_saved += saved
+        print(f"增量模式: 标签 '{tag}' 连续 {self.novelty_patience} 页新电影比例低于 {self.novelty_threshold:.0%}，"
+              f"在第 {page} 页后停止，最多节省 {saved} 个列表请求")
+    
+    def use_refresh(self, max_age_days=30):
+        """启用刷新模式，应在打开结果输出之后调用：
+        已爬取的电影在列表页的评分或标题与已保存的记录不同、或记录超过max_age_days天时重新抓取详情页"""
+        self.refresh_max_age = timedelta(days=max_age_days)
+        self.refresh_index = {}
+        if self.result_sink is None:
+            print("没有结果输出，刷新模式只按列表信息判断")
+            return
+        
+        self.result_sink.commit()
+        for movie in self.result_sink.iter_movies():
+            subject_id = extract_subject_id(movie.get('douban_url'))
+            if subject_id is None or is_listing_record(movie):
+                continue
+            self.refresh_index[subject_id] = (movie.get('title') or '', movie.get('rating') or '',
+                                              movie.get('crawl_time') or '')
+        print(f"已启用刷新模式: 对比 {len(self.refresh_index)} 条已保存记录，超过 {max_age_days} 天的记录重新抓取")
+    
+    def _refresh_reason(self, movie_link):
+        """判断已爬取的电影是否需要重新抓取详情页
+        
+        返回 ('changed' 或 'stale', 原因)，不需要时返回None
+        """
+        stored = self.refresh_index.get(extract_subject_id(movie_link['url']))
+        if stored is None:
+            return 'stale', '没有保存的记录'
+        title, rating, crawl_time = stored
+        
+        # 详情页标题是中文名加外文名和年份；Top250列表页的标题是用"/"分隔的各个译名，只比较第一个
+        listing_title = (movie_link.get('title') or '').split('/')[0].strip()
+        if listing_title and not title.startswith(listing_title):
+            return 'changed', f"标题变化: {title} -> {listing_title}"
+        listing_rate = movie_link.get('rate')
+        if listing_rate is not None and not _same_rating(listing_rate, rating):
+            return 'changed', f"评分变化: {rating or '无'} -> {listing_rate or '无'}"
+        
+        try:
+            crawled_at = datetime.strptime(crawl_time, '%Y-%m-%d %H:%M:%S')
+        except ValueError:
+            return 'stale', '记录时间未知'
+        if datetime.now() - crawled_at > self.refresh_max_age:
+            return 'stale', f"记录已超过 {self.refresh_max_age.days} 天"
+        return None
+    
+    def _should_refetch(self, movie_link):
+        """刷新模式下已爬取的电影是否需要重新抓取，并统计刷新结果"""
+        movie_url = movie_link['url']
+        if self.refresh_index is None or movie_url in self.refreshed_urls or not self._is_crawled(movie_url):
+            return False
+        
+        result = self._refresh_reason(movie_link)
+        if result is None:
+            self.refresh_stats['unchanged'] += 1
+            return False
+        
+        category, reason = result
+        self.refresh_stats[category] += 1
+        self.refreshed_urls.add(movie_url)
+        print(f"需要刷新 {movie_link.get('title') or movie_link['url']}: {reason}")
+        return True
+    
+    def print_tag_yields(self, limit=10):
+        """打印各标签平均每个列表请求发现的新电影数"""
+        requests = sum(count for count, _ in self.tag_yields.values())
+        discovered = sum(added for _, added in self.tag_yields.values())
+        print(f"标签列表请求 {requests} 个，平均每个请求发现 {discovered / requests:.1f} 部新电影")
+        ranked = sorted(self.tag_yields.items(), key=lambda item: item[1][1] / item[1][0], reverse=True)
+        for tag, (count, added) in ranked[:limit]:
+            print(f"  {tag}: {count} 页，新电影 {added} 部")
+    
+    def use_catalog_estimator(self, min_new_per_1000=None, window=100, report_every=50):
+        """按各标签列表页的重叠估计可爬取的电影总数，每report_every个列表页打印一次；
+        设置min_new_per_1000时，最近window个列表页中每1000个请求发现的新电影少于这个数就停止翻页"""
+        self.catalog_estimator = CatalogEstimator(window)
+        self.min_new_per_1000 = min_new_per_1000
+        self.catalog_report_every = report_every
+        if min_new_per_1000 is None:
+            print("已启用目录规模估计")
+        else:
+            print(f"已启用目录规模估计: 每1000个请求发现的新电影少于 {min_new_per_1000} 部时停止翻页")
+    
+    def _observe_listing(self, source, movie_links, added, fetch_details=True):
+        """把一页列表结果交给目录规模估计，added为本页的新电影数；
+        抓取详情页时每部新电影还要花一个请求。返回True表示产出已低于阈值，应停止翻页"""
+        estimator = self.catalog_estimator
+        # 空页或解析失败的页不是一次抽样
+        if estimator is None or not movie_links:
+            return False
+        estimator.observe(source, [subject_key(movie_link['url']) for movie_link in movie_links], added,
+                          1 + added if fetch_details else 1)
+        if estimator.samples % self.catalog_report_every == 0:
+            estimator.print_summary()
+        
+        if self.catalog_exhausted:
+            return True
+        rate = catalog_yield_below(estimator, self.min_new_per_1000)
+        if rate is None:
+            return False
+        self.catalog_exhausted = True
+        print(f"目录规模估计: 最近每1000个请求只发现 {rate:.0f} 部新电影，低于 {self.min_new_per_1000} 部，停止翻页")
+        estimator.print_summary()
+        return True
+    
+    def print_refresh_stats(self):
+        stats = self.refresh_stats
+        print(f"刷新统计: 列表信息变化 {stats['changed']} 部，记录过旧 {stats['stale']} 部，"
+              f"未变化跳过 {stats['unchanged']} 部")
+    
+    def use_refresh_scheduler(self, path='refresh_history.db'):
+        """记录每次爬取的评价人数和评分，用于估计电影变化的速度；应在打开结果输出之后调用"""
+        self.refresh_scheduler = RefreshScheduler(path)
+        if self.refresh_scheduler.count() == 0 and self.result_sink is not None:
+            self.result_sink.commit()
+            observed = self.refresh_scheduler.observe_all(self.result_sink.iter_records())
+            print(f"已根据 {observed} 条已保存记录初始化爬取历史")
+        print(f"已启用刷新计划: {path}，共 {self.refresh_scheduler.count()} 部电影有爬取历史")
+    
+    def close_refresh_scheduler(self):
+        if self.refresh_scheduler is not None:
+            self.refresh_scheduler.close()
+    
+    def _plan_refresh(self, daily_budget):
+        """选出今天剩余预算内最可能已经变化的电影"""
+        if self.refresh_scheduler is None:
+            self.use_refresh_scheduler()
+        
+        plan = self.refresh_scheduler.plan(daily_budget)
+        if not plan:
+            print(f"今天的刷新预算（{daily_budget} 个请求）已经用完")
+        else:
+            print(f"按变化可能性刷新 {len(plan)} 部电影，最高变化概率 {plan[0]['probability']:.1%}，"
+                  f"最低 {plan[-1]['probability']:.1%}")
+        return plan
+    
+    def refresh_by_change_likelihood(self, daily_budget=500):
+        """在每日请求预算内重新抓取最可能已经变化的电影"""
+        movies = []
+        for item in self._plan_refresh(daily_budget):
+            self._finish_refresh(movies, self.get_movie_detail(item['url'], force=True))
+        return movies
+    
+    def _finish_refresh(self, movies, movie_info):
+        """记录一次刷新请求，成功时写入结果"""
+        self.refresh_scheduler.record_refresh()
+        if movie_info:
+            self._collect(movies, movie_info)
+    
+    def use_graph_discovery(self, max_depth=None):
+        """解析详情页时取出推荐的电影加入任务队列，不需要额外的列表请求；
+        max_depth 限制从列表页出发沿推荐关系走的层数，None表示不限制"""
+        if self.frontier is None:
+            self.use_frontier()
+        self.graph_discovery = True
+        self.graph_max_depth = max_depth
+        print(f"已启用推荐关系发现，最大深度: {max_depth or '不限制'}")
+    
+    def _discover_related(self, movie_links, depth):
+        """把推荐的电影加入任务队列，层数越深优先级越低"""
+        priority = related_detail_priority(depth, self.graph_max_depth)
+        if priority is None:
+            return
+        self.graph_discovered += self._enqueue_movie_links(movie_links, priority, depth)
+    
+    def use_frontier(self, path='crawl_frontier.db'):
+        """使用持久化任务队列，中断后可以从中断的地方继续"""
+        self.frontier = CrawlFrontier(path)
+        print(f"已启用任务队列: {path}")
+    
+    def close_frontier(self):
+        if self.frontier is not None:
+            self.frontier.close()
+    
+    def _is_crawled(self, movie_url):
+        """判断电影是否已经爬取过；布隆过滤器判定不存在时不再查询已爬取集合"""
+        if self.seen_filter is not None and subject_key(movie_url) not in self.seen_filter:
+            return False
+        return movie_url in self.crawled_urls
+    
+    def _mark_crawled(self, movie_url):
+        """标记电影为已爬取"""
+        with self._crawled_lock:
+            if movie_url in self.crawled_urls:
+                return
+            try:
+                self.crawled_urls.add(movie_url)
+            except ValueError as e:
+                print(f"无法记录已爬取电影 {movie_url}: {e}")
+                return
+            if self.seen_filter is not None:
+                self.seen_filter.add(subject_key(movie_url))
+    
+    def close_result_sink(self):
+        """把未落盘的结果写入磁盘并关闭输出文件"""
+        if self.result_sink is not None:
+            self.result_sink.close()
+    
+    def _collect(self, movies, movie_info, depth=0):
+        """处理一部爬取成功的电影：写入结果输出，需要时保留在返回列表中
+        
+        depth 为这部电影距离列表页的推荐层数，它推荐的电影在下一层
+        """
+        related = movie_info.pop('recommendations', None)
+        if related and self.graph_discovery:
+            self._discover_related(related, depth + 1)
+        
+        self.collected_count += 1
+        if self.result_sink is not None:
+            self.result_sink.write(movie_info)
+        if self.refresh_scheduler is not None and not is_listing_record(movie_info):
+            self.refresh_scheduler.observe(movie_info)
+        if self.keep_in_memory:
+            movies.append(movie_info)
+    
+    def _archive_page(self, movie_url, response):
+        """把详情页原始内容写入归档"""
+        if self.page_archive is None:
+            return
+        try:
+            self.page_archive.write(movie_url, response.content, response.encoding)
+        except Exception as e:
+            print(f"写入归档失败 {movie_url}: {e}")
+    
+    def _request(self, url, kind, timeout, use_cache=True):
+        """在限速控制下发起请求，并把响应情况反馈给限速控制器"""
+        # 缓存未过期时不占用请求配额；刷新时跳过，仍会用条件请求验证缓存
+        response = self.transport.get_cached(url) if use_cache else None
+        if response is not None:
+            return response
+        
+        self.rate_controller.acquire(kind)
+        try:
+            response = self.transport.get(url, headers=self.headers, timeout=timeout)
+        except Exception:
+            self.rate_controller.record(kind, None, None)
+            raise
+        
+        self.rate_controller.record(kind, response.request_time, response.status_code,
+                                    response.headers.get('Retry-After'))
+        response.raise_for_status()
+        return response
+    
+    def get_movie_list_from_tag(self, tag, start=0, sort='recommend'):
         """通过标签获取电影列表"""
-        tag_url = f"https://movie.douban.com/j/search_subjects?type=movie&tag={tag}&sort=recommend&page_limit=20&page_start={start}"
+        tag_url = f"https://movie.douban.com/j/search_subjects?type=movie&tag={tag}&sort={sort}&page_limit=20&page_start={start}"
         try:
-            time.sleep(random.uniform(1, 3))
-            response = requests.get(tag_url, headers=self.headers, timeout=15)
-            response.raise_for_status()
+            response = self._request(tag_url, 'listing', timeout=15)
             return response.json()
         except Exception as e:
             print(f"获取标签 '{tag}' 电影失败: {e}")
@@ -51,9 +479,7 @@ class DoubanMovieCrawlerUnlimited:
         """从Top250获取电影列表"""
         url = f"{self.base_url}/top250?start={start}&filter="
         try:
-            time.sleep(random.uniform(1, 3))
-            response = requests.get(url, headers=self.headers, timeout=15)
-            response.raise_for_status()
+            response = self._request(url, 'listing', timeout=15)
             return response.text
         except Exception as e:
             print(f"获取Top250电影列表失败: {e}")
@@ -66,11 +492,14 @@ class DoubanMovieCrawlerUnlimited:
         
         movie_link_elements = soup.find_all('a', href=lambda x: x and '/subject/' in x)
         
+        seen = set()
         for link in movie_link_elements:
-            url = link.get('href')
+            url = canonical_subject_url(link.get('href'))
             title = link.get_text(strip=True)
             
-            if url and title and len(title) > 1:
+            # 同一部电影在页面中可能有多个链接
+            if url and title and len(title) > 1 and url not in seen:
+                seen.add(url)
                 movie_links.append({
                     'url': url,
                     'title': title
@@ -84,95 +513,92 @@ class DoubanMovieCrawlerUnlimited:
         if tag_data and 'subjects' in tag_data:
             for movie in tag_data['subjects']:
                 movie_links.append({
-                    'url': movie.get('url', ''),
+                    'url': canonical_subject_url(movie.get('url', '')),
                     'title': movie.get('title', ''),
                     'rate': movie.get('rate', ''),
                     'cover': movie.get('cover', '')
                 })
         return movie_links
     
-    def get_movie_detail(self, movie_url):
-        """获取电影详细信息"""
+    def build_listing_info(self, movie_link):
+        """只用列表页中的信息生成电影记录，不抓取详情页"""
+        return {
+            'title': movie_link.get('title', ''),
+            'rating': movie_link.get('rate', ''),
+            'poster_url': movie_link.get('cover', ''),
+            'douban_url': movie_link['url'],
+            'crawl_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'record_level': LISTING_RECORD,
+        }
+    
+    def _collect_listings(self, results, movie_links):
+        """写入列表记录，跳过已有详情或本次已写入的电影；返回写入数量"""
+        added = 0
+        for movie_link in movie_links:
+            movie_url = movie_link['url']
+            if not movie_url or self._is_crawled(movie_url) or movie_url in self.listed_urls:
+                continue
+            self.listed_urls.add(movie_url)
+            self._collect(results, self.build_listing_info(movie_link))
+            added += 1
+        return added
+    
+    def request_details(self, movies, fields=None, priority=PRIORITY_DETAIL):
+        """把需要详情的电影加入任务队列，之后由 crawl_frontier 抓取
+        
+        movies 可以是电影记录或豆瓣链接；指定fields时只加入缺少其中某个字段的记录
+        """
+        if self.frontier is None:
+            self.use_frontier()
+        
+        added = 0
+        for movie in movies:
+            if isinstance(movie, str):
+                movie_url, title = movie, ''
+            else:
+                if fields and all(movie.get(field) for field in fields):
+                    continue
+                movie_url, title = movie.get('douban_url'), movie.get('title', '')
+            
+            if not movie_url or self._is_crawled(movie_url):
+                continue
+            subject_id = extract_subject_id(movie_url)
+            if self.frontier.push('detail', f"detail:{subject_id or movie_url}", url=movie_url,
+                                  payload={'title': title}, priority=priority):
+                added += 1
+        
+        print(f"已加入 {added} 个详情页任务")
+        return added
+    
+    def get_movie_detail(self, movie_url, force=False):
+        """获取电影详细信息；force为True时即使已经爬取过也重新抓取
+        
+        同一部电影正在由其他线程抓取时等待它完成并返回None，结果由发起请求的一方写入
+        """
+        movie_url = canonical_subject_url(movie_url)
         # 检查是否已经爬取过
-        if movie_url in self.crawled_urls:
+        if not force and self._is_crawled(movie_url):
             return None
-            
+        
+        movie_info, shared = self.detail_flight.do(
+            subject_key(movie_url), functools.partial(self._fetch_movie_detail, movie_url, force)
+        )
+        return None if shared else movie_info
+    
+    def _fetch_movie_detail(self, movie_url, force):
+        """领取到这部电影后抓取并解析详情页"""
+        # 检查之后、领取之前，其他线程可能已经爬完这部电影
+        if not force and self._is_crawled(movie_url):
+            return None
+        
         try:
-            time.sleep(random.uniform(2, 4))
-            
-            response = requests.get(movie_url, headers=self.headers, timeout=20)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # 提取电影信息
-            movie_info = {}
-            
-            # 电影标题
-            title_element = soup.find('h1')
-            if title_element:
-                movie_info['title'] = title_element.text.strip()
-            
-            # 年份
-            year_element = soup.find('span', class_='year')
-            if year_element:
-                movie_info['year'] = year_element.text.strip('()')
-            
-            # 评分
-            rating_element = soup.find('strong', class_='ll rating_num')
-            if rating_element:
-                movie_info['rating'] = rating_element.text.strip()
-            
-            # 评价人数
-            votes_element = soup.find('a', class_='rating_people')
-            if votes_element:
-                movie_info['votes'] = votes_element.text.strip()
-            
-            # 导演
-            director_element = soup.find('a', rel='v:directedBy')
-            if director_element:
-                movie_info['director'] = director_element.text.strip()
-            
-            # 演员列表
-            actors = []
-            actor_elements = soup.find_all('a', rel='v:starring')
-            for actor in actor_elements[:5]:
-                actors.append(actor.text.strip())
-            movie_info['actors'] = actors
-            
-            # 类型
-            genres = []
-            genre_elements = soup.find_all('span', property='v:genre')
-            for genre in genre_elements:
-                genres.append(genre.text.strip())
-            movie_info['genres'] = genres
-            
-            # 上映日期
-            release_date_element = soup.find('span', property='v:initialReleaseDate')
-            if release_date_element:
-                movie_info['release_date'] = release_date_element.text.strip()
-            
-            # 片长
-            runtime_element = soup.find('span', property='v:runtime')
-            if runtime_element:
-                movie_info['runtime'] = runtime_element.text.strip()
+            response = self._request(movie_url, 'detail', timeout=20, use_cache=not force)
+            self._archive_page(movie_url, response)
             
-            # 简介
-            summary_element = soup.find('span', property='v:summary')
-            if summary_element:
-                movie_info['summary'] = summary_element.text.strip()
-            
-            # 封面图片
-            poster_element = soup.find('img', rel='v:image')
-            if poster_element:
-                movie_info['poster_url'] = poster_element.get('src')
-            
-            # 豆瓣链接
-            movie_info['douban_url'] = movie_url
-            movie_info['crawl_time'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            movie_info = self.parse_movie_detail(response.text, movie_url)
             
             # 标记为已爬取
-            self.crawled_urls.add(movie_url)
+            self._mark_crawled(movie_url)
             
             return movie_info
             
@@ -180,120 +606,334 @@ class DoubanMovieCrawlerUnlimited:
             print(f"获取电影详情失败 {movie_url}: {e}")
             return None
     
-    def crawl_from_tag(self, tag, max_pages=50):
-        """从指定标签爬取电影"""
+    def parse_movie_detail(self, html, movie_url):
+        """解析电影详情页面，不涉及网络请求"""
+        return build_movie_info(self.detail_parser, html, movie_url, self.graph_discovery)
+    
+    def crawl_from_tag(self, tag, max_pages=50, resume=False, sort='recommend'):
+        """从指定标签爬取电影；resume为True时从上次完成的页继续"""
         all_movies = []
-        page = 0
+        start_count = self.collected_count
+        
+        page = self._resume_page(tag, sort) if resume else 0
+        if page is None:
+            return all_movies
         
         print(f"开始从标签 '{tag}' 爬取电影...")
         
-        while page < max_pages:
-            print(f"正在爬取第 {page + 1} 页...")
-            
-            tag_data = self.get_movie_list_from_tag(tag, page * 20)
-            if not tag_data or not tag_data.get('subjects'):
-                print(f"标签 '{tag}' 第 {page + 1} 页无数据，停止爬取")
-                break
+        progress = self._tag_progress()
+        pages = self._iter_listing_pages(functools.partial(self.get_movie_list_from_tag, tag, sort=sort),
+                                         range(page * 20, max_pages * 20, 20))
+        with closing(pages):
+            for start, tag_data in pages:
+                movie_links = self._tag_page_links(tag, sort, start, tag_data, progress)
+                if movie_links is None:
+                    break
                 
-            movie_links = self.parse_tag_movies(tag_data)
-            if not movie_links:
-                print(f"标签 '{tag}' 第 {page + 1} 页解析失败")
-                break
-            
-            page_movies = 0
-            for movie_link in movie_links:
-                print(f"正在爬取: {movie_link['title']}")
-                movie_detail = self.get_movie_detail(movie_link['url'])
+                novelty = self._page_novelty(movie_links)
+                page_movies = 0
+                for movie_link in movie_links:
+                    print(f"正在爬取: {movie_link['title']}")
+                    movie_detail = self.get_movie_detail(movie_link['url'], self._should_refetch(movie_link))
+                    
+                    if movie_detail:
+                        self._collect(all_movies, movie_detail)
+                        page_movies += 1
+                        print(f"✓ 成功爬取: {movie_detail['title']}")
                 
-                if movie_detail:
-                    all_movies.append(movie_detail)
-                    page_movies += 1
-                    print(f"✓ 成功爬取: {movie_detail['title']}")
-                
-                # 每爬取5部电影休息一下
-                if page_movies % 5 == 0 and page_movies > 0:
-                    print("休息5秒...")
-                    time.sleep(5)
-            
-            page += 1
-            
-            # 每页爬取完成后休息
-            print(f"第 {page} 页完成，休息10秒...")
-            time.sleep(10)
+                if self._finish_tag_page(tag, sort, start, movie_links, novelty, page_movies, progress, max_pages):
+                    break
+        
+        print(f"标签 '{tag}' 爬取完成，共 {self.collected_count - start_count} 部电影")
+        return all_movies
+    
+    # 以下按标签、Top250和任务队列爬取时每一页的处理由同步和异步版本共用，两者只负责发请求和抓取详情
+    
+    def _tag_progress(self):
+        """crawl_from_tag 一次运行中跨页的状态"""
+        # 某一页有详情抓取失败后，本次运行不再推进翻页进度，继续爬取时从这一页重试
+        return {'low_streak': 0, 'cursor_held': False}
+    
+    def _tag_page_links(self, tag, sort, start, tag_data, progress):
+        """检查一页标签列表，返回本页的电影链接；没有更多数据或解析失败时返回None，应停止翻页"""
+        page = start // 20
+        print(f"正在爬取第 {page + 1} 页...")
+        
+        if not tag_data or not tag_data.get('subjects'):
+            print(f"标签 '{tag}' 第 {page + 1} 页无数据，停止爬取")
+            if tag_data is not None and not progress['cursor_held']:
+                self.tag_cursors.advance(tag, sort, start, exhausted=True)
+            return None
+        
+        movie_links = self.parse_tag_movies(tag_data)
+        if not movie_links:
+            print(f"标签 '{tag}' 第 {page + 1} 页解析失败")
+            return None
+        return movie_links
+    
+    def _finish_tag_page(self, tag, sort, start, movie_links, novelty, page_movies, progress, max_pages):
+        """一页的详情抓取完成后推进翻页进度，返回True表示应停止翻页"""
+        page = start // 20 + 1
+        self._advance_tag_cursor(tag, sort, page, movie_links, progress)
+        
+        print(f"第 {page} 页完成，本页新增 {page_movies} 部电影")
+        self.rate_controller.print_status()
+        
+        if self._observe_listing(tag, movie_links, round(novelty * len(movie_links))):
+            return True
+        if self.incremental:
+            progress['low_streak'] = self._low_novelty_streak(progress['low_streak'], novelty)
+            if progress['low_streak'] >= self.novelty_patience and page < max_pages:
+                self._stop_tag_early(tag, page, max_pages, self.listing_window)
+                return True
+        return False
+    
+    def _advance_tag_cursor(self, tag, sort, page, movie_links, progress):
+        """一页的详情都抓取成功后才推进翻页进度，之后的页不再推进"""
+        # 已爬取过的和由其他线程抓取的电影返回None但已记录，没有记录的就是抓取失败；
+        # 没有链接或链接中没有条目ID的条目不会抓取成功，不因为它们停住进度
+        failed = sum(1 for movie_link in movie_links
+                     if extract_subject_id(movie_link['url']) is not None
+                     and not self._is_crawled(movie_link['url']))
+        if failed and not progress['cursor_held']:
+            print(f"第 {page} 页有 {failed} 部电影抓取失败，翻页进度停在这一页")
+            progress['cursor_held'] = True
+        if not progress['cursor_held']:
+            self.tag_cursors.advance(tag, sort, page * 20)
+    
+    def _top250_page_links(self, start, html):
+        """检查一页Top250列表，返回本页的电影链接；获取或解析失败时返回None"""
+        print(f"正在爬取第 {start + 1} 到 {min(start + 25, 250)} 部电影...")
+        
+        if not html:
+            print("无法获取Top250电影列表，程序退出")
+            return None
+        
+        movie_links = self.parse_top250_movies(html)
+        if not movie_links:
+            print("无法解析Top250电影链接，程序退出")
+            return None
+        return movie_links
+    
+    def _listing_pages(self, max_pages):
+        """快速模式要请求的页码；目录产出已低于阈值时不再翻页，各标签同时进行时也在这里停下"""
+        for page in range(max_pages):
+            if self.catalog_exhausted:
+                return
+            yield page
+    
+    def _tag_listing_page(self, tag, page, tag_data, results):
+        """快速模式写入一页列表记录，返回True表示应停止翻页"""
+        if not tag_data or not tag_data.get('subjects'):
+            print(f"标签 '{tag}' 第 {page + 1} 页无数据，停止爬取")
+            return True
+        
+        movie_links = self.parse_tag_movies(tag_data)
+        added = self._collect_listings(results, movie_links)
+        print(f"标签 '{tag}' 第 {page + 1} 页: 写入 {added} 条列表记录")
+        return self._observe_listing(tag, movie_links, added, fetch_details=False)
+    
+    def _resume_page(self, tag, sort):
+        """根据翻页进度返回继续爬取的页码，已经没有更多页时返回None"""
+        cursor = self.tag_cursors.get(tag, sort)
+        if not cursor:
+            return 0
+        if cursor['exhausted']:
+            print(f"标签 '{tag}' 上次已经爬完所有页，跳过")
+            return None
+        page = cursor['next_start'] // 20
+        print(f"标签 '{tag}' 从第 {page + 1} 页继续，跳过 {page} 个已完成的列表页")
+        return page
+    
+    def crawl_tag_listings(self, tag, max_pages=50, sort='recommend'):
+        """快速模式：只保存列表页中的信息（每个请求约20部电影），不抓取详情页"""
+        all_movies = []
+        start_count = self.collected_count
+        
+        print(f"开始从标签 '{tag}' 快速爬取列表...")
+        
+        for page in self._listing_pages(max_pages):
+            tag_data = self.get_movie_list_from_tag(tag, page * 20, sort)
+            if self._tag_listing_page(tag, page, tag_data, all_movies):
+                break
+        
+        print(f"标签 '{tag}' 快速爬取完成，共 {self.collected_count - start_count} 部电影")
+        return all_movies
+    
+    def crawl_listings(self, max_tags=None, max_pages=30):
+        """快速模式爬取所有标签"""
+        all_movies = []
+        tags_to_crawl = self.popular_tags[:max_tags] if max_tags else self.popular_tags
+        
+        for i, tag in enumerate(tags_to_crawl, 1):
+            if self.catalog_exhausted:
+                break
+            print(f"\n进度: {i}/{len(tags_to_crawl)} - 标签: {tag}")
+            all_movies.extend(self.crawl_tag_listings(tag, max_pages))
         
-        print(f"标签 '{tag}' 爬取完成，共 {len(all_movies)} 部电影")
         return all_movies
     
     def crawl_from_top250(self):
         """从Top250爬取电影"""
         all_movies = []
-        start = 0
+        start_count = self.collected_count
         
         print("开始从Top250爬取电影...")
         
-        while start < 250:
-            print(f"正在爬取第 {start + 1} 到 {min(start + 25, 250)} 部电影...")
-            
-            html = self.get_movie_list_from_top250(start)
-            if not html:
-                print("无法获取Top250电影列表，程序退出")
-                break
+        # 十个列表页的位置事先已知，启用预取时提前请求
+        pages = self._iter_listing_pages(self.get_movie_list_from_top250, range(0, 250, 25))
+        with closing(pages):
+            for start, html in pages:
+                movie_links = self._top250_page_links(start, html)
+                if movie_links is None:
+                    break
                 
-            movie_links = self.parse_top250_movies(html)
-            if not movie_links:
-                print("无法解析Top250电影链接，程序退出")
-                break
-            
-            for movie_link in movie_links:
-                print(f"正在爬取: {movie_link['title']}")
-                movie_detail = self.get_movie_detail(movie_link['url'])
+                for movie_link in movie_links:
+                    print(f"正在爬取: {movie_link['title']}")
+                    movie_detail = self.get_movie_detail(movie_link['url'], self._should_refetch(movie_link))
+                    
+                    if movie_detail:
+                        self._collect(all_movies, movie_detail)
+                        print(f"✓ 成功爬取: {movie_detail['title']}")
                 
-                if movie_detail:
-                    all_movies.append(movie_detail)
-                    print(f"✓ 成功爬取: {movie_detail['title']}")
-                
-                # 每爬取5部电影休息一下
-                if len(all_movies) % 5 == 0 and len(all_movies) > 0:
-                    print("休息5秒...")
-                    time.sleep(5)
-            
-            start += 25
-            
-            # 每页爬取完成后休息
-            print("休息10秒...")
-            time.sleep(10)
+                self.rate_controller.print_status()
         
-        print(f"Top250爬取完成，共 {len(all_movies)} 部电影")
+        print(f"Top250爬取完成，共 {self.collected_count - start_count} 部电影")
         return all_movies
     
     def crawl_all_movies(self, max_tags=None):
-        """爬取所有可能的电影"""
-        all_movies = []
+        """爬取所有可能的电影：Top250和各个标签的列表页作为任务加入队列，按优先级执行"""
+        self._seed_frontier(max_tags)
+        return self.crawl_frontier()
+    
+    def _seed_frontier(self, max_tags=None, max_pages=30):
+        """准备任务队列并加入Top250各页和每个标签的第一页；已在队列中的任务不会重复加入"""
+        if self.frontier is None:
+            self.use_frontier()
         
-        # 先爬取Top250
-        print("=" * 60)
-        print("第一阶段：爬取Top250电影")
-        print("=" * 60)
-        top250_movies = self.crawl_from_top250()
-        all_movies.extend(top250_movies)
+        if not self.frontier.has_unfinished():
+            # 上一轮已经全部完成，重新开始新一轮
+            self.frontier.clear_finished()
+        tags_to_crawl = self.popular_tags[:max_tags] if max_tags else self.popular_tags
+        seed_frontier(self.frontier, tags_to_crawl, max_pages)
+        self.frontier.print_status()
+    
+    def _enqueue_movie_links(self, movie_links, priority, depth=0):
+        """把未爬取的电影加入任务队列，有评分的按评分提高优先级；返回新加入的数量"""
+        added = 0
+        for movie_link in movie_links:
+            movie_url = movie_link['url']
+            if not movie_url:
+                continue
+            
+            # 刷新的任务使用单独的键，不与已完成的详情任务冲突
+            force = self._should_refetch(movie_link)
+            if not force and self._is_crawled(movie_url):
+                continue
+            subject_id = extract_subject_id(movie_url)
+            try:
+                rating = float(movie_link.get('rate') or 0)
+            except ValueError:
+                rating = 0.0
+            task_key = f"{'refresh' if force else 'detail'}:{subject_id or movie_url}"
+            if self.frontier.push('detail', task_key, url=movie_url, priority=priority + rating,
+                                  payload={'title': movie_link.get('title', ''), 'force': force, 'depth': depth}):
+                added += 1
+        return added
+    
+    def _listing_task_request(self, task):
+        """列表页任务对应的请求，返回不带参数的可调用对象"""
+        payload = task['payload']
+        if task['kind'] == 'top250':
+            return functools.partial(self.get_movie_list_from_top250, payload['start'])
+        return functools.partial(self.get_movie_list_from_tag, payload['tag'], payload['page'] * 20)
+    
+    def _detail_task_done(self, task):
+        """详情页任务对应的电影已经爬取过（不需要刷新）"""
+        return not task['payload'].get('force', False) and self._is_crawled(task['url'])
+    
+    def _finish_detail_task(self, task, movie_info, results):
+        """处理详情页任务的结果，成功返回True"""
+        if movie_info is None:
+            # 同一部电影正在由其他任务抓取时，由那个任务写入结果
+            return self._detail_task_done(task)
+        self._collect(results, movie_info, task['payload'].get('depth', 0))
+        print(f"✓ 成功爬取: {movie_info.get('title', task['url'])}")
+        return True
+    
+    def _settle_frontier_task(self, task, succeeded):
+        """按执行结果把任务标记为完成或失败"""
+        if succeeded:
+            self.frontier.complete(task['task_id'])
+        else:
+            self.frontier.fail(task['task_id'], f"{task['kind']} 任务失败")
+    
+    def _finish_listing_task(self, task, data):
+        """处理列表页任务的结果：加入详情页任务，标签还有下一页时加入下一页；请求失败时返回False"""
+        if data is None:
+            return False
+        payload = task['payload']
+        if task['kind'] == 'top250':
+            movie_links = self.parse_top250_movies(data)
+            added = self._enqueue_movie_links(movie_links, PRIORITY_TOP250_DETAIL)
+            print(f"Top250第 {payload['start'] + 1} 名起: 新加入 {added} 部电影")
+            self._observe_listing('Top250', movie_links, added)
+            return True
         
-        # 从热门标签爬取
-        print("\n" + "=" * 60)
-        print("第二阶段：从热门标签爬取电影")
-        print("=" * 60)
+        movie_links = self.parse_tag_movies(data)
+        novelty = self._page_novelty(movie_links)
+        added = self._enqueue_movie_links(movie_links, PRIORITY_DETAIL)
+        requests, discovered = self.tag_yields.get(payload['tag'], (0, 0))
+        self.tag_yields[payload['tag']] = (requests + 1, discovered + added)
         
-        tags_to_crawl = self.popular_tags[:max_tags] if max_tags else self.popular_tags
+        tag_yield, next_payload, stop_reason = next_tag_page(
+            payload, len(movie_links), added, novelty,
+            self.novelty_threshold if self.incremental else None, self.novelty_patience)
+        print(f"标签 '{payload['tag']}' 第 {payload['page'] + 1} 页: 新加入 {added} 部电影，"
+              f"新电影比例估计 {tag_yield:.0%}")
         
-        for i, tag in enumerate(tags_to_crawl, 1):
-            print(f"\n进度: {i}/{len(tags_to_crawl)} - 标签: {tag}")
-            tag_movies = self.crawl_from_tag(tag, max_pages=30)
-            all_movies.extend(tag_movies)
+        if self._observe_listing(payload['tag'], movie_links, added):
+            return True
+        if stop_reason == 'low_novelty':
+            self._stop_tag_early(payload['tag'], payload['page'] + 1, payload['max_pages'])
+        if next_payload is not None:
+            push_tag_page(self.frontier, next_payload)
+        return True
+    
+    def _run_frontier_task(self, task, results):
+        """执行一个任务，成功返回True"""
+        if task['kind'] == 'detail':
+            if self._detail_task_done(task):
+                return True
+            print(f"正在爬取: {task['payload'].get('title') or task['url']}")
+            movie_info = self.get_movie_detail(task['url'], task['payload'].get('force', False))
+            return self._finish_detail_task(task, movie_info, results)
+        
+        return self._finish_listing_task(task, self._listing_task_request(task)())
+    
+    def crawl_frontier(self):
+        """从任务队列中取任务执行，直到队列为空"""
+        all_movies = []
+        start_count = self.collected_count
+        finished = 0
+        
+        while True:
+            task = self.frontier.pop()
+            if task is None:
+                wait = self.frontier.next_wait()
+                if wait is None:
+                    break
+                time.sleep(wait)
+                continue
+            
+            self._settle_frontier_task(task, self._run_frontier_task(task, all_movies))
             
-            # 每爬取5个标签休息一下
-            if i % 5 == 0:
-                print(f"已爬取 {i} 个标签，休息30秒...")
-                time.sleep(30)
+            finished += 1
+            if finished % 20 == 0:
+                self.frontier.print_status()
+                self.rate_controller.print_status()
         
+        print(f"任务队列已清空，共爬取 {self.collected_count - start_count} 部电影")
         return all_movies
     
     def save_to_json(self, movies, filename='douban_movies_unlimited.json'):
@@ -305,61 +945,254 @@ class DoubanMovieCrawlerUnlimited:
         except Exception as e:
             print(f"保存文件失败: {e}")
     
-    def load_crawled_urls(self, filename='crawled_urls_unlimited.json'):
-        """加载已爬取的URL列表"""
-        if os.path.exists(filename):
+    def load_crawled_urls(self, filename=CRAWLED_SUBJECTS_FILE):
+        """加载已爬取的电影记录；.json文件按旧的URL列表格式读取"""
+        if filename.endswith('.json'):
+            if os.path.exists(filename):
+                try:
+                    with open(filename, 'r', encoding='utf-8') as f:
+                        self.crawled_urls.update(json.load(f))
+                    print(f"加载了 {len(self.crawled_urls)} 个已爬取的URL")
+                except Exception as e:
+                    print(f"加载已爬取URL失败: {e}")
+            return
+        
+        migrate = not os.path.exists(filename) and os.path.exists(LEGACY_CRAWLED_URLS_FILE)
+        loaded = SubjectIdSet(filename)
+        loaded.update(self.crawled_urls)
+        self.crawled_urls = loaded
+        
+        # 第一次使用位图文件时，导入旧版本保存的URL列表
+        if migrate:
             try:
-                with open(filename, 'r', encoding='utf-8') as f:
-                    self.crawled_urls = set(json.load(f))
-                print(f"加载了 {len(self.crawled_urls)} 个已爬取的URL")
+                with open(LEGACY_CRAWLED_URLS_FILE, 'r', encoding='utf-8') as f:
+                    legacy_urls = json.load(f)
+                self.crawled_urls.update(legacy_urls)
+                self.crawled_urls.compact()
+                # 同一部电影的不同写法（http/https、结尾斜杠、查询参数、移动版）合并为一个条目ID
+                print(f"已从 {LEGACY_CRAWLED_URLS_FILE} 迁移 {len(legacy_urls)} 个URL，"
+                      f"合并为 {len(self.crawled_urls)} 部电影")
             except Exception as e:
-                print(f"加载已爬取URL失败: {e}")
+                print(f"迁移已爬取URL失败: {e}")
+        print(f"加载了 {len(self.crawled_urls)} 部已爬取的电影")
     
-    def save_crawled_urls(self, filename='crawled_urls_unlimited.json'):
-        """保存已爬取的URL列表"""
+    def save_crawled_urls(self, filename=CRAWLED_SUBJECTS_FILE):
+        """保存已爬取的电影记录；.json文件按旧的URL列表格式保存"""
         try:
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(list(self.crawled_urls), f, ensure_ascii=False, indent=2)
-            print(f"保存了 {len(self.crawled_urls)} 个已爬取的URL")
+            if filename.endswith('.json'):
+                urls = [canonical_subject_url(subject_id) for subject_id in self.crawled_urls]
+                with open(filename, 'w', encoding='utf-8') as f:
+                    json.dump(urls, f, ensure_ascii=False, indent=2)
+            elif self.crawled_urls.path == filename:
+                # 先把日志落盘，压缩中途出错也不会丢失新增的记录
+                self.crawled_urls.flush()
+                self.crawled_urls.compact()
+            else:
+                saved = SubjectIdSet(filename)
+                saved.update(self.crawled_urls)
+                saved.close()
+            if self.seen_filter is not None:
+                self.seen_filter.save(self.seen_filter_path)
+            print(f"保存了 {len(self.crawled_urls)} 部已爬取的电影")
         except Exception as e:
-            print(f"保存已爬取URL失败: {e}")
+            print(f"保存已爬取记录失败: {e}")
 
-def main():
-    """主函数"""
-    print("豆瓣电影爬虫 - 无上限版本")
-    print("=" * 60)
-    print("本程序将爬取大量电影信息，包括：")
-    print("1. Top250电影")
-    print("2. 40+个热门标签的电影")
-    print("3. 预计可爬取数千部电影")
-    print("=" * 60)
+def _same_rating(listing_rate, stored_rating):
+    """列表页评分和已保存的评分是否相同"""
+    if not listing_rate and not stored_rating:
+        return True
+    try:
+        return abs(float(listing_rate) - float(stored_rating)) < 0.05
+    except (TypeError, ValueError):
+        return listing_rate == stored_rating
+
+# 任务队列模式的调度规则，爬虫和爬取模拟器共用
+
+def seed_frontier(frontier, tags, max_pages=30):
+    """加入Top250各页和每个标签的第一页；已在队列中的任务不会重复加入"""
+    for start in range(0, 250, 25):
+        frontier.push('top250', f"top250:{start}", payload={'start': start}, priority=PRIORITY_TOP250_LISTING)
+    for i, tag in enumerate(tags):
+        frontier.push('tag', f"tag:{tag}:0", payload={'tag': tag, 'page': 0, 'max_pages': max_pages},
+                      priority=PRIORITY_TAG_FIRST_PAGE - i * 0.01)
+
+
+def low_novelty_streak(streak, novelty, threshold):
+    """更新连续低新颖度页数"""
+    return streak + 1 if novelty < threshold else 0
+
+
+def next_tag_page(payload, listed, added, novelty, novelty_threshold=None, patience=None):
+    """标签列表页完成后更新新电影比例的估计，并决定是否继续翻页
+
+    listed 为本页的条目数，added 为新加入队列的电影数，novelty 为尚未爬取的比例；
+    novelty_threshold 为None时不按增量模式停止。返回 (新电影比例估计, 下一页的payload, 停止原因)，
+    停止原因为 'empty'（空页）、'max_pages'（已到最大页数）或 'low_novelty'（连续多页新电影太少），继续翻页时为None
+    """
+    # 新电影比例的指数加权平均，之后各标签交替进行，比例高的标签先爬下一页
+    page_yield = added / listed if listed else 0.0
+    tag_yield = TAG_YIELD_SMOOTHING * page_yield + (1 - TAG_YIELD_SMOOTHING) * payload.get('tag_yield', 1.0)
+
+    next_page = payload['page'] + 1
+    if not listed:
+        return tag_yield, None, 'empty'
+    if next_page >= payload['max_pages']:
+        return tag_yield, None, 'max_pages'
+
+    low_streak = payload.get('low_streak', 0)
+    if novelty_threshold is not None:
+        low_streak = low_novelty_streak(low_streak, novelty, novelty_threshold)
+        if low_streak >= patience:
+            return tag_yield, None, 'low_novelty'
+    return tag_yield, dict(payload, page=next_page, low_streak=low_streak, tag_yield=tag_yield), None
+
+
+def push_tag_page(frontier, payload):
+    """加入标签的下一页，新电影比例估计越高越先爬"""
+    return frontier.push('tag', f"tag:{payload['tag']}:{payload['page']}", payload=payload,
+                         priority=PRIORITY_TAG_LISTING * payload['tag_yield'])
+
+
+def related_detail_priority(depth, max_depth=None):
+    """推荐发现的详情页优先级，层数越深越低；超过最大深度时返回None"""
+    if max_depth is not None and depth > max_depth:
+        return None
+    return PRIORITY_RELATED_DETAIL - RELATED_DEPTH_STEP * (depth - 1)
+
+
+def catalog_yield_below(estimator, min_new_per_1000):
+    """目录规模估计已稳定、且最近每1000个请求发现的新电影少于阈值时返回这个产出，否则返回None"""
+    if min_new_per_1000 is None or not estimator.warmed_up():
+        return None
+    rate = estimator.new_per_1000_requests()
+    return rate if rate < min_new_per_1000 else None
+
+
+def print_movie_statistics(movies):
+    """逐条统计电影信息，movies可以是任意可迭代对象"""
+    ratings = []
+    year_counts = {}
+    genre_counts = {}
+    preview = []
     
-    crawler = DoubanMovieCrawlerUnlimited()
+    for movie in movies:
+        if movie.get('rating') and movie.get('rating') != '0':
+            ratings.append(float(movie['rating']))
+        if movie.get('year'):
+            year_counts[movie['year']] = year_counts.get(movie['year'], 0) + 1
+        for genre in movie.get('genres') or []:
+            genre_counts[genre] = genre_counts.get(genre, 0) + 1
+        if len(preview) < 20:
+            preview.append(movie)
+    
+    if ratings:
+        avg_rating = sum(ratings) / len(ratings)
+        print(f"平均评分: {avg_rating:.1f}")
+        print(f"最高评分: {max(ratings):.1f}")
+        print(f"最低评分: {min(ratings):.1f}")
+    
+    # 统计年份分布
+    if year_counts:
+        print(f"\n年份分布 (前10):")
+        sorted_years = sorted(year_counts.items(), key=lambda x: x[1], reverse=True)[:10]
+        for year, count in sorted_years:
+            print(f"  {year}: {count}部")
     
+    # 统计类型分布
+    if genre_counts:
+        print(f"\n类型分布 (前10):")
+        sorted_genres = sorted(genre_counts.items(), key=lambda x: x[1], reverse=True)[:10]
+        for genre, count in sorted_genres:
+            print(f"  {genre}: {count}部")
+    
+    print(f"\n前20部电影信息预览：")
+    for i, movie in enumerate(preview, 1):
+        print(f"{i:2d}. {movie.get('title', 'N/A')} ({movie.get('year', 'N/A')}) - 评分: {movie.get('rating', 'N/A')}")
+
+def report_results(crawler, output='douban_movies_unlimited.json'):
+    """把结果输出（JSONL或SQLite）导出为JSON数组文件并打印统计信息"""
+    if not crawler.result_sink or not crawler.result_sink.written:
+        print("没有成功爬取到任何电影信息")
+        return
+    
+    unique_count = crawler.result_sink.export_json(output)
+    print(f"✓ 成功保存 {unique_count} 部电影信息到 {output}")
+    
+    print("\n" + "=" * 60)
+    print("爬取完成！统计信息：")
+    print(f"本次爬取电影数量: {crawler.result_sink.written}")
+    print(f"结果文件中去重后电影数量: {unique_count}")
+    crawler.transport.print_stats()
+    if crawler.detail_flight.coalesced:
+        print(f"合并的重复详情页请求: {crawler.detail_flight.coalesced} 个")
+    if crawler.tag_yields:
+        crawler.print_tag_yields()
+    if crawler.graph_discovered:
+        print(f"通过推荐关系发现的电影: {crawler.graph_discovered} 部（不需要列表请求）")
+    if crawler.catalog_estimator is not None and crawler.catalog_estimator.samples:
+        crawler.catalog_estimator.print_summary()
+    if crawler.listing_requests_saved:
+        print(f"增量模式节省的列表请求: 最多 {crawler.listing_requests_saved} 个")
+    if crawler.refresh_index is not None:
+        crawler.print_refresh_stats()
+    
+    print_movie_statistics(crawler.result_sink.iter_movies())
+
+def ask_resume(crawler, tag):
+    """该标签有翻页进度时询问是否从上次的位置继续"""
+    cursor = crawler.tag_cursors.get(tag)
+    if not cursor:
+        return False
+    answer = input(f"标签 '{tag}' 上次爬到第 {cursor['next_start'] // 20} 页，是否继续？(Y/n): ")
+    return answer.strip().lower() != 'n'
+
+def open_result_output(crawler):
+    """询问结果存储方式并打开对应的输出"""
+    if input("是否把结果写入SQLite数据库（默认写入JSONL文件）？(y/N): ").strip().lower() == 'y':
+        crawler.use_sqlite_store()
+    else:
+        crawler.use_result_sink()
+
+def configure_crawler(crawler):
+    """加载已爬取记录，并询问两个版本共用的爬取选项"""
     # 加载已爬取的URL
     crawler.load_crawled_urls()
+    crawler.use_http_cache()
     
-    print(f"当前已爬取 {len(crawler.crawled_urls)} 部电影")
+    if input("是否归档详情页原始HTML，便于以后离线重新解析？(y/N): ").strip().lower() == 'y':
+        crawler.use_page_archive()
+    if input("是否使用增量模式，连续多页没有新电影时停止翻页？(y/N): ").strip().lower() == 'y':
+        crawler.use_incremental()
+    # 爬取过程中估计还能发现多少部电影
+    min_new = input("每1000个请求发现的新电影少于多少部时停止翻页？(直接回车不停止): ").strip()
+    crawler.use_catalog_estimator(int(min_new) if min_new else None)
     
-    # 选择爬取模式
+    print(f"当前已爬取 {len(crawler.crawled_urls)} 部电影")
+
+def choose_crawl(crawler):
+    """询问爬取模式，返回不带参数的爬取函数；异步版本返回的函数调用后得到协程。无效选择时返回None"""
     print("\n请选择爬取模式：")
     print("1. 爬取Top250电影")
     print("2. 爬取指定标签电影")
     print("3. 爬取所有电影（无上限）")
     print("4. 自定义爬取")
+    print("5. 快速模式（只保存列表页信息，不抓取详情页）")
+    print("6. 抓取任务队列中等待的详情页")
+    print("7. 按变化可能性刷新已爬取的电影（每日请求预算）")
+    print("8. 推荐关系发现（从Top250和标签出发，沿详情页的推荐链接继续爬取）")
     
-    choice = input("\n请输入选择 (1-4): ").strip()
+    choice = input("\n请输入选择 (1-8): ").strip()
     
     if choice == '1':
-        movies = crawler.crawl_from_top250()
+        return crawler.crawl_from_top250
     elif choice == '2':
         tag = input("请输入标签名称 (默认'热门'): ").strip() or "热门"
         max_pages = int(input("请输入最大页数 (默认30): ") or "30")
-        movies = crawler.crawl_from_tag(tag, max_pages)
+        return functools.partial(crawler.crawl_from_tag, tag, max_pages, ask_resume(crawler, tag))
     elif choice == '3':
         max_tags = input("请输入最大标签数量 (直接回车爬取所有40+标签): ").strip()
         max_tags = int(max_tags) if max_tags else None
-        movies = crawler.crawl_all_movies(max_tags)
+        return functools.partial(crawler.crawl_all_movies, max_tags)
     elif choice == '4':
         print("\n自定义爬取选项：")
         print("1. 从Top250爬取")
@@ -367,74 +1200,71 @@ def main():
         sub_choice = input("请选择 (1-2): ").strip()
         
         if sub_choice == '1':
-            movies = crawler.crawl_from_top250()
+            return crawler.crawl_from_top250
         elif sub_choice == '2':
             tag = input("请输入标签名称: ").strip()
             max_pages = int(input("请输入最大页数: ") or "30")
-            movies = crawler.crawl_from_tag(tag, max_pages)
-        else:
-            print("无效选择")
-            return
-    else:
-        print("无效选择")
-        return
+            return functools.partial(crawler.crawl_from_tag, tag, max_pages, ask_resume(crawler, tag))
+    elif choice == '5':
+        max_tags = input("请输入最大标签数量 (直接回车爬取所有40+标签): ").strip()
+        max_tags = int(max_tags) if max_tags else None
+        return functools.partial(crawler.crawl_listings, max_tags)
+    elif choice == '6':
+        crawler.use_frontier()
+        return crawler.crawl_frontier
+    elif choice == '7':
+        daily_budget = int(input("请输入每日刷新请求数 (默认500): ") or "500")
+        return functools.partial(crawler.refresh_by_change_likelihood, daily_budget)
+    elif choice == '8':
+        max_depth = input("请输入最大推荐深度 (直接回车不限制): ").strip()
+        crawler.use_graph_discovery(int(max_depth) if max_depth else None)
+        return crawler.crawl_all_movies
     
-    if movies:
-        # 去重
-        unique_movies = []
-        seen_urls = set()
-        for movie in movies:
-            if movie.get('douban_url') not in seen_urls:
-                unique_movies.append(movie)
-                seen_urls.add(movie.get('douban_url'))
-        
-        # 保存结果
-        crawler.save_to_json(unique_movies)
+    print("无效选择")
+    return None
+
+def run_crawl(crawler, crawl):
+    """打开结果输出后执行爬取，结束或中断时保存所有状态并打印统计信息"""
+    # 结果边爬边写入，中断时已爬取的电影不会丢失
+    open_result_output(crawler)
+    if input("是否刷新已爬取的电影（评分或标题变化、或超过30天的重新抓取）？(y/N): ").strip().lower() == 'y':
+        crawler.use_refresh()
+    # 每次爬取都记录历史，之后按变化可能性安排刷新
+    crawler.use_refresh_scheduler()
+    started = time.time()
+    try:
+        crawl()
+    except KeyboardInterrupt:
+        print("\n爬取被中断，已爬取的电影已保存")
+    finally:
+        crawler.close_result_sink()
+        crawler.close_frontier()
+        crawler.close_refresh_scheduler()
         crawler.save_crawled_urls()
-        
-        print("\n" + "=" * 60)
-        print("爬取完成！统计信息：")
-        print(f"总爬取电影数量: {len(movies)}")
-        print(f"去重后电影数量: {len(unique_movies)}")
-        
-        ratings = [float(m.get('rating', 0)) for m in unique_movies if m.get('rating') and m.get('rating') != '0']
-        if ratings:
-            avg_rating = sum(ratings) / len(ratings)
-            print(f"平均评分: {avg_rating:.1f}")
-            print(f"最高评分: {max(ratings):.1f}")
-            print(f"最低评分: {min(ratings):.1f}")
-        
-        # 统计年份分布
-        years = [m.get('year') for m in unique_movies if m.get('year')]
-        if years:
-            year_counts = {}
-            for year in years:
-                year_counts[year] = year_counts.get(year, 0) + 1
-            print(f"\n年份分布 (前10):")
-            sorted_years = sorted(year_counts.items(), key=lambda x: x[1], reverse=True)[:10]
-            for year, count in sorted_years:
-                print(f"  {year}: {count}部")
-        
-        # 统计类型分布
-        all_genres = []
-        for movie in unique_movies:
-            if movie.get('genres'):
-                all_genres.extend(movie['genres'])
-        
-        if all_genres:
-            genre_counts = {}
-            for genre in all_genres:
-                genre_counts[genre] = genre_counts.get(genre, 0) + 1
-            print(f"\n类型分布 (前10):")
-            sorted_genres = sorted(genre_counts.items(), key=lambda x: x[1], reverse=True)[:10]
-            for genre, count in sorted_genres:
-                print(f"  {genre}: {count}部")
-        
-        print(f"\n前20部电影信息预览：")
-        for i, movie in enumerate(unique_movies[:20], 1):
-            print(f"{i:2d}. {movie.get('title', 'N/A')} ({movie.get('year', 'N/A')}) - 评分: {movie.get('rating', 'N/A')}")
-    else:
-        print("没有成功爬取到任何电影信息")
+        # 运行记录供爬取模拟器估计参数
+        save_run_metrics(crawler, time.time() - started)
+    
+    report_results(crawler)
+
+def main():
+    """主函数"""
+    print("豆瓣电影爬虫 - 无上限版本")
+    print("=" * 60)
+    print("本程序将爬取大量电影信息，包括：")
+    print("1. Top250电影")
+    print("2. 40+个热门标签的电影")
+    print("3. 预计可爬取数千部电影")
+    print("=" * 60)
+    
+    crawler = DoubanMovieCrawlerUnlimited()
+    # 抓取详情页期间提前请求之后的列表页
+    crawler.use_listing_prefetch()
+    configure_crawler(crawler)
+    
+    crawl = choose_crawl(crawler)
+    if crawl is None:
+        return
+    run_crawl(crawler, crawl)
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -5,13 +5,14 @@
 基于调试结果修正的爬虫程序
 """
 
-import requests
 import json
 import time
 import random
 from bs4 import BeautifulSoup
 from datetime import datetime
 
+from douban_transport import get_transport
+
 class DoubanMovieCrawlerWorking:
     def __init__(self):
         self.base_url = "https://movie.douban.com"
@@ -27,8 +28,8 @@ class DoubanMovieCrawlerWorking:
             'Sec-Fetch-Site': 'none',
             'Cache-Control': 'max-age=0',
         }
-        self.session = requests.Session()
-        self.session.headers.update(self.headers)
+        # 共享连接池
+        self.transport = get_transport()
         
     def get_movie_list(self, start=0):
         """获取电影列表页面"""
@@ -36,7 +37,7 @@ class DoubanMovieCrawlerWorking:
         try:
             # 添加随机延迟
             time.sleep(random.uniform(2, 4))
-            response = self.session.get(url, timeout=15)
+            response = self.transport.get(url, headers=self.headers, timeout=15)
             response.raise_for_status()
             return response.text
         except Exception as e:
@@ -78,7 +79,7 @@ class DoubanMovieCrawlerWorking:
             # 添加随机延迟
             time.sleep(random.uniform(3, 5))
             
-            response = self.session.get(movie_url, timeout=20)
+            response = self.transport.get(movie_url, headers=self.headers, timeout=20)
             response.raise_for_status()
             
             soup = BeautifulSoup(response.text, 'html.parser')
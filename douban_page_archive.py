@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+详情页原始HTML压缩归档与离线批量重新解析
+
+爬取时把每个详情页的原始HTML写入分段的gzip归档文件，格式类似WARC：
+每条记录是一个独立的gzip成员，包含若干行头信息（条目ID、URL、抓取时间、长度）和页面内容。
+新增字段或修复解析逻辑后，用 reextract 命令在多进程中重新解析整个归档，无需重新爬取。
+
+用法:
+    python douban_page_archive.py reextract [归档目录] [输出文件] [--workers N]
+"""
+
+import argparse
+import gzip
+import json
+import os
+import threading
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from douban_parsers import parse_detail_page
+from douban_subject_id import extract_subject_id
+
+RECORD_VERSION = 'DOUBAN-ARCHIVE/1.0'
+
+
+class PageArchive:
+    """按条目ID记录页面的分段gzip归档"""
+
+    def __init__(self, archive_dir='page_archive', segment_size=64 * 1024 * 1024):
+        self.archive_dir = archive_dir
+        # 单个分段文件的大小上限（压缩后字节数）
+        self.segment_size = segment_size
+        self._lock = threading.Lock()
+        os.makedirs(archive_dir, exist_ok=True)
+
+        # 每次打开都从新分段开始写：上次运行崩溃时最后一个分段可能留下半条记录，
+        # 若继续追加，后面的记录会跟在损坏的gzip成员之后而无法读取
+        self._segment_index = max(
+            (_segment_number(path) for path in list_segments(archive_dir)), default=0) + 1
+
+    def _segment_path(self, index):
+        return os.path.join(self.archive_dir, f"segment-{index:05d}.gz")
+
+    def write(self, url, content, encoding='utf-8', fetched_at=None):
+        """写入一个页面；content为原始字节"""
+        subject_id = extract_subject_id(url)
+        fetched_at = fetched_at or datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+        header = (
+            f"{RECORD_VERSION}\r\n"
+            f"Subject-ID: {subject_id or ''}\r\n"
+            f"URL: {url}\r\n"
+            f"Fetched-At: {fetched_at}\r\n"
+            f"Encoding: {encoding or 'utf-8'}\r\n"
+            f"Content-Length: {len(content)}\r\n"
+            f"\r\n"
+        ).encode('utf-8')
+        # 每条记录单独压缩，且每次运行写入新分段，中途崩溃只损坏该分段的最后一条
+        record = gzip.compress(header + content + b"\r\n\r\n")
+
+        with self._lock:
+            path = self._segment_path(self._segment_index)
+            if os.path.exists(path) and os.path.getsize(path) >= self.segment_size:
+                self._segment_index += 1
+                path = self._segment_path(self._segment_index)
+            with open(path, 'ab') as f:
+                f.write(record)
+
+
+def list_segments(archive_dir):
+    """按顺序列出归档目录中的分段文件"""
+    if not os.path.isdir(archive_dir):
+        return []
+    names = sorted(name for name in os.listdir(archive_dir)
+                   if name.startswith('segment-') and name.endswith('.gz'))
+    return [os.path.join(archive_dir, name) for name in names]
+
+
+def _segment_number(path):
+    """从 segment-00001.gz 形式的文件名中取出分段序号"""
+    try:
+        return int(os.path.basename(path)[len('segment-'):-len('.gz')])
+    except ValueError:
+        return 0
+
+
+def iter_segment(path):
+    """逐条读取分段文件中的记录，末尾不完整的记录会被忽略"""
+    with gzip.open(path, 'rb') as f:
+        while True:
+            try:
+                version = f.readline()
+                if not version:
+                    return
+                if version.strip() != RECORD_VERSION.encode('utf-8'):
+                    print(f"归档记录格式错误，停止读取 {path}")
+                    return
+
+                headers = {}
+                while True:
+                    line = f.readline().strip()
+                    if not line:
+                        break
+                    name, _, value = line.decode('utf-8').partition(':')
+                    headers[name.strip()] = value.strip()
+
+                length = int(headers['Content-Length'])
+                content = f.read(length)
+                f.read(4)
+                if len(content) < length:
+                    return
+            except (EOFError, OSError, zlib.error, gzip.BadGzipFile, KeyError, ValueError):
+                # 最后一条记录写入时中断，之前的记录照常返回
+                return
+
+            yield {
+                'subject_id': int(headers['Subject-ID']) if headers.get('Subject-ID') else None,
+                'url': headers.get('URL'),
+                'fetched_at': headers.get('Fetched-At'),
+                'encoding': headers.get('Encoding') or 'utf-8',
+                'content': content,
+            }
+
+
+def _extract_segment(path):
+    """子进程中解析一个分段文件，返回{条目ID: 电影信息}"""
+    movies = {}
+    for record in iter_segment(path):
+        try:
+            movie_info = parse_detail_page(record['content'], record['encoding'], record['url'])
+        except Exception as e:
+            print(f"解析归档页面失败 {record['url']}: {e}")
+            continue
+
+        movie_info['crawl_time'] = record['fetched_at']
+        key = record['subject_id'] or record['url']
+        # 同一条目保留最新抓取的版本
+        if key not in movies or movies[key]['crawl_time'] <= movie_info['crawl_time']:
+            movies[key] = movie_info
+    return movies
+
+
+def reextract_archive(archive_dir='page_archive', workers=None):
+    """用进程池重新解析整个归档，返回去重后的电影列表"""
+    segments = list_segments(archive_dir)
+    if not segments:
+        print(f"归档目录 {archive_dir} 中没有分段文件")
+        return []
+
+    print(f"开始重新解析 {len(segments)} 个分段文件...")
+    movies = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for i, segment_movies in enumerate(executor.map(_extract_segment, segments), 1):
+            for key, movie_info in segment_movies.items():
+                if key not in movies or movies[key]['crawl_time'] <= movie_info['crawl_time']:
+                    movies[key] = movie_info
+            print(f"进度: {i}/{len(segments)}，累计 {len(movies)} 部电影")
+
+    return list(movies.values())
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description='豆瓣详情页归档工具')
+    subparsers = parser.add_subparsers(dest='command')
+
+    reextract_parser = subparsers.add_parser('reextract', help='重新解析整个归档')
+    reextract_parser.add_argument('archive_dir', nargs='?', default='page_archive')
+    reextract_parser.add_argument('output', nargs='?', default='douban_movies_reextracted.json')
+    reextract_parser.add_argument('--workers', type=int, default=None, help='进程数，默认为CPU核数')
+
+    args = parser.parse_args()
+    if args.command != 'reextract':
+        parser.print_help()
+        return
+
+    movies = reextract_archive(args.archive_dir, args.workers)
+    if movies:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(movies, f, ensure_ascii=False, indent=2)
+        print(f"✓ 成功保存 {len(movies)} 部电影信息到 {args.output}")
+
+if __name__ == "__main__":
+    main()
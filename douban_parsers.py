@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+电影详情页解析后端
+- bs4: 原有的 BeautifulSoup + html.parser 实现
+- lxml: 使用lxml解析，并用预编译的XPath提取字段，速度快得多
+- jsonld: 快速路径，读取页面内嵌的 application/ld+json 结构化数据，
+  再用正则定位少量HTML片段补齐格式需要与页面一致的字段，
+  只有缺失字段时才退回lxml构建完整DOM
+
+各后端的输出完全一致（由 test_parsers.py 在样例页面上做差异对比）。
+解析器只负责页面中的字段，豆瓣链接和爬取时间由爬虫补充。
+"喜欢这部电影的人也喜欢"中的推荐链接与解析后端无关，需要时由 build_movie_info 一并提取。
+"""
+
+import html as html_module
+import json
+import re
+from datetime import datetime
+
+from bs4 import BeautifulSoup
+import lxml.html
+from lxml import etree
+
+from douban_subject_id import canonical_subject_url
+
+# 输出字段的顺序，与原有解析逻辑一致
+DETAIL_FIELDS = (
+    'title', 'year', 'rating', 'votes', 'director', 'actors',
+    'genres', 'release_date', 'runtime', 'summary', 'poster_url',
+)
+
+
+class Bs4DetailParser:
+    """BeautifulSoup解析后端"""
+
+    name = 'bs4'
+
+    def parse(self, html):
+        soup = BeautifulSoup(html, 'html.parser')
+
+        # 提取电影信息
+        movie_info = {}
+
+        # 电影标题
+        title_element = soup.find('h1')
+        if title_element:
+            movie_info['title'] = title_element.text.strip()
+
+        # 年份
+        year_element = soup.find('span', class_='year')
+        if year_element:
+            movie_info['year'] = year_element.text.strip('()')
+
+        # 评分
+        rating_element = soup.find('strong', class_='ll rating_num')
+        if rating_element:
+            movie_info['rating'] = rating_element.text.strip()
+
+        # 评价人数
+        votes_element = soup.find('a', class_='rating_people')
+        if votes_element:
+            movie_info['votes'] = votes_element.text.strip()
+
+        # 导演
+        director_element = soup.find('a', rel='v:directedBy')
+        if director_element:
+            movie_info['director'] = director_element.text.strip()
+
+        # 演员列表
+        actors = []
+        actor_elements = soup.find_all('a', rel='v:starring')
+        for actor in actor_elements[:5]:
+            actors.append(actor.text.strip())
+        movie_info['actors'] = actors
+
+        # 类型
+        genres = []
+        genre_elements = soup.find_all('span', property='v:genre')
+        for genre in genre_elements:
+            genres.append(genre.text.strip())
+        movie_info['genres'] = genres
+
+        # 上映日期
+        release_date_element = soup.find('span', property='v:initialReleaseDate')
+        if release_date_element:
+            movie_info['release_date'] = release_date_element.text.strip()
+
+        # 片长
+        runtime_element = soup.find('span', property='v:runtime')
+        if runtime_element:
+            movie_info['runtime'] = runtime_element.text.strip()
+
+        # 简介
+        summary_element = soup.find('span', property='v:summary')
+        if summary_element:
+            movie_info['summary'] = summary_element.text.strip()
+
+        # 封面图片
+        poster_element = soup.find('img', rel='v:image')
+        if poster_element:
+            movie_info['poster_url'] = poster_element.get('src')
+
+        return movie_info
+
+
+def _has_token(attribute, value):
+    """XPath条件：空格分隔的属性（class、rel）中包含指定值，与BeautifulSoup的匹配规则一致"""
+    return f"contains(concat(' ', normalize-space(@{attribute}), ' '), ' {value} ')"
+
+
+# 预编译的XPath，模块加载时编译一次
+_XPATH_TITLE = etree.XPath('(//h1)[1]')
+_XPATH_YEAR = etree.XPath(f"(//span[{_has_token('class', 'year')}])[1]")
+# BeautifulSoup中带空格的class_按整个属性值精确匹配
+_XPATH_RATING = etree.XPath("(//strong[@class='ll rating_num'])[1]")
+_XPATH_VOTES = etree.XPath(f"(//a[{_has_token('class', 'rating_people')}])[1]")
+_XPATH_DIRECTOR = etree.XPath(f"(//a[{_has_token('rel', 'v:directedBy')}])[1]")
+_XPATH_ACTORS = etree.XPath(f"(//a[{_has_token('rel', 'v:starring')}])[position() <= 5]")
+_XPATH_GENRES = etree.XPath("//span[@property='v:genre']")
+_XPATH_RELEASE_DATE = etree.XPath("(//span[@property='v:initialReleaseDate'])[1]")
+_XPATH_RUNTIME = etree.XPath("(//span[@property='v:runtime'])[1]")
+_XPATH_SUMMARY = etree.XPath("(//span[@property='v:summary'])[1]")
+_XPATH_POSTER = etree.XPath(f"(//img[{_has_token('rel', 'v:image')}])[1]")
+
+
+# BeautifulSoup会把只含ASCII空白的文本节点折叠成一个换行或空格
+_ASCII_SPACES = str.maketrans('', '', '\x20\x0a\x09\x0c\x0d')
+
+
+def _collapse_whitespace(text):
+    if text.translate(_ASCII_SPACES) == '':
+        return '\n' if '\n' in text else ' '
+    return text
+
+
+def _text(element):
+    """与BeautifulSoup的.text结果一致的文本内容"""
+    return ''.join(_collapse_whitespace(text) for text in element.itertext())
+
+
+def _first(xpath, tree):
+    elements = xpath(tree)
+    return elements[0] if elements else None
+
+
+class LxmlDetailParser:
+    """lxml + 预编译XPath解析后端"""
+
+    name = 'lxml'
+
+    def parse(self, html):
+        # lxml不接受空文档，与BeautifulSoup保持一致返回空结果
+        if not html or not html.strip():
+            return {'actors': [], 'genres': []}
+        tree = lxml.html.fromstring(html)
+
+        movie_info = {}
+
+        title_element = _first(_XPATH_TITLE, tree)
+        if title_element is not None:
+            movie_info['title'] = _text(title_element).strip()
+
+        year_element = _first(_XPATH_YEAR, tree)
+        if year_element is not None:
+            movie_info['year'] = _text(year_element).strip('()')
+
+        rating_element = _first(_XPATH_RATING, tree)
+        if rating_element is not None:
+            movie_info['rating'] = _text(rating_element).strip()
+
+        votes_element = _first(_XPATH_VOTES, tree)
+        if votes_element is not None:
+            movie_info['votes'] = _text(votes_element).strip()
+
+        director_element = _first(_XPATH_DIRECTOR, tree)
+        if director_element is not None:
+            movie_info['director'] = _text(director_element).strip()
+
+        movie_info['actors'] = [_text(actor).strip() for actor in _XPATH_ACTORS(tree)]
+        movie_info['genres'] = [_text(genre).strip() for genre in _XPATH_GENRES(tree)]
+
+        release_date_element = _first(_XPATH_RELEASE_DATE, tree)
+        if release_date_element is not None:
+            movie_info['release_date'] = _text(release_date_element).strip()
+
+        runtime_element = _first(_XPATH_RUNTIME, tree)
+        if runtime_element is not None:
+            movie_info['runtime'] = _text(runtime_element).strip()
+
+        summary_element = _first(_XPATH_SUMMARY, tree)
+        if summary_element is not None:
+            movie_info['summary'] = _text(summary_element).strip()
+
+        poster_element = _first(_XPATH_POSTER, tree)
+        if poster_element is not None:
+            movie_info['poster_url'] = poster_element.get('src')
+
+        return movie_info
+
+
+_LD_JSON_START = '<script type="application/ld+json">'
+_CJK_PATTERN = re.compile(r'[\u3040-\u30ff\u3400-\u9fff\uac00-\ud7af]')
+
+# 需要与页面文字完全一致的字段，直接用正则定位对应元素
+_RE_YEAR = re.compile(r'<span class="year">([^<]*)</span>')
+_RE_VOTES = re.compile(r'<span property="v:votes">([^<]*)</span>')
+_RE_RELEASE_DATE = re.compile(r'<span[^>]*property="v:initialReleaseDate"[^>]*>([^<]*)</span>')
+_RE_RUNTIME = re.compile(r'<span[^>]*property="v:runtime"[^>]*>([^<]*)</span>')
+_RE_SUMMARY = re.compile(r'<span[^>]*property="v:summary"[^>]*>(.*?)</span>', re.S)
+
+
+def _person_name(name):
+    """JSON-LD中的人名形如"弗兰克·德拉邦特 Frank Darabont"，页面上只显示中文名部分"""
+    name = name.strip()
+    first, _, rest = name.partition(' ')
+    if rest and _CJK_PATTERN.search(first) and not _CJK_PATTERN.search(rest):
+        return first
+    return name
+
+
+def _extract_ld_json(html):
+    """用字符串查找取出ld+json脚本块，找不到或无法解析时返回None"""
+    start = html.find(_LD_JSON_START)
+    if start == -1:
+        return None
+    start += len(_LD_JSON_START)
+    end = html.find('</script>', start)
+    if end == -1:
+        return None
+
+    try:
+        # 豆瓣的简介中可能包含未转义的换行
+        data = json.loads(html[start:end], strict=False)
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _match_text(pattern, html):
+    match = pattern.search(html)
+    return html_module.unescape(match.group(1)) if match else None
+
+
+class JsonLdDetailParser:
+    """ld+json快速路径，缺失字段时退回lxml完整解析"""
+
+    name = 'jsonld'
+
+    def __init__(self):
+        self.fallback = LxmlDetailParser()
+        # 命中快速路径和退回完整解析的次数
+        self.stats = {'fast': 0, 'fallback': 0}
+
+    def parse(self, html):
+        data = _extract_ld_json(html) if html else None
+        if data is None:
+            self.stats['fallback'] += 1
+            return self.fallback.parse(html)
+
+        fields = {}
+
+        year = _match_text(_RE_YEAR, html)
+        if year is not None:
+            fields['year'] = year.strip('()')
+
+        # 页面标题由中英文名和年份两个span组成，中间是换行
+        if data.get('name'):
+            name = html_module.unescape(data['name']).strip()
+            fields['title'] = f"{name}\n({fields['year']})" if 'year' in fields else name
+
+        rating = data.get('aggregateRating') or {}
+        if 'ratingValue' in rating:
+            fields['rating'] = str(rating['ratingValue']).strip()
+
+        votes = _match_text(_RE_VOTES, html)
+        if votes is not None:
+            fields['votes'] = f"{votes.strip()}人评价"
+
+        directors = _as_list(data.get('director'))
+        if directors:
+            fields['director'] = _person_name(html_module.unescape(directors[0].get('name', '')))
+
+        if 'actor' in data:
+            fields['actors'] = [_person_name(html_module.unescape(actor.get('name', '')))
+                                for actor in _as_list(data['actor'])[:5]]
+        if 'genre' in data:
+            fields['genres'] = [html_module.unescape(genre).strip() for genre in _as_list(data['genre'])]
+
+        release_date = _match_text(_RE_RELEASE_DATE, html)
+        if release_date is not None:
+            fields['release_date'] = release_date.strip()
+
+        runtime = _match_text(_RE_RUNTIME, html)
+        if runtime is not None:
+            fields['runtime'] = runtime.strip()
+
+        # 简介中含有<br/>，只把这一小段交给lxml解析
+        summary = _RE_SUMMARY.search(html)
+        if summary:
+            fragment = lxml.html.fragment_fromstring(summary.group(1), create_parent='span')
+            fields['summary'] = _text(fragment).strip()
+
+        if data.get('image'):
+            fields['poster_url'] = data['image']
+
+        if any(field not in fields for field in DETAIL_FIELDS):
+            # 只用完整解析的结果补齐缺失字段
+            self.stats['fallback'] += 1
+            for field, value in self.fallback.parse(html).items():
+                fields.setdefault(field, value)
+        else:
+            self.stats['fast'] += 1
+
+        return {field: fields[field] for field in DETAIL_FIELDS if field in fields}
+
+
+# 推荐区块的起始标签；只解析从这里开始的部分，不为整个页面构建DOM
+_RE_RECOMMENDATIONS_START = re.compile(r'<div[^>]*\bclass="[^"]*\brecommendations-bd\b')
+_XPATH_RECOMMENDATIONS = etree.XPath(f"(//div[{_has_token('class', 'recommendations-bd')}])[1]")
+_XPATH_SUBJECT_LINKS = etree.XPath(".//a[contains(@href, '/subject/')]")
+_XPATH_LINK_IMAGE_ALT = etree.XPath("(.//img/@alt)[1]")
+# 评分在同一个推荐条目（最近的dl）中
+_XPATH_SUBJECT_RATE = etree.XPath(f"(ancestor::dl[1]//span[{_has_token('class', 'subject-rate')}])[1]")
+
+
+def extract_recommendations(html):
+    """提取"喜欢这部电影的人也喜欢"中的电影，格式与标签列表页的链接相同"""
+    start = _RE_RECOMMENDATIONS_START.search(html or '')
+    if not start:
+        return []
+    blocks = _XPATH_RECOMMENDATIONS(lxml.html.fromstring(html[start.start():]))
+    if not blocks:
+        return []
+
+    # 同一部电影的海报和标题各有一个链接，合并为一条；标题优先取文字链接，其次取海报的alt
+    links = {}
+    poster_titles = {}
+    for anchor in _XPATH_SUBJECT_LINKS(blocks[0]):
+        url = canonical_subject_url(anchor.get('href'))
+        link = links.setdefault(url, {'url': url, 'title': '', 'rate': ''})
+        if not link['title']:
+            link['title'] = anchor.text_content().strip()
+        alt = _XPATH_LINK_IMAGE_ALT(anchor)
+        if alt:
+            poster_titles.setdefault(url, alt[0].strip())
+        if not link['rate']:
+            rate = _XPATH_SUBJECT_RATE(anchor)
+            link['rate'] = rate[0].text_content().strip() if rate else ''
+
+    for url, link in links.items():
+        link['title'] = link['title'] or poster_titles.get(url, '')
+    return list(links.values())
+
+
+DETAIL_PARSERS = {
+    'bs4': Bs4DetailParser,
+    'lxml': LxmlDetailParser,
+    'jsonld': JsonLdDetailParser,
+}
+
+
+def get_detail_parser(name='jsonld'):
+    """按名称获取详情页解析后端"""
+    if name not in DETAIL_PARSERS:
+        raise ValueError(f"未知的解析后端: {name}，可选: {', '.join(DETAIL_PARSERS)}")
+    return DETAIL_PARSERS[name]()
+
+
+def build_movie_info(parser, html, movie_url, recommendations=False):
+    """解析页面字段，并补充豆瓣链接和爬取时间；recommendations为True时附带推荐链接"""
+    movie_info = parser.parse(html)
+
+    # 豆瓣链接
+    movie_info['douban_url'] = movie_url
+    movie_info['crawl_time'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    if recommendations:
+        # 爬虫写入结果前会取走这个字段
+        movie_info['recommendations'] = extract_recommendations(html)
+
+    return movie_info
+
+
+# 每个进程各自缓存的解析器
+_process_parsers = {}
+
+
+def parse_detail_page(content, encoding, movie_url, parser_name='jsonld', recommendations=False):
+    """供进程池调用：解码原始页面字节并解析，返回电影信息"""
+    parser = _process_parsers.get(parser_name)
+    if parser is None:
+        parser = _process_parsers[parser_name] = get_detail_parser(parser_name)
+
+    html = content.decode(encoding or 'utf-8', errors='replace')
+    return build_movie_info(parser, html, movie_url, recommendations)
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+自适应限速控制器
+用令牌桶代替固定的休眠时间，并根据观测到的响应情况按AIMD方式调整速率：
+- 响应正常且延迟低于目标值时，速率线性增加
+- 出现403/429/503、请求失败或延迟过高时，速率成倍下降
+- 服务器返回Retry-After时，在指定时间内暂停该类请求
+列表页和详情页使用各自独立的速率预算
+"""
+
+import asyncio
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+
+# 各类请求的默认速率预算（单位：请求/秒）
+DEFAULT_BUDGETS = {
+    'listing': {'rate': 0.3, 'min_rate': 0.05, 'max_rate': 2.0, 'capacity': 1.0},
+    'detail': {'rate': 0.5, 'min_rate': 0.05, 'max_rate': 4.0, 'capacity': 2.0},
+}
+
+# 视为被限流的状态码
+THROTTLE_STATUS_CODES = (403, 429, 503)
+
+
+def parse_retry_after(value):
+    """解析Retry-After头，返回需要等待的秒数；无法解析时返回None"""
+    if not value:
+        return None
+
+    value = str(value).strip()
+    if value.isdigit():
+        return float(value)
+
+    try:
+        retry_time = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_time.tzinfo is None:
+        retry_time = retry_time.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_time - datetime.now(timezone.utc)).total_seconds())
+
+
+class TokenBucket:
+    """令牌桶，允许预约令牌：令牌不足时返回需要等待的时间"""
+
+    def __init__(self, rate, capacity=1.0, now=None):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic() if now is None else now
+        self.paused_until = 0.0
+
+    def _refill(self, now):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def set_rate(self, rate, now):
+        """修改速率前先按旧速率结算令牌"""
+        self._refill(now)
+        self.rate = rate
+
+    def pause(self, seconds, now):
+        """在指定时间内不发放令牌"""
+        self.paused_until = max(self.paused_until, now + seconds)
+
+    def reserve(self, now):
+        """取走一个令牌，返回调用方需要等待的秒数"""
+        self._refill(now)
+        self.tokens -= 1
+        wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        return max(wait, self.paused_until - now)
+
+
+class AdaptiveRateController:
+    """按请求类别分别维护令牌桶，并根据反馈做AIMD调整"""
+
+    def __init__(self, budgets=None, target_latency=2.0, increase_step=0.05,
+                 decrease_factor=0.5, latency_decrease_factor=0.8, cooldown=5.0, clock=time.monotonic):
+        self.budgets = {kind: dict(budget) for kind, budget in DEFAULT_BUDGETS.items()}
+        for kind, budget in (budgets or {}).items():
+            self.budgets.setdefault(kind, dict(DEFAULT_BUDGETS['detail'])).update(budget)
+
+        # 延迟超过该值（秒）视为服务器压力过大
+        self.target_latency = target_latency
+        # 每次成功响应增加的速率
+        self.increase_step = increase_step
+        # 被限流时速率乘以该系数
+        self.decrease_factor = decrease_factor
+        # 延迟过高时速率乘以该系数
+        self.latency_decrease_factor = latency_decrease_factor
+        # 两次降速之间的最小间隔，避免同一波在途请求连续触发降速
+        self.cooldown = cooldown
+        # 时钟，爬取模拟器传入模拟时间
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        self.buckets = {}
+        self.latency_ewma = {}
+        self._last_decrease = {}
+        self.stats = {}
+        for kind, budget in self.budgets.items():
+            self.buckets[kind] = TokenBucket(budget['rate'], budget['capacity'], clock())
+            self.latency_ewma[kind] = None
+            self._last_decrease[kind] = 0.0
+            self.stats[kind] = {'requests': 0, 'throttled': 0, 'waited': 0.0}
+
+    def reserve(self, kind):
+        """预约一个该类别的请求，返回需要等待的秒数，不阻塞"""
+        with self._lock:
+            wait = self.buckets[kind].reserve(self.clock())
+            self.stats[kind]['requests'] += 1
+            self.stats[kind]['waited'] += wait
+            return wait
+
+    def acquire(self, kind):
+        """阻塞直到可以发起一个该类别的请求"""
+        wait = self.reserve(kind)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, kind):
+        """acquire的协程版本"""
+        wait = self.reserve(kind)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def record(self, kind, latency, status_code, retry_after=None):
+        """记录一次请求的结果并调整速率；status_code为None表示请求失败（超时、连接错误等）"""
+        budget = self.budgets[kind]
+        bucket = self.buckets[kind]
+
+        with self._lock:
+            now = self.clock()
+
+            if latency is not None:
+                previous = self.latency_ewma[kind]
+                self.latency_ewma[kind] = latency if previous is None else 0.8 * previous + 0.2 * latency
+
+            retry_seconds = parse_retry_after(retry_after)
+            if retry_seconds:
+                bucket.pause(retry_seconds, now)
+
+            throttled = status_code is None or status_code in THROTTLE_STATUS_CODES
+            slow = self.latency_ewma[kind] is not None and self.latency_ewma[kind] > self.target_latency
+
+            if throttled or slow:
+                if throttled:
+                    self.stats[kind]['throttled'] += 1
+                if now - self._last_decrease[kind] >= self.cooldown:
+                    factor = self.decrease_factor if throttled else self.latency_decrease_factor
+                    bucket.set_rate(max(budget['min_rate'], bucket.rate * factor), now)
+                    self._last_decrease[kind] = now
+            elif status_code < 400:
+                bucket.set_rate(min(budget['max_rate'], bucket.rate + self.increase_step), now)
+
+    def get_rate(self, kind):
+        """当前速率（请求/秒）"""
+        with self._lock:
+            return self.buckets[kind].rate
+
+    def print_status(self):
+        """打印各类请求的当前速率"""
+        with self._lock:
+            parts = []
+            for kind, bucket in self.buckets.items():
+                stats = self.stats[kind]
+                parts.append(f"{kind}: {bucket.rate:.2f}次/秒 (请求{stats['requests']}次，被限流{stats['throttled']}次)")
+        print("当前速率 - " + "，".join(parts))
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按变化可能性安排刷新
+为每部电影保存历次爬取时的评价人数和评分，估计它变化的速度：
+- 评价人数增长速度（只有一次记录时用上映以来的平均增长估计，新片自然更快）
+- 评分漂移速度
+把变化速度看作泊松过程的强度λ，距上次爬取Δt天后已经变化的概率为 1 - exp(-λ·Δt)。
+每天固定的请求预算优先分配给变化概率最高的电影，而不是按顺序轮流重新爬取。
+"""
+
+import heapq
+import math
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from douban_subject_id import extract_subject_id
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS subjects (
+    subject_id INTEGER PRIMARY KEY,
+    douban_url TEXT NOT NULL,
+    release_year INTEGER,
+    last_crawled REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS observations (
+    subject_id INTEGER NOT NULL,
+    observed_at REAL NOT NULL,
+    votes INTEGER,
+    rating REAL,
+    PRIMARY KEY (subject_id, observed_at)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS daily_budget (
+    day TEXT PRIMARY KEY,
+    used INTEGER NOT NULL
+);
+"""
+
+# 评价人数增长1%或评分变化0.1视为一次变化
+VOTE_CHANGE_FRACTION = 0.01
+RATING_CHANGE_STEP = 0.1
+# 评价人数很少时按这个数量计算相对增长，避免几十人评价的冷门片被高估
+MIN_VOTE_BASE = 100
+DAY = 86400.0
+
+
+def _to_int(value):
+    match = re.search(r'\d+', str(value or ''))
+    return int(match.group()) if match else None
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _crawl_timestamp(movie_info):
+    try:
+        return datetime.strptime(movie_info.get('crawl_time') or '', '%Y-%m-%d %H:%M:%S').timestamp()
+    except ValueError:
+        return time.time()
+
+
+def estimate_change_rate(observations, release_year, now):
+    """估计每天的变化次数λ；observations 为按时间倒序的 (时间, 评价人数, 评分)"""
+    observed_at, votes, rating = observations[0]
+    votes = votes or 0
+
+    if len(observations) >= 2:
+        previous_at, previous_votes, previous_rating = observations[1]
+        days = max((observed_at - previous_at) / DAY, 1 / 24)
+        vote_velocity = max(votes - (previous_votes or 0), 0) / days
+        drift = abs(rating - previous_rating) / days if rating is not None and previous_rating is not None else 0.0
+    else:
+        # 只有一次记录：用上映以来的平均增长估计
+        if release_year:
+            # 不把上映日期转换为时间戳：Windows下1970年以前的日期无法转换
+            age_days = (datetime.fromtimestamp(now) - datetime(release_year, 1, 1)).total_seconds() / DAY
+        else:
+            age_days = 3650
+        vote_velocity = votes / max(age_days, 30)
+        drift = 0.0
+
+    relative_growth = vote_velocity / max(votes, MIN_VOTE_BASE)
+    return relative_growth / VOTE_CHANGE_FRACTION + drift / RATING_CHANGE_STEP
+
+
+class RefreshScheduler:
+    """保存爬取历史，并按变化概率在每日预算内安排刷新"""
+
+    def __init__(self, path='refresh_history.db'):
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+
+    def observe(self, movie_info):
+        """记录一次详情页爬取结果"""
+        subject_id = extract_subject_id(movie_info.get('douban_url'))
+        if subject_id is None:
+            return
+        observed_at = _crawl_timestamp(movie_info)
+
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO observations VALUES (?, ?, ?, ?)",
+                (subject_id, observed_at, _to_int(movie_info.get('votes')), _to_float(movie_info.get('rating')))
+            )
+            self.conn.execute(
+                "INSERT INTO subjects VALUES (?, ?, ?, ?) ON CONFLICT(subject_id) DO UPDATE SET "
+                "douban_url = excluded.douban_url, release_year = excluded.release_year, "
+                "last_crawled = MAX(last_crawled, excluded.last_crawled)",
+                (subject_id, movie_info['douban_url'], _to_int(movie_info.get('year')), observed_at)
+            )
+
+    def observe_all(self, movies):
+        count = 0
+        for movie_info in movies:
+            if movie_info.get('record_level') != 'listing':
+                self.observe(movie_info)
+                count += 1
+        return count
+
+    def count(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM subjects").fetchone()[0]
+
+    def _today(self, now):
+        return datetime.fromtimestamp(now).strftime('%Y-%m-%d')
+
+    def remaining_budget(self, daily_budget, now=None):
+        """今天还可以用于刷新的请求数"""
+        now = time.time() if now is None else now
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT used FROM daily_budget WHERE day = ?", (self._today(now),)
+            ).fetchone()
+        return max(daily_budget - (row[0] if row else 0), 0)
+
+    def record_refresh(self, now=None):
+        """记录使用了一个刷新请求"""
+        now = time.time() if now is None else now
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO daily_budget VALUES (?, 1) ON CONFLICT(day) DO UPDATE SET used = used + 1",
+                (self._today(now),)
+            )
+
+    def iter_probabilities(self, now=None):
+        """逐个返回 (变化概率, 条目ID, 链接)"""
+        now = time.time() if now is None else now
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT s.subject_id, s.douban_url, s.release_year, s.last_crawled, "
+                "o.observed_at, o.votes, o.rating FROM subjects s "
+                "JOIN (SELECT subject_id, observed_at, votes, rating, ROW_NUMBER() OVER "
+                "      (PARTITION BY subject_id ORDER BY observed_at DESC) AS rank FROM observations) o "
+                "ON o.subject_id = s.subject_id AND o.rank <= 2 "
+                "ORDER BY s.subject_id, o.observed_at DESC"
+            ).fetchall()
+
+        current = None
+        observations = []
+        for subject_id, url, release_year, last_crawled, observed_at, votes, rating in rows + [(None,) * 7]:
+            if current is not None and subject_id != current[0]:
+                rate = estimate_change_rate(observations, current[2], now)
+                elapsed_days = max(now - current[3], 0) / DAY
+                yield 1 - math.exp(-rate * elapsed_days), current[0], current[1]
+                observations = []
+            current = (subject_id, url, release_year, last_crawled)
+            observations.append((observed_at, votes, rating))
+
+    def plan(self, daily_budget, now=None):
+        """按变化概率从高到低选出今天剩余预算内要刷新的电影"""
+        budget = self.remaining_budget(daily_budget, now)
+        if not budget:
+            return []
+        best = heapq.nlargest(budget, self.iter_probabilities(now))
+        return [{'subject_id': subject_id, 'url': url, 'probability': probability}
+                for probability, subject_id, url in best]
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
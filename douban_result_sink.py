@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流式JSONL结果输出
+每解析出一部电影就追加一行JSON，不再在内存中积累全部结果后一次性保存：
+- 按条数/时间批量fsync（组提交），兼顾性能和中断时不丢数据；
+  爬虫休眠或退避期间没有新记录时，由定时器在 commit_interval 秒后落盘
+- 单个文件超过大小上限时自动切换到新文件
+- 提供转换工具，生成原来的带缩进JSON数组格式
+
+用法:
+    python douban_result_sink.py douban_movies_unlimited.jsonl douban_movies_unlimited.json
+"""
+
+import glob
+import json
+import os
+import sys
+import threading
+import time
+
+from douban_subject_id import subject_key
+
+# 只有列表页信息、尚未抓取详情页的记录带有 record_level: listing
+LISTING_RECORD = 'listing'
+
+
+def is_listing_record(movie_info):
+    return movie_info.get('record_level') == LISTING_RECORD
+
+
+class JsonlResultSink:
+    """追加写入的JSONL结果文件，文件名形如 douban_movies_unlimited.00001.jsonl"""
+
+    def __init__(self, path='douban_movies_unlimited.jsonl', commit_every=20, commit_interval=5.0,
+                 max_file_size=256 * 1024 * 1024):
+        self.path = path
+        # 累计多少条记录或多少秒后执行一次fsync
+        self.commit_every = commit_every
+        self.commit_interval = commit_interval
+        # 单个文件的大小上限（字节）
+        self.max_file_size = max_file_size
+
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._last_commit = time.monotonic()
+        # 有未落盘的记录时启动，到期后落盘
+        self._timer = None
+        self.written = 0
+
+        # 接着最后一个分片继续写，先去掉上次中断时写了一半的行
+        parts = list_parts(path)
+        self._part_index = _part_number(parts[-1]) if parts else 1
+        part_path = self._part_path(self._part_index)
+        if parts:
+            _truncate_partial_line(part_path)
+        self._file = open(part_path, 'a', encoding='utf-8')
+
+    def _part_path(self, index):
+        base, ext = os.path.splitext(self.path)
+        return f"{base}.{index:05d}{ext or '.jsonl'}"
+
+    def write(self, movie_info):
+        """追加一条记录"""
+        line = json.dumps(movie_info, ensure_ascii=False) + '\n'
+        with self._lock:
+            self._file.write(line)
+            self._pending += 1
+            self.written += 1
+
+            if (self._pending >= self.commit_every
+                    or time.monotonic() - self._last_commit >= self.commit_interval):
+                self._commit()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.commit_interval, self._timed_commit)
+                self._timer.daemon = True
+                self._timer.start()
+            if self._file.tell() >= self.max_file_size:
+                self._rotate()
+
+    def _timed_commit(self):
+        with self._lock:
+            self._timer = None
+            if self._pending and not self._file.closed:
+                self._commit()
+
+    def _commit(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = 0
+        self._last_commit = time.monotonic()
+
+    def _rotate(self):
+        self._commit()
+        self._file.close()
+        self._part_index += 1
+        self._file = open(self._part_path(self._part_index), 'a', encoding='utf-8')
+
+    def commit(self):
+        """立即把已写入的记录落盘"""
+        with self._lock:
+            self._commit()
+
+    def close(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._file.closed:
+                self._commit()
+                self._file.close()
+
+    def iter_movies(self):
+        """逐条读取去重后的记录"""
+        return iter_best_movies(self.path)
+
+    def iter_records(self):
+        """按写入顺序读取全部记录（包括同一部电影的多次爬取）"""
+        return iter_jsonl(self.path)
+
+    def export_json(self, output):
+        """导出为原来的带缩进JSON数组格式，返回导出条数"""
+        return convert_jsonl_to_json(self.path, output)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def _truncate_partial_line(part_path, chunk_size=64 * 1024):
+    """截掉文件末尾没有换行符的不完整记录"""
+    with open(part_path, 'rb+') as f:
+        end = f.seek(0, os.SEEK_END)
+        position = end
+        while position > 0:
+            start = max(0, position - chunk_size)
+            f.seek(start)
+            chunk = f.read(position - start)
+            if position == end and chunk.endswith(b'\n'):
+                return
+            newline = chunk.rfind(b'\n')
+            if newline != -1:
+                f.truncate(start + newline + 1)
+                return
+            position = start
+        f.truncate(0)
+
+
+def _part_number(part_path):
+    return int(part_path.rsplit('.', 2)[-2])
+
+
+def list_parts(path):
+    """按顺序列出某个JSONL输出的所有分片文件"""
+    base, ext = os.path.splitext(path)
+    pattern = f"{glob.escape(base)}.[0-9][0-9][0-9][0-9][0-9]{ext or '.jsonl'}"
+    return sorted(glob.glob(pattern), key=_part_number)
+
+
+def _iter_located_records(path):
+    """逐条读取记录及其位置（分片文件, 偏移量），跳过中断时写了一半的行"""
+    for part_path in list_parts(path):
+        with open(part_path, 'rb') as f:
+            offset = 0
+            for line in f:
+                location = (part_path, offset)
+                offset += len(line)
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield location, json.loads(line)
+                except ValueError:
+                    print(f"跳过不完整的记录: {part_path}")
+
+
+def _read_record(location):
+    part_path, offset = location
+    with open(part_path, 'rb') as f:
+        f.seek(offset)
+        return json.loads(f.readline())
+
+
+def iter_jsonl(path):
+    """逐条读取JSONL输出中的记录，跳过中断时写了一半的行"""
+    for _, movie in _iter_located_records(path):
+        yield movie
+
+
+def iter_unique_movies(movies):
+    """按条目ID去重，保留第一次出现的记录"""
+    seen_keys = set()
+    for movie in movies:
+        key = subject_key(movie.get('douban_url'))
+        if key in seen_keys:
+            continue
+        seen_keys.add(key)
+        yield movie
+
+
+def write_json_array(movies, output):
+    """把记录逐条写成带缩进的JSON数组，不把全部记录读入内存；返回写入条数"""
+    count = 0
+
+    with open(output, 'w', encoding='utf-8') as f:
+        f.write('[')
+        for movie in movies:
+            # 与 json.dump(movies, f, ensure_ascii=False, indent=2) 的输出格式一致
+            text = json.dumps(movie, ensure_ascii=False, indent=2)
+            f.write(',\n' if count else '\n')
+            f.write('\n'.join('  ' + line for line in text.split('\n')))
+            count += 1
+        f.write('\n]' if count else ']')
+
+    return count
+
+
+def iter_best_movies(path):
+    """按条目ID去重，按第一次出现的顺序输出；同一部电影有多条记录时，
+    详情记录优先于列表记录，多条详情记录取最后写入的一条（刷新后的数据）"""
+    # 第一遍只记录每部电影最佳记录的位置，不保留记录内容
+    best = {}
+    for location, movie in _iter_located_records(path):
+        key = subject_key(movie.get('douban_url'))
+        listing = is_listing_record(movie)
+        if key not in best or not listing or best[key][1]:
+            best[key] = (location, listing)
+
+    emitted = set()
+    for location, movie in _iter_located_records(path):
+        key = subject_key(movie.get('douban_url'))
+        if key in emitted:
+            continue
+        emitted.add(key)
+        # 第二遍读取时可能有新写入的记录
+        best_location = best.get(key, (location,))[0]
+        yield movie if best_location == location else _read_record(best_location)
+
+
+def convert_jsonl_to_json(path, output, dedupe=True):
+    """把JSONL输出转换为原来的带缩进JSON数组格式；返回写入条数"""
+    movies = iter_best_movies(path) if dedupe else iter_jsonl(path)
+    return write_json_array(movies, output)
+
+
+def main():
+    """命令行入口：转换JSONL输出"""
+    if len(sys.argv) < 3:
+        print("用法: python douban_result_sink.py <JSONL输出> <JSON文件>")
+        return
+
+    count = convert_jsonl_to_json(sys.argv[1], sys.argv[2])
+    print(f"✓ 成功转换 {count} 部电影信息到 {sys.argv[2]}")
+
+if __name__ == "__main__":
+    main()
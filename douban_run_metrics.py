@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+爬取运行记录
+每次运行结束时把耗时、请求数、失败和限流次数、缓存命中、标签列表的新电影比例等追加到JSONL文件，
+爬取模拟器根据这些记录估计延迟、失败率、缓存命中率和标签重叠程度
+"""
+
+import json
+import os
+from datetime import datetime
+
+RUN_METRICS_FILE = 'crawl_runs.jsonl'
+
+
+def collect_run_metrics(crawler, elapsed):
+    """汇总一次运行的统计信息"""
+    transport = crawler.transport.get_stats()
+    rate = crawler.rate_controller
+    metrics = {
+        'finished_at': datetime.now().isoformat(timespec='seconds'),
+        'elapsed': round(elapsed, 1),
+        'requests': transport['requests'],
+        'errors': transport['errors'],
+        'cache_hits': transport['cache_hits'],
+        'avg_time': round(transport['avg_time'], 3),
+        'p95_time': round(transport['p95_time'], 3),
+        'rate': {kind: dict(stats, final_rate=round(rate.get_rate(kind), 3), waited=round(stats['waited'], 1))
+                 for kind, stats in rate.stats.items()},
+        'listing_pages': sum(count for count, _ in crawler.tag_yields.values()),
+        'listing_new': sum(added for _, added in crawler.tag_yields.values()),
+        'collected': crawler.collected_count,
+        'coalesced': crawler.detail_flight.coalesced,
+    }
+    if crawler.catalog_estimator is not None:
+        metrics['catalog_estimate'] = crawler.catalog_estimator.chao2()
+    return metrics
+
+
+def append_run_metrics(metrics, path=RUN_METRICS_FILE):
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(metrics, ensure_ascii=False) + '\n')
+
+
+def save_run_metrics(crawler, elapsed, path=RUN_METRICS_FILE):
+    """把本次运行的统计信息追加到运行记录文件"""
+    metrics = collect_run_metrics(crawler, elapsed)
+    append_run_metrics(metrics, path)
+    print(f"运行记录已追加到 {path}")
+    return metrics
+
+
+def load_run_metrics(path=RUN_METRICS_FILE):
+    """读取以往的运行记录，文件不存在时返回空列表；跳过中断时写了一半的行"""
+    if not os.path.exists(path):
+        return []
+    runs = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                runs.append(json.loads(line))
+            except ValueError:
+                print(f"跳过不完整的运行记录: {path}")
+    return runs
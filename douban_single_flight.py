@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+合并在途的重复请求（single-flight）
+同一部电影出现在多个标签中，并发爬取时可能有多个线程或协程同时抓取它。
+按条目ID领取：第一个调用者负责抓取和解析，同时到达的其他调用者等待并共用同一次的结果，
+不会为重复的请求占用请求配额。
+发起请求的一方负责标记已爬取和写入结果，共用结果的一方据此跳过，避免重复写入。
+"""
+
+import asyncio
+import threading
+
+
+class _Call:
+    """一次在途的调用"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+
+
+class SingleFlight:
+    """线程安全的请求合并"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        # 被合并的重复请求数
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        """执行 fn()，同一key已有调用在途时等待它的结果
+
+        返回 (结果, 是否共用了其他调用的结果)；发起调用的一方出现异常时，等待的一方得到None
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            return call.result, True
+
+        try:
+            call.result = fn()
+            return call.result, False
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+class AsyncSingleFlight:
+    """asyncio版本的请求合并，只在同一个事件循环中使用
+
+    除了 do() 之外也可以分别领取和释放，用于抓取和解析分属两个阶段的流水线
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self.coalesced = 0
+
+    def claim(self, key):
+        """领取key，已有调用在途时返回False"""
+        if key in self._calls:
+            self.coalesced += 1
+            return False
+        self._calls[key] = asyncio.get_running_loop().create_future()
+        return True
+
+    def release(self, key, result=None):
+        """结束在途的调用，把结果交给等待的一方"""
+        future = self._calls.pop(key, None)
+        if future is not None and not future.done():
+            future.set_result(result)
+
+    async def do(self, key, coroutine_fn):
+        """执行 await coroutine_fn()，同一key已有调用在途时等待它的结果
+
+        返回 (结果, 是否共用了其他调用的结果)
+        """
+        future = self._calls.get(key)
+        if future is not None:
+            self.coalesced += 1
+            # shield：等待的一方被取消时不影响发起调用的一方
+            return await asyncio.shield(future), True
+
+        self.claim(key)
+        result = None
+        try:
+            result = await coroutine_fn()
+            return result, False
+        finally:
+            self.release(key, result)
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SQLite电影数据存储
+以豆瓣条目ID为主键插入或更新电影记录，类型和演员拆分为独立的表，
+年份、评分、评价人数和类型都建有索引。使用WAL模式并按批提交事务。
+可以直接作为爬虫的结果输出（与JSONL输出接口相同），也可以导入已有的JSON文件。
+
+用法:
+    python douban_sqlite_store.py import douban_movies.json [数据库文件]
+"""
+
+import json
+import re
+import sys
+import threading
+
+import sqlite3
+
+from douban_result_sink import LISTING_RECORD, write_json_array
+from douban_subject_id import extract_subject_id
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS movies (
+    subject_id INTEGER PRIMARY KEY,
+    title TEXT,
+    year INTEGER,
+    rating REAL,
+    votes INTEGER,
+    director TEXT,
+    release_date TEXT,
+    runtime TEXT,
+    summary TEXT,
+    poster_url TEXT,
+    douban_url TEXT,
+    crawl_time TEXT,
+    record_level TEXT NOT NULL DEFAULT 'detail',
+    record TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_movies_year ON movies(year);
+CREATE INDEX IF NOT EXISTS idx_movies_rating ON movies(rating);
+CREATE INDEX IF NOT EXISTS idx_movies_votes ON movies(votes);
+
+CREATE TABLE IF NOT EXISTS genres (
+    genre_id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS movie_genres (
+    subject_id INTEGER NOT NULL,
+    genre_id INTEGER NOT NULL,
+    PRIMARY KEY (subject_id, genre_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_movie_genres_genre ON movie_genres(genre_id, subject_id);
+
+CREATE TABLE IF NOT EXISTS actors (
+    actor_id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS movie_actors (
+    subject_id INTEGER NOT NULL,
+    actor_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (subject_id, actor_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_movie_actors_actor ON movie_actors(actor_id, subject_id);
+"""
+
+UPSERT_MOVIE = """
+INSERT INTO movies (subject_id, title, year, rating, votes, director, release_date,
+                    runtime, summary, poster_url, douban_url, crawl_time, record_level, record)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(subject_id) DO UPDATE SET
+    title = excluded.title,
+    year = excluded.year,
+    rating = excluded.rating,
+    votes = excluded.votes,
+    director = excluded.director,
+    release_date = excluded.release_date,
+    runtime = excluded.runtime,
+    summary = excluded.summary,
+    poster_url = excluded.poster_url,
+    douban_url = excluded.douban_url,
+    crawl_time = excluded.crawl_time,
+    record_level = excluded.record_level,
+    record = excluded.record
+WHERE excluded.record_level = 'detail' OR movies.record_level = 'listing'
+"""
+
+
+def _to_int(value):
+    """从 "1994"、"3180124人评价" 这类文本中取出整数"""
+    match = re.search(r'\d+', str(value or ''))
+    return int(match.group()) if match else None
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class SqliteMovieStore:
+    """SQLite电影存储，write/commit/close接口与JsonlResultSink一致"""
+
+    def __init__(self, path='douban_movies.db', batch_size=200):
+        self.path = path
+        # 每批事务包含的记录数
+        self.batch_size = batch_size
+        self.written = 0
+
+        self._lock = threading.Lock()
+        self._pending = []
+        self._genre_ids = {}
+        self._actor_ids = {}
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def write(self, movie_info):
+        """加入一条记录，攒满一批后在一个事务中写入"""
+        with self._lock:
+            self._pending.append(movie_info)
+            self.written += 1
+            if len(self._pending) >= self.batch_size:
+                self._flush()
+
+    def commit(self):
+        """立即写入所有缓冲的记录"""
+        with self._lock:
+            if self.conn is not None:
+                self._flush()
+
+    def close(self):
+        with self._lock:
+            if self.conn is not None:
+                self._flush()
+                self.conn.close()
+                self.conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _name_id(self, table, column, cache, name):
+        """获取类型/演员的ID，不存在时创建"""
+        if name in cache:
+            return cache[name]
+        self.conn.execute(f"INSERT OR IGNORE INTO {table} (name) VALUES (?)", (name,))
+        row = self.conn.execute(f"SELECT {column} FROM {table} WHERE name = ?", (name,)).fetchone()
+        cache[name] = row[0]
+        return row[0]
+
+    def _flush(self):
+        if not self._pending:
+            return
+
+        movie_rows = []
+        genre_rows = []
+        actor_rows = []
+        subject_ids = []
+
+        with self.conn:
+            for movie in self._pending:
+                subject_id = extract_subject_id(movie.get('douban_url'))
+                if subject_id is None:
+                    print(f"无法识别条目ID，跳过: {movie.get('douban_url')}")
+                    continue
+
+                record_level = movie.get('record_level') or 'detail'
+                movie_rows.append((
+                    subject_id,
+                    movie.get('title'),
+                    _to_int(movie.get('year')),
+                    _to_float(movie.get('rating')),
+                    _to_int(movie.get('votes')),
+                    movie.get('director'),
+                    movie.get('release_date'),
+                    movie.get('runtime'),
+                    movie.get('summary'),
+                    movie.get('poster_url'),
+                    movie.get('douban_url'),
+                    movie.get('crawl_time'),
+                    record_level,
+                    json.dumps(movie, ensure_ascii=False),
+                ))
+                # 列表记录没有类型和演员，也不能覆盖已有的详情记录
+                if record_level == LISTING_RECORD:
+                    continue
+
+                subject_ids.append((subject_id,))
+                for genre in movie.get('genres') or []:
+                    genre_rows.append((subject_id, self._name_id('genres', 'genre_id', self._genre_ids, genre)))
+                for position, actor in enumerate(movie.get('actors') or []):
+                    actor_rows.append((subject_id, self._name_id('actors', 'actor_id', self._actor_ids, actor), position))
+
+            self.conn.executemany(UPSERT_MOVIE, movie_rows)
+            # 更新时先清掉旧的类型和演员关系
+            self.conn.executemany("DELETE FROM movie_genres WHERE subject_id = ?", subject_ids)
+            self.conn.executemany("DELETE FROM movie_actors WHERE subject_id = ?", subject_ids)
+            self.conn.executemany("INSERT OR IGNORE INTO movie_genres VALUES (?, ?)", genre_rows)
+            self.conn.executemany("INSERT OR IGNORE INTO movie_actors VALUES (?, ?, ?)", actor_rows)
+
+        self._pending = []
+
+    def get(self, subject_id):
+        """按条目ID读取原始记录，不存在时返回None"""
+        self.commit()
+        row = self.conn.execute("SELECT record FROM movies WHERE subject_id = ?", (subject_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def query(self, genre=None, year=None, min_rating=None, min_votes=None, limit=100):
+        """按类型、年份、最低评分、最低评价人数查询，按评分从高到低返回记录"""
+        self.commit()
+        conditions = []
+        params = []
+        join = ''
+        if genre is not None:
+            join = ('JOIN movie_genres mg ON mg.subject_id = m.subject_id '
+                    'JOIN genres g ON g.genre_id = mg.genre_id')
+            conditions.append('g.name = ?')
+            params.append(genre)
+        if year is not None:
+            conditions.append('m.year = ?')
+            params.append(year)
+        if min_rating is not None:
+            conditions.append('m.rating >= ?')
+            params.append(min_rating)
+        if min_votes is not None:
+            conditions.append('m.votes >= ?')
+            params.append(min_votes)
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        sql = f"SELECT m.record FROM movies m {join} {where} ORDER BY m.rating DESC LIMIT ?"
+        params.append(limit)
+        return [json.loads(row[0]) for row in self.conn.execute(sql, params)]
+
+    def count(self):
+        self.commit()
+        return self.conn.execute("SELECT COUNT(*) FROM movies").fetchone()[0]
+
+    def iter_movies(self):
+        """逐条读取所有记录；使用单独的只读连接，关闭存储后也可以调用"""
+        self.commit()
+        conn = sqlite3.connect(self.path)
+        try:
+            for (record,) in conn.execute("SELECT record FROM movies ORDER BY subject_id"):
+                yield json.loads(record)
+        finally:
+            conn.close()
+
+    def iter_records(self):
+        """数据库中每部电影只保留最新的记录，与 iter_movies 相同"""
+        return self.iter_movies()
+
+    def export_json(self, output):
+        """导出为原来的带缩进JSON数组格式，返回导出条数"""
+        return write_json_array(self.iter_movies(), output)
+
+    def import_json(self, filename):
+        """导入已有的JSON数组文件（如 douban_movies.json），返回导入条数"""
+        with open(filename, 'r', encoding='utf-8') as f:
+            movies = json.load(f)
+
+        for movie in movies:
+            self.write(movie)
+        self.commit()
+        return len(movies)
+
+
+def main():
+    """命令行入口：导入JSON文件"""
+    if len(sys.argv) < 3 or sys.argv[1] != 'import':
+        print("用法: python douban_sqlite_store.py import <JSON文件> [数据库文件]")
+        return
+
+    db_path = sys.argv[3] if len(sys.argv) > 3 else 'douban_movies.db'
+    with SqliteMovieStore(db_path) as store:
+        count = store.import_json(sys.argv[2])
+        print(f"✓ 成功导入 {count} 条记录，数据库中共 {store.count()} 部电影")
+
+if __name__ == "__main__":
+    main()
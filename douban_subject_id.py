@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+豆瓣电影条目ID工具
+同一部电影的链接有多种写法：http/https、有无结尾斜杠、带查询参数、
+m.douban.com/movie/subject/... 移动版等，去重和输出时统一按数字条目ID处理。
+读书、音乐等其他豆瓣站点的 /subject/<ID> 是另一套编号，不当作电影条目
+"""
+
+import re
+from urllib.parse import urlsplit
+
+SUBJECT_ID_PATTERN = re.compile(r'/subject/(\d+)')
+SUBJECT_URL_TEMPLATE = "https://movie.douban.com/subject/{}/"
+
+
+def _is_movie_link(url):
+    """相对链接、电影站点和移动版电影页面；其他豆瓣站点（book、music、www等）不是电影链接"""
+    parts = urlsplit(url)
+    host = (parts.hostname or '').lower()
+    if host == 'm.douban.com':
+        return parts.path.startswith('/movie/')
+    return host == 'movie.douban.com' or not (host == 'douban.com' or host.endswith('.douban.com'))
+
+
+def extract_subject_id(url):
+    """从电影链接中提取数字条目ID，无法识别或不是电影链接时返回None；传入整数时原样返回"""
+    if isinstance(url, int):
+        return url
+    if not url:
+        return None
+    match = SUBJECT_ID_PATTERN.search(url)
+    if not match or not _is_movie_link(url):
+        return None
+    return int(match.group(1))
+
+
+def canonical_subject_url(url):
+    """把电影链接规范为 https://movie.douban.com/subject/<条目ID>/，无法识别或不是电影链接时原样返回"""
+    subject_id = extract_subject_id(url)
+    if subject_id is None:
+        return url
+    return SUBJECT_URL_TEMPLATE.format(subject_id)
+
+
+def subject_key(url):
+    """去重使用的键：能识别条目ID时为条目ID，否则为链接本身"""
+    subject_id = extract_subject_id(url)
+    return url if subject_id is None else subject_id
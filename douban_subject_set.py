@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按豆瓣条目ID记录已爬取电影的紧凑集合
+豆瓣条目ID是较稠密的整数（目前在4000万以内），直接用位图保存，一千万部电影也只占几MB：
+- 位图文件启动时用mmap映射，不需要解析，判断是否存在是O(1)的位运算
+- 位图文件开头16字节保存标识和ID数量，启动时不需要统计位图（没有文件头的旧文件仍可读取）
+- 新增的ID追加写入日志文件（每个ID 4字节，因此保存到文件的ID不能超过 MAX_SUBJECT_ID），
+  累积到一定数量后合并进位图（压缩）
+- 中断后重启时回放日志，重复回放不影响结果
+"""
+
+import mmap
+import os
+import struct
+import threading
+
+from douban_subject_id import extract_subject_id
+
+# 位图文件头：8字节标识 + 8字节ID数量
+_HEADER_MAGIC = b'DBSUBJ1\n'
+_HEADER = struct.Struct('<8sQ')
+
+# 每个字节中置位的个数，用于统计旧位图文件中的ID数量
+_POPCOUNT = bytes(bin(i).count('1') for i in range(256))
+_POPCOUNT_CHUNK = 1024 * 1024
+_FULL_WORD = (1 << 64) - 1
+
+# 日志中每个ID占4字节，保存到文件的ID上限
+MAX_SUBJECT_ID = (1 << 32) - 1
+
+
+class SubjectIdSet:
+    """已爬取条目ID集合，可以直接传入条目ID或详情页URL"""
+
+    def __init__(self, path=None, compact_every=100000):
+        # path为None时只保存在内存中
+        self.path = path
+        self.log_path = f"{path}.log" if path else None
+        # 日志中累积多少个ID后合并进位图
+        self.compact_every = compact_every
+
+        self._lock = threading.Lock()
+        self._bitmap = b''
+        self._bitmap_file = None
+        # 位图数据在文件中的起始位置（文件头之后）
+        self._offset = 0
+        self._bitmap_count = 0
+        # 尚未合并进位图的ID
+        self._recent = set()
+        # 无法识别条目ID的链接，只保存在内存中
+        self._others = set()
+        self._log = None
+
+        if path:
+            self._load()
+
+    def _load(self):
+        if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+            self._open_bitmap()
+
+        if os.path.exists(self.log_path):
+            with open(self.log_path, 'rb') as f:
+                data = f.read()
+            # 去掉中断时写了一半的ID
+            usable = len(data) - len(data) % 4
+            for (subject_id,) in struct.iter_unpack('<I', data[:usable]):
+                if not self._in_bitmap(subject_id):
+                    self._recent.add(subject_id)
+            if usable != len(data):
+                with open(self.log_path, 'rb+') as f:
+                    f.truncate(usable)
+
+        self._log = open(self.log_path, 'ab')
+
+    def _open_bitmap(self):
+        self._bitmap_file = open(self.path, 'rb')
+        self._bitmap = mmap.mmap(self._bitmap_file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._bitmap) >= _HEADER.size and self._bitmap[:len(_HEADER_MAGIC)] == _HEADER_MAGIC:
+            _, self._bitmap_count = _HEADER.unpack_from(self._bitmap)
+            self._offset = _HEADER.size
+        else:
+            # 旧版本没有文件头，分块统计一次，下次压缩时写入文件头
+            self._offset = 0
+            self._bitmap_count = sum(
+                sum(self._bitmap[start:start + _POPCOUNT_CHUNK].translate(_POPCOUNT))
+                for start in range(0, len(self._bitmap), _POPCOUNT_CHUNK))
+
+    @staticmethod
+    def _to_id(value):
+        if isinstance(value, int):
+            return value
+        return extract_subject_id(value)
+
+    def _in_bitmap(self, subject_id):
+        index = (subject_id >> 3) + self._offset
+        return index < len(self._bitmap) and bool(self._bitmap[index] & (1 << (subject_id & 7)))
+
+    def __contains__(self, value):
+        subject_id = self._to_id(value)
+        # 压缩时会关闭并重新映射位图，查询要和压缩互斥
+        with self._lock:
+            if subject_id is None:
+                return value in self._others
+            return subject_id in self._recent or self._in_bitmap(subject_id)
+
+    def __len__(self):
+        return self._bitmap_count + len(self._recent) + len(self._others)
+
+    def __iter__(self):
+        """按从小到大的顺序返回所有条目ID，之后是无法识别条目ID的链接"""
+        with self._lock:
+            ids = list(self._iter_bitmap())
+            recent = sorted(self._recent)
+            others = list(self._others)
+        # 两部分都已有序且没有重复，排序只需合并
+        ids.extend(recent)
+        ids.sort()
+        ids.extend(others)
+        return iter(ids)
+
+    def _iter_bitmap(self):
+        """按8字节一个字扫描位图，跳过全零的字，全满的字整段返回"""
+        size = len(self._bitmap) - self._offset
+        words_end = self._offset + size - size % 8
+        with memoryview(self._bitmap) as view:
+            with view[self._offset:words_end] as words:
+                for word_index, (word,) in enumerate(struct.iter_unpack('<Q', words)):
+                    if not word:
+                        continue
+                    base = word_index << 6
+                    if word == _FULL_WORD:
+                        yield from range(base, base + 64)
+                        continue
+                    while word:
+                        low = word & -word
+                        yield base + low.bit_length() - 1
+                        word ^= low
+            with view[words_end:] as tail:
+                word = int.from_bytes(tail, 'little')
+        base = (size - size % 8) << 3
+        while word:
+            low = word & -word
+            yield base + low.bit_length() - 1
+            word ^= low
+
+    def add(self, value):
+        subject_id = self._to_id(value)
+        with self._lock:
+            if subject_id is None:
+                self._others.add(value)
+                return
+            if subject_id in self._recent or self._in_bitmap(subject_id):
+                return
+            if self._log is not None and subject_id > MAX_SUBJECT_ID:
+                raise ValueError(f"条目ID {subject_id} 超出已爬取记录文件支持的范围（最大 {MAX_SUBJECT_ID}）")
+            self._recent.add(subject_id)
+            if self._log is not None:
+                self._log.write(struct.pack('<I', subject_id))
+                if len(self._recent) >= self.compact_every:
+                    self._compact()
+
+    def update(self, values):
+        for value in values:
+            self.add(value)
+
+    def flush(self):
+        """把日志写入磁盘"""
+        with self._lock:
+            if self._log is not None:
+                self._log.flush()
+                os.fsync(self._log.fileno())
+
+    def compact(self):
+        """把日志中的ID合并进位图文件并清空日志"""
+        with self._lock:
+            if self.path:
+                self._compact()
+
+    def _compact(self):
+        if not self._recent:
+            return
+
+        old_size = len(self._bitmap) - self._offset
+        size = max(old_size, (max(self._recent) >> 3) + 1)
+        count = self._bitmap_count + len(self._recent)
+        bitmap = bytearray(_HEADER.size + size)
+        _HEADER.pack_into(bitmap, 0, _HEADER_MAGIC, count)
+        bitmap[_HEADER.size:_HEADER.size + old_size] = self._bitmap[self._offset:]
+        for subject_id in self._recent:
+            bitmap[_HEADER.size + (subject_id >> 3)] |= 1 << (subject_id & 7)
+
+        # 先写临时文件再替换，替换前要关闭映射（Windows下不能替换已映射的文件）
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(bitmap)
+            f.flush()
+            os.fsync(f.fileno())
+        self._close_bitmap()
+        os.replace(temp_path, self.path)
+
+        self._open_bitmap()
+        self._recent = set()
+
+        # 位图已落盘，日志可以清空
+        self._log.close()
+        self._log = open(self.log_path, 'wb')
+
+    def _close_bitmap(self):
+        if self._bitmap_file is not None:
+            self._bitmap.close()
+            self._bitmap_file.close()
+            self._bitmap_file = None
+        self._bitmap = b''
+        self._offset = 0
+
+    def close(self):
+        """合并日志并关闭文件"""
+        with self._lock:
+            if self._log is None:
+                return
+            self._compact()
+            self._log.close()
+            self._log = None
+            self._close_bitmap()
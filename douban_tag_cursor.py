@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+标签翻页进度记录
+按（标签, 排序方式）记录下一页的起始位置，每爬完一页就以原子方式写入文件
+（先写临时文件再替换），中断后可以从最后完成的一页继续，不再重复请求前面的列表页。
+"""
+
+import json
+import os
+import threading
+from datetime import datetime
+
+
+class TagCursorStore:
+    """标签翻页进度，保存在一个JSON文件中"""
+
+    def __init__(self, path='tag_cursors.json'):
+        self.path = path
+        self._lock = threading.Lock()
+        self.cursors = {}
+
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.cursors = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"加载翻页进度失败: {e}")
+
+    @staticmethod
+    def _key(tag, sort):
+        return f"{tag}|{sort}"
+
+    def get(self, tag, sort='recommend'):
+        """返回 {'next_start': 下一页起始位置, 'exhausted': 是否已经没有更多页}，没有记录时返回None"""
+        return self.cursors.get(self._key(tag, sort))
+
+    def advance(self, tag, sort, next_start, exhausted=False):
+        """记录一页已完成并立即写入文件"""
+        with self._lock:
+            self.cursors[self._key(tag, sort)] = {
+                'next_start': next_start,
+                'exhausted': exhausted,
+                'updated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            }
+            self._save()
+
+    def reset(self, tag, sort='recommend'):
+        """清除某个标签的进度，下次从第一页开始"""
+        with self._lock:
+            if self.cursors.pop(self._key(tag, sort), None) is not None:
+                self._save()
+
+    def _save(self):
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.cursors, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
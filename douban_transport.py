@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+豆瓣爬虫共享传输层
+所有爬虫版本和测试/调试脚本共用同一个连接池：
+- 长连接复用，避免每次请求都重新进行TCP+TLS握手
+- 共享同一个SSL上下文，新建连接时不再重复加载证书
+- 同一主机只在新建连接时解析DNS；不替换进程全局的 socket.getaddrinfo，不影响其他库
+- 记录每次请求的耗时统计
+- 可选的磁盘HTTP缓存，支持条件请求（304）
+"""
+
+import ssl
+import threading
+import time
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from douban_http_cache import DEFAULT_MAX_BYTES, HttpCache
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """使用共享SSL上下文的连接池适配器"""
+
+    def __init__(self, ssl_context=None, **kwargs):
+        self.ssl_context = ssl_context
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        if self.ssl_context is not None:
+            kwargs['ssl_context'] = self.ssl_context
+        return super().init_poolmanager(*args, **kwargs)
+
+
+class DoubanTransport:
+    """带连接池和请求计时的HTTP传输层"""
+
+    def __init__(self, pool_connections=4, pool_maxsize=32, max_retries=0):
+        self.session = requests.Session()
+        self.session.headers['Connection'] = 'keep-alive'
+
+        # 所有连接共用一个SSL上下文
+        self.ssl_context = ssl.create_default_context()
+        adapter = PooledHTTPAdapter(
+            ssl_context=self.ssl_context,
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=max_retries,
+        )
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        # HTTP缓存，默认关闭
+        self.cache = None
+
+        # 请求统计
+        self._lock = threading.Lock()
+        self.recent_timings = deque(maxlen=1000)
+        self.stats = {
+            'requests': 0,
+            'errors': 0,
+            'bytes': 0,
+            'total_time': 0.0,
+            'cache_hits': 0,
+            'revalidated': 0,
+        }
+
+    def enable_cache(self, cache_dir='http_cache', ttl_policies=None, max_bytes=DEFAULT_MAX_BYTES):
+        """启用磁盘HTTP缓存，总大小超过max_bytes时删除过期和最早保存的条目"""
+        self.cache = HttpCache(cache_dir, ttl_policies, max_bytes=max_bytes)
+        return self.cache
+
+    def get_cached(self, url):
+        """缓存中有未过期的内容时直接返回响应对象，否则返回None"""
+        if self.cache is None:
+            return None
+
+        meta = self.cache.lookup(url)
+        if meta is None or not self.cache.is_fresh(url, meta):
+            return None
+
+        try:
+            response = self.cache.build_response(url, meta)
+        except (OSError, ValueError):
+            return None
+        response.request_time = 0.0
+        with self._lock:
+            self.stats['cache_hits'] += 1
+        return response
+
+    def get(self, url, **kwargs):
+        """发起GET请求，并记录耗时；响应对象上附加request_time属性（秒）
+
+        启用缓存时，缓存过期的URL会带上条件请求头，服务器返回304时复用缓存内容。
+        """
+        meta = self.cache.lookup(url) if self.cache is not None else None
+        if meta is not None:
+            headers = dict(kwargs.get('headers') or {})
+            headers.update(self.cache.conditional_headers(meta))
+            kwargs['headers'] = headers
+
+        start = time.perf_counter()
+        try:
+            response = self.session.get(url, **kwargs)
+        except Exception:
+            self._record(url, time.perf_counter() - start, None, 0)
+            raise
+
+        elapsed = time.perf_counter() - start
+        self._record(url, elapsed, response.status_code, len(response.content))
+
+        if self.cache is not None:
+            if response.status_code == 304 and meta is not None:
+                self._write_cache(self.cache.refresh, url, meta, response)
+                response = self.cache.build_response(url, meta)
+                with self._lock:
+                    self.stats['revalidated'] += 1
+            elif response.status_code == 200:
+                self._write_cache(self.cache.store, url, response)
+
+        response.request_time = elapsed
+        return response
+
+    def _write_cache(self, write, url, *args):
+        """写入缓存失败（磁盘已满、权限等）只影响之后能否命中缓存，不影响这次请求"""
+        try:
+            write(url, *args)
+        except (OSError, ValueError) as e:
+            print(f"写入HTTP缓存失败 {url}: {e}")
+
+    def _record(self, url, elapsed, status_code, size):
+        with self._lock:
+            self.stats['requests'] += 1
+            self.stats['total_time'] += elapsed
+            self.stats['bytes'] += size
+            if status_code is None or status_code >= 400:
+                self.stats['errors'] += 1
+            self.recent_timings.append((url, status_code, elapsed))
+
+    def get_stats(self):
+        """返回请求统计信息"""
+        with self._lock:
+            stats = dict(self.stats)
+            timings = sorted(t[2] for t in self.recent_timings)
+
+        stats['avg_time'] = stats['total_time'] / stats['requests'] if stats['requests'] else 0.0
+        stats['p95_time'] = timings[int(len(timings) * 0.95) - 1] if timings else 0.0
+        return stats
+
+    def print_stats(self):
+        """打印请求统计信息"""
+        stats = self.get_stats()
+        print(f"请求数: {stats['requests']}，失败: {stats['errors']}，"
+              f"流量: {stats['bytes'] / 1024:.1f} KB，"
+              f"平均耗时: {stats['avg_time']:.3f}s，P95耗时: {stats['p95_time']:.3f}s")
+        if self.cache is not None:
+            print(f"缓存命中: {stats['cache_hits']}，304复用: {stats['revalidated']}")
+
+    def close(self):
+        """关闭连接池"""
+        self.session.close()
+
+
+_shared_transport = None
+_shared_lock = threading.Lock()
+
+
+def get_transport():
+    """获取进程内共享的传输层实例"""
+    global _shared_transport
+    with _shared_lock:
+        if _shared_transport is None:
+            _shared_transport = DoubanTransport()
+        return _shared_transport
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试用的离线爬虫
+只替换网络请求（_request），列表页和详情页由测试提供；链接规范化、合并重复请求、
+详情页解析和已爬取记录都走爬虫本身的代码。
+"""
+
+import json
+import threading
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+from douban_movie_crawler_unlimited import DoubanMovieCrawlerUnlimited
+from douban_subject_id import canonical_subject_url, extract_subject_id
+
+
+def detail_html(title, rating=None, votes=None, year=None, genres=(), summary=None, recommendations=()):
+    """生成能被各个解析后端解析的最小详情页；recommendations为 (条目ID, 标题, 评分) 列表"""
+    parts = [f'<h1><span property="v:itemreviewed">{title}</span></h1>']
+    if year is not None:
+        parts.append(f'<span class="year">({year})</span>')
+    if rating is not None:
+        parts.append(f'<strong class="ll rating_num" property="v:average">{rating}</strong>')
+    if votes is not None:
+        parts.append(f'<a class="rating_people" href="collections"><span property="v:votes">{votes}</span>人评价</a>')
+    parts.extend(f'<span property="v:genre">{genre}</span>' for genre in genres)
+    if summary is not None:
+        parts.append(f'<span property="v:summary">{summary}</span>')
+    if recommendations:
+        related = ''.join(
+            f'<dl><dt><a href="{canonical_subject_url(subject_id)}?from=subject-page"><img alt="{name}"/></a></dt>'
+            f'<dd><a href="{canonical_subject_url(subject_id)}?from=subject-page" >{name}</a>'
+            f'<span class="subject-rate">{rate}</span></dd></dl>'
+            for subject_id, name, rate in recommendations
+        )
+        parts.append(f'<div id="recommendations"><div class="recommendations-bd">{related}</div></div>')
+    return f"<html><body>{''.join(parts)}</body></html>"
+
+
+class FakeResponse:
+    """只包含爬虫用到的响应属性"""
+
+    def __init__(self, text):
+        self.text = text
+        self.content = text.encode('utf-8')
+        self.encoding = 'utf-8'
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class OfflineCrawler(DoubanMovieCrawlerUnlimited):
+    """用固定数据代替网络请求的爬虫
+
+    子类覆盖 tag_page / top250_page / detail_page 提供页面内容；
+    failing_subjects 中的详情页请求会失败，tag_page 返回None时列表请求失败。
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # 依次发出的所有请求、标签列表请求 (标签, 起始位置) 和详情页请求
+        self.requests = []
+        self.listing_requests = []
+        self.detail_requests = []
+        self.failing_subjects = set()
+        self._requests_lock = threading.Lock()
+
+    def tag_page(self, tag, start, sort):
+        """返回标签列表页的条目列表"""
+        return []
+
+    def top250_page(self, start):
+        """返回Top250列表页的HTML"""
+        return ''
+
+    def detail_page(self, subject_id):
+        """返回详情页的HTML"""
+        return detail_html(f"电影{subject_id}")
+
+    def _request(self, url, kind, timeout, use_cache=True):
+        parsed = urlparse(url)
+        query = {name: values[0] for name, values in parse_qs(parsed.query).items()}
+        subject_id = extract_subject_id(url)
+        is_tag_listing = parsed.path.startswith('/j/search_subjects')
+        with self._requests_lock:
+            self.requests.append(url)
+            if is_tag_listing:
+                self.listing_requests.append((query['tag'], int(query['page_start'])))
+            elif subject_id is not None:
+                self.detail_requests.append(url)
+
+        if is_tag_listing:
+            subjects = self.tag_page(query['tag'], int(query['page_start']), query['sort'])
+            if subjects is None:
+                raise requests.ConnectionError(f"列表请求失败: {url}")
+            return FakeResponse(json.dumps({'subjects': subjects}, ensure_ascii=False))
+        if parsed.path.startswith('/top250'):
+            return FakeResponse(self.top250_page(int(query['start'])))
+        if subject_id is None or subject_id in self.failing_subjects:
+            raise requests.ConnectionError(f"详情请求失败: {url}")
+        return FakeResponse(self.detail_page(subject_id))
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试异步版本的并发上限、按主机限速和抓取/解析两个阶段
+在本地启动慢速服务器，统计同时在途的请求数、每个主机收到请求的时间间隔，
+以及解析阶段阻塞时抓取阶段发起的请求数
+"""
+
+import sys
+import os
+import asyncio
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# 添加当前目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from douban_movie_crawler_async import DoubanMovieCrawlerAsync
+from douban_rate_controller import AdaptiveRateController
+from douban_transport import DoubanTransport
+
+# 服务器处理每个请求的耗时（秒）
+RESPONSE_DELAY = 0.15
+# 到达时间的误差：线程池调度和建立连接的耗时
+TIMING_TOLERANCE = 0.03
+
+
+class RecordingServer(ThreadingHTTPServer):
+    """记录每个请求的到达时间和同时在途的请求数"""
+
+    def __init__(self, body=b'ok'):
+        super().__init__(('127.0.0.1', 0), SlowHandler)
+        self.body = body
+        self.arrivals = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.server_port}{path}"
+
+
+class SlowHandler(BaseHTTPRequestHandler):
+    """每个请求等待RESPONSE_DELAY秒后返回"""
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.arrivals.append(time.monotonic())
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        time.sleep(RESPONSE_DELAY)
+        with server.lock:
+            server.in_flight -= 1
+
+        body = server.body
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_crawler(concurrency, max_rate, parse_workers=0, parse_queue_size=None):
+    """自适应限速放宽到不起作用，只检查并发上限和按主机限速"""
+    crawler = DoubanMovieCrawlerAsync(concurrency=concurrency, max_rate=max_rate,
+                                      parse_workers=parse_workers, parse_queue_size=parse_queue_size)
+    crawler.transport = DoubanTransport()
+    crawler.rate_controller = AdaptiveRateController(
+        budgets={'detail': {'rate': 1000.0, 'min_rate': 1000.0, 'max_rate': 1000.0, 'capacity': 1000.0}}
+    )
+    return crawler
+
+
+def fetch_all(crawler, urls):
+    async def run():
+        return await asyncio.gather(*(crawler._fetch(url, 'detail', timeout=5) for url in urls))
+
+    try:
+        return asyncio.run(run())
+    finally:
+        crawler.close()
+        crawler.transport.close()
+
+
+def test_concurrency_bound():
+    """同时在途的请求数不超过并发上限，且能用满"""
+    print("测试并发上限...")
+    server = RecordingServer()
+    try:
+        crawler = make_crawler(concurrency=3, max_rate=0)
+        responses = fetch_all(crawler, [server.url(f"/subject/{i}/") for i in range(12)])
+    finally:
+        server.shutdown()
+
+    assert [response.status_code for response in responses] == [200] * 12
+    assert server.max_in_flight == 3
+    print(f"✓ 12个请求，最多同时在途 {server.max_in_flight} 个")
+
+
+def test_per_host_rate_cap():
+    """同一主机的请求间隔不小于 1/max_rate，不同主机互不等待"""
+    print("测试按主机限速...")
+    max_rate = 10
+    interval = 1.0 / max_rate
+    first, second = RecordingServer(), RecordingServer()
+    try:
+        crawler = make_crawler(concurrency=8, max_rate=max_rate)
+        urls = [server.url(f"/subject/{i}/") for i in range(6) for server in (first, second)]
+        started = time.monotonic()
+        fetch_all(crawler, urls)
+        elapsed = time.monotonic() - started
+    finally:
+        first.shutdown()
+        second.shutdown()
+
+    for server in (first, second):
+        arrivals = sorted(server.arrivals)
+        assert len(arrivals) == 6
+        gaps = [later - earlier for earlier, later in zip(arrivals, arrivals[1:])]
+        assert min(gaps) >= interval - TIMING_TOLERANCE, gaps
+    # 两个主机各自限速：12个请求的用时与单个主机的6个请求相当
+    assert elapsed < 6 * interval + RESPONSE_DELAY + 0.2
+    print(f"✓ 每个主机的最小请求间隔 {interval:.2f}s，两个主机共12个请求用时 {elapsed:.2f}s")
+
+
+def test_parse_worker_processes():
+    """指定解析进程数时在进程池中解析，结果与线程中解析一致"""
+    print("测试解析进程池...")
+    fixture = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'douban_detail_debug.html')
+    with open(fixture, 'rb') as f:
+        server = RecordingServer(f.read())
+    links = [{'url': server.url(f"/subject/{subject_id}/")} for subject_id in (1292052, 1291546, 1295644)]
+
+    try:
+        titles = {}
+        for parse_workers in (0, 2):
+            crawler = make_crawler(concurrency=3, max_rate=0, parse_workers=parse_workers)
+            try:
+                results = asyncio.run(crawler._crawl_movie_links(links))
+            finally:
+                crawler.close()
+                crawler.transport.close()
+            assert (crawler._parse_pool is not None) == (parse_workers > 0)
+            titles[parse_workers] = sorted((movie['douban_url'], movie['title']) for movie in results)
+    finally:
+        server.shutdown()
+
+    assert len(titles[2]) == 3
+    assert all('肖申克的救赎' in title for _, title in titles[2])
+    assert titles[2] == titles[0]
+    print(f"✓ 2个解析进程解析了 {len(titles[2])} 个页面，结果与线程中解析一致")
+
+
+def test_full_page_queue_blocks_fetcher():
+    """解析阶段阻塞时，抓取阶段最多多下载解析队列容量那么多的页面"""
+    print("测试解析队列背压...")
+    server = RecordingServer()
+    crawler = make_crawler(concurrency=2, max_rate=0, parse_queue_size=1)
+    links = [{'url': server.url(f"/subject/{i}/")} for i in range(12)]
+
+    async def run():
+        release = asyncio.Event()
+
+        async def blocked_parse(movie_url, content, encoding):
+            await release.wait()
+            return {'douban_url': movie_url, 'title': movie_url}
+
+        crawler._parse_detail_page = blocked_parse
+        task = asyncio.create_task(crawler._crawl_movie_links(links))
+        await asyncio.sleep(RESPONSE_DELAY * 8)
+        fetched = len(server.arrivals)
+        release.set()
+        return fetched, await task
+
+    try:
+        fetched, results = asyncio.run(run())
+    finally:
+        server.shutdown()
+        crawler.close()
+        crawler.transport.close()
+
+    # 2个解析协程各持有1页，队列中1页，2个抓取协程各持有1页等待放入队列
+    assert fetched == 2 + 1 + 2, fetched
+    assert len(results) == 12
+    print(f"✓ 解析阻塞时只下载了 {fetched} 个页面，解除后12个页面全部完成")
+
+
+def main():
+    """主测试函数"""
+    print("异步版本测试")
+    print("=" * 50)
+
+    test_concurrency_bound()
+    test_per_host_rate_cap()
+    test_parse_worker_processes()
+    test_full_page_queue_blocks_fetcher()
+
+    print("\n✓ 所有测试通过")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试布隆过滤器
+"""
+
+import sys
+import os
+import shutil
+import tempfile
+
+# 添加当前目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from douban_bloom_filter import BloomFilter
+from douban_movie_crawler_unlimited import DoubanMovieCrawlerUnlimited
+
+
+def test_false_positive_rate():
+    """加入的元素都能查到，实际误判率接近设定值"""
+    print("测试误判率...")
+    bloom = BloomFilter(capacity=20000, error_rate=0.01)
+    for subject_id in range(1000000, 1020000):
+        bloom.add(subject_id)
+
+    assert all(subject_id in bloom for subject_id in range(1000000, 1020000))
+    false_positives = sum(1 for subject_id in range(2000000, 2020000) if subject_id in bloom)
+    rate = false_positives / 20000
+    assert rate < 0.02
+    print(f"✓ 设定误判率 1%，实际 {rate:.2%}，占用 {len(bloom.bits) // 1024} KB")
+
+
+def test_save_and_load():
+    """保存后重新加载，内容不变"""
+    print("测试保存和加载...")
+    work_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(work_dir, 'seen.bloom')
+        bloom = BloomFilter(capacity=1000, error_rate=0.001)
+        bloom.add(1292052)
+        bloom.save(path)
+
+        loaded = BloomFilter.load(path)
+        assert 1292052 in loaded
+        assert loaded.count == 1
+        assert loaded.num_hashes == bloom.num_hashes
+        assert loaded.capacity == 1000
+
+        with open(path, 'r+b') as f:
+            f.write(b'XXXX')
+        try:
+            BloomFilter.load(path)
+            assert False, "格式错误的文件应该抛出异常"
+        except ValueError:
+            pass
+        print("✓ 加载结果与保存前一致，损坏的文件会被拒绝")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def test_crawler_filter():
+    """爬虫启用过滤器后去重结果不变，过期的过滤器会重新生成"""
+    print("测试爬虫去重...")
+    work_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(work_dir, 'seen.bloom')
+        crawler = DoubanMovieCrawlerUnlimited()
+        crawler.crawled_urls.update([1292052, 1291546])
+
+        crawler.use_bloom_filter(path, capacity=1000)
+        crawler._mark_crawled("https://movie.douban.com/subject/1292720/")
+        assert crawler._is_crawled("https://movie.douban.com/subject/1292052/")
+        assert crawler._is_crawled("https://movie.douban.com/subject/1292720/")
+        assert not crawler._is_crawled("https://movie.douban.com/subject/1295644/")
+        crawler.seen_filter.save(path)
+
+        # 已爬取集合比过滤器多，需要重新生成
+        crawler.crawled_urls.add(1295644)
+        crawler.use_bloom_filter(path, capacity=1000)
+        assert crawler.seen_filter.count == 4
+        assert crawler._is_crawled("https://movie.douban.com/subject/1295644/")
+
+        # 过滤器放在位图文件前面，由位图中的记录生成
+        bitmap_path = os.path.join(work_dir, 'crawled.bitmap')
+        bitmap_crawler = DoubanMovieCrawlerUnlimited()
+        bitmap_crawler.load_crawled_urls(bitmap_path)
+        bitmap_crawler.crawled_urls.update([1292052, 1291546])
+        bitmap_crawler.crawled_urls.compact()
+        bitmap_crawler.use_bloom_filter(os.path.join(work_dir, 'bitmap.bloom'), capacity=1000)
+        assert bitmap_crawler.seen_filter.count == 2
+        bitmap_crawler._mark_crawled("https://movie.douban.com/subject/1292720/")
+        assert bitmap_crawler._is_crawled("https://movie.douban.com/subject/1292052/")
+        assert bitmap_crawler._is_crawled("https://movie.douban.com/subject/1292720/")
+        assert not bitmap_crawler._is_crawled("https://movie.douban.com/subject/1295644/")
+        bitmap_crawler.save_crawled_urls(bitmap_path)
+        bitmap_crawler.crawled_urls.close()
+
+        # 重新启动后直接加载保存的过滤器
+        restarted = DoubanMovieCrawlerUnlimited()
+        restarted.load_crawled_urls(bitmap_path)
+        restarted.use_bloom_filter(os.path.join(work_dir, 'bitmap.bloom'), capacity=1000)
+        assert restarted.seen_filter.count == 3
+        assert restarted._is_crawled("https://movie.douban.com/subject/1292720/")
+        restarted.crawled_urls.close()
+        print("✓ 过滤器与已爬取集合保持一致，位图文件前面同样可以使用")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def main():
+    """主测试函数"""
+    print("布隆过滤器测试")
+    print("=" * 50)
+
+    test_false_positive_rate()
+    test_save_and_load()
+    test_crawler_filter()
+
+    print("\n✓ 所有测试通过")
+
+if __name__ == "__main__":
+    main()
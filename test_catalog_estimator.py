@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试目录规模估计（按各标签列表页的重叠估计可爬取的电影总数和剩余产出）
+"""
+
+import sys
+import os
+import asyncio
+import json
+import random
+import shutil
+import tempfile
+
+# 添加当前目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from douban_catalog_estimator import CatalogEstimator
+from douban_movie_crawler_async import DoubanMovieCrawlerAsync
+from offline_crawler import FakeResponse, OfflineCrawler
+
+POPULATION = 4000
+TAG_COUNT = 30
+TAG_SIZE = 300
+
+
+def _tag_samples(population, tag_count, tag_size, seed=7):
+    """每个标签是从全部电影中随机抽取的一组，按页返回"""
+    generator = random.Random(seed)
+    return {f"标签{i}": generator.sample(range(population), tag_size) for i in range(tag_count)}
+
+
+def test_known_population():
+    """随机抽样时Chao2和Chapman估计接近真实总数，而已见数量明显偏低"""
+    print("测试已知总数的估计...")
+    estimator = CatalogEstimator()
+    samples = _tag_samples(POPULATION, TAG_COUNT, TAG_SIZE)
+    for tag, subject_ids in samples.items():
+        for start in range(0, TAG_SIZE, 20):
+            estimator.observe(tag, subject_ids[start:start + 20])
+
+    summary = estimator.summary()
+    assert summary['observed'] < 0.95 * POPULATION
+    assert abs(summary['chao2'] - POPULATION) < 0.1 * POPULATION
+    assert abs(summary['chapman'] - POPULATION) < 0.1 * POPULATION
+    assert summary['remaining'] > 0
+
+    # 两个标签之间的估计：Chapman是Lincoln–Petersen的小样本修正
+    petersen = estimator.lincoln_petersen('标签0', '标签1')
+    chapman = estimator.chapman('标签0', '标签1')
+    assert petersen is not None and abs(chapman - petersen) < 0.2 * petersen
+    assert estimator.lincoln_petersen('标签0', '标签0') == TAG_SIZE
+    print(f"✓ 真实 {POPULATION} 部，已见 {summary['observed']} 部，"
+          f"Chao2估计 {summary['chao2']:.0f}，Chapman估计 {summary['chapman']:.0f}")
+
+
+def test_marginal_yield():
+    """越往后每1000个请求发现的新电影越少；每个来源的独有电影数与总数一致"""
+    print("测试产出下降...")
+    estimator = CatalogEstimator(window=20)
+    samples = _tag_samples(POPULATION, TAG_COUNT, TAG_SIZE)
+    rates = []
+    for tag, subject_ids in samples.items():
+        for start in range(0, TAG_SIZE, 20):
+            estimator.observe(tag, subject_ids[start:start + 20])
+        rates.append(estimator.new_per_1000_requests())
+
+    assert rates[-1] < rates[0] / 2
+    assert estimator.warmed_up()
+    stats = estimator.source_stats()
+    assert len(stats) == TAG_COUNT and all(item['pages'] == TAG_SIZE // 20 for item in stats)
+    assert sum(item['unique'] for item in stats) == estimator._frequency[1]
+    # 单个来源无法估计总数
+    single = CatalogEstimator()
+    single.observe('热门', range(20))
+    assert single.chao2() is None and single.pooled_chapman() is None
+    print(f"✓ 每1000个列表请求发现的新电影从 {rates[0]:.0f} 部下降到 {rates[-1]:.0f} 部")
+
+
+class SaturatingCrawler(OfflineCrawler):
+    """6个标签都从同样的300部电影中随机排序"""
+
+    def __init__(self):
+        super().__init__()
+        self.popular_tags = [f"标签{i}" for i in range(6)]
+        self.samples = _tag_samples(300, 6, 300, seed=3)
+
+    def tag_page(self, tag, start, sort):
+        return [{'url': f"https://movie.douban.com/subject/{1000 + subject_id}/", 'title': str(subject_id)}
+                for subject_id in self.samples[tag][start:start + 20]]
+
+
+def test_crawler_stops_below_threshold():
+    """任务队列模式下产出低于阈值后不再翻页，已见电影已接近全部"""
+    print("测试低产出时停止翻页...")
+    work_dir = tempfile.mkdtemp()
+    try:
+        full = SaturatingCrawler()
+        full.use_frontier(os.path.join(work_dir, 'full.db'))
+        full.crawl_all_movies()
+        full.close_frontier()
+
+        crawler = SaturatingCrawler()
+        crawler.use_frontier(os.path.join(work_dir, 'frontier.db'))
+        crawler.use_catalog_estimator(min_new_per_1000=300, window=10, report_every=20)
+        crawler.crawl_all_movies()
+        crawler.close_frontier()
+
+        assert crawler.catalog_exhausted
+        assert len(crawler.listing_requests) < len(full.listing_requests) * 0.7
+        assert len(crawler.crawled_urls) > 0.9 * len(full.crawled_urls)
+        print(f"✓ 列表请求从 {len(full.listing_requests)} 个减少到 {len(crawler.listing_requests)} 个，"
+              f"发现 {len(crawler.crawled_urls)}/{len(full.crawled_urls)} 部电影")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+class AsyncSaturatingCrawler(DoubanMovieCrawlerAsync):
+    """异步版本：同样的6个标签，只替换网络请求"""
+
+    def __init__(self):
+        super().__init__(concurrency=4, max_rate=0, parse_workers=0)
+        self.popular_tags = [f"标签{i}" for i in range(6)]
+        self.samples = _tag_samples(300, 6, 300, seed=3)
+        self.listing_requests = 0
+
+    async def _fetch(self, url, kind, timeout, use_cache=True):
+        self.listing_requests += 1
+        await asyncio.sleep(0)
+        query = dict(item.split('=') for item in url.split('?')[1].split('&'))
+        start = int(query['page_start'])
+        return FakeResponse(json.dumps({'subjects': [
+            {'url': f"https://movie.douban.com/subject/{1000 + subject_id}/", 'title': str(subject_id)}
+            for subject_id in self.samples[query['tag']][start:start + 20]
+        ]}))
+
+
+def test_async_listings_stop_below_threshold():
+    """异步快速模式同时爬取各标签，产出低于阈值后所有标签都停止翻页"""
+    print("测试异步快速模式停止翻页...")
+    work_dir = tempfile.mkdtemp()
+    try:
+        full = AsyncSaturatingCrawler()
+        crawler = AsyncSaturatingCrawler()
+        crawler.use_catalog_estimator(min_new_per_1000=3000, window=10, report_every=20)
+        try:
+            full_movies = asyncio.run(full.crawl_listings(max_pages=15))
+            movies = asyncio.run(crawler.crawl_listings(max_pages=15))
+            assert crawler.catalog_exhausted
+            requests = crawler.listing_requests
+            # 已经停止后再次爬取时不再发出列表请求
+            assert asyncio.run(crawler.crawl_listings(max_pages=15)) == []
+        finally:
+            full.close()
+            crawler.close()
+
+        assert crawler.listing_requests == requests
+        assert requests < full.listing_requests * 0.7
+        assert len(movies) > 0.9 * len(full_movies)
+        print(f"✓ 列表请求从 {full.listing_requests} 个减少到 {requests} 个")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def main():
+    """主测试函数"""
+    print("目录规模估计测试")
+    print("=" * 50)
+
+    test_known_population()
+    test_marginal_yield()
+    test_crawler_stops_below_threshold()
+    test_async_listings_stop_below_threshold()
+
+    print("\n✓ 所有测试通过")
+
+if __name__ == "__main__":
+    main()
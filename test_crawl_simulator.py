@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试爬取模拟器（离线预测爬取时间、请求数和电影数）
+"""
+
+import sys
+import os
+import random
+import shutil
+import tempfile
+
+# 添加当前目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from douban_crawl_simulator import CrawlSimulator, calibrate, estimate_population, print_simulation
+from douban_movie_crawler_unlimited import DoubanMovieCrawlerUnlimited
+from douban_run_metrics import append_run_metrics, collect_run_metrics, load_run_metrics
+
+
+def test_estimate_population():
+    """从随机抽样的列表条目数和新电影数反推电影总数"""
+    print("测试反推电影总数...")
+    generator = random.Random(1)
+    listed = 3000
+    new = len({generator.randrange(5000) for _ in range(listed)})
+    population = estimate_population(listed, new)
+    assert abs(population - 5000) < 250
+    # 没有重复时无法估计
+    assert estimate_population(100, 100) is None
+    assert estimate_population(100, 0) is None
+    print(f"✓ {listed} 个条目中 {new} 部不同电影，估计总数 {population}")
+
+
+def test_request_counts_and_fixed_rate():
+    """不限总数时每个列表条目都是新电影；固定速率下用时由详情页速率决定"""
+    print("测试请求数和固定速率...")
+    result = CrawlSimulator(adaptive=False, max_tags=2, max_pages=3).run()
+    assert result['listing'] == 10 + 2 * 3
+    assert result['detail'] == result['movies'] == 250 + 2 * 3 * 20
+    # 详情页固定每秒0.5个请求
+    assert abs(result['elapsed'] - result['detail'] / 0.5) < 0.1 * result['elapsed']
+    print_simulation(result)
+
+    # 不限标签数时与爬虫的热门标签数一致
+    tag_count = len(DoubanMovieCrawlerUnlimited().popular_tags)
+    result = CrawlSimulator(adaptive=False, max_pages=1).run()
+    assert result['listing'] == 10 + tag_count
+
+
+def test_settings_change_prediction():
+    """自适应限速和并发缩短用时；缓存命中减少请求；标签重叠降低每1000个请求的产出"""
+    print("测试不同配置的预测...")
+    settings = dict(population=2000, max_tags=10, max_pages=10)
+    fixed = CrawlSimulator(adaptive=False, **settings).run()
+    adaptive = CrawlSimulator(**settings).run()
+    concurrent = CrawlSimulator(concurrency=8, **settings).run()
+    cached = CrawlSimulator(cache_hit_rate=0.5, **settings).run()
+    unlimited = CrawlSimulator(max_tags=10, max_pages=10).run()
+
+    assert adaptive['elapsed'] < fixed['elapsed'] / 2
+    assert concurrent['elapsed'] < adaptive['elapsed']
+    assert cached['requests'] < 0.7 * adaptive['requests']
+    assert adaptive['movies'] < 2000 < unlimited['movies']
+    assert adaptive['new_per_1000_requests'] < unlimited['new_per_1000_requests']
+    print(f"✓ 固定速率 {fixed['elapsed']:.0f} 秒，自适应 {adaptive['elapsed']:.0f} 秒，"
+          f"8个并发 {concurrent['elapsed']:.0f} 秒")
+
+
+def test_throttling_and_retries():
+    """被限流的任务按退避重试，用时变长；超过最大次数的任务记为失败"""
+    print("测试限流和重试...")
+    settings = dict(population=2000, max_tags=5, max_pages=5)
+    clean = CrawlSimulator(**settings).run()
+    throttled = CrawlSimulator(throttle_rate=0.1, **settings).run()
+    failing = CrawlSimulator(error_rate=0.5, max_attempts=2, retry_delay=1.0, **settings).run()
+
+    assert throttled['throttled'] > 0 and throttled['elapsed'] > 1.5 * clean['elapsed']
+    assert throttled['requests'] > clean['requests']
+    # 失败率50%、最多尝试2次：约四分之一的任务最终失败
+    tasks = failing['movies'] + failing['failed_tasks']
+    assert 0.15 < failing['failed_tasks'] / tasks < 0.35
+    print(f"✓ 10%限流时用时从 {clean['elapsed']:.0f} 秒增加到 {throttled['elapsed']:.0f} 秒")
+
+
+def test_stop_conditions():
+    """空页、增量模式和目录产出阈值按爬虫的规则停止翻页，预测的请求数随之减少"""
+    print("测试停止翻页...")
+    settings = dict(population=2000, max_tags=10, max_pages=20)
+    full = CrawlSimulator(**settings).run()
+    short_tags = CrawlSimulator(tag_pages=5, **settings).run()
+    incremental = CrawlSimulator(novelty_threshold=0.5, novelty_patience=2, **settings).run()
+    # 每部新电影还要一个详情请求，每页新电影少于9部时产出低于900
+    catalog = CrawlSimulator(min_new_per_1000=900, catalog_window=20, **settings).run()
+
+    assert full['listing'] == 10 + 10 * 20 and full['stopped_tags']['max_pages'] == 10
+    # 5页有内容，第6页是空页
+    assert short_tags['listing'] == 10 + 10 * 6 and short_tags['stopped_tags']['empty'] == 10
+    assert incremental['stopped_tags']['low_novelty'] > 0 and incremental['listing'] < full['listing']
+    assert catalog['stopped_tags']['catalog'] > 0 and catalog['listing'] < full['listing']
+    assert catalog['new_per_1000_requests'] > full['new_per_1000_requests']
+    print(f"✓ 列表请求: 不停止 {full['listing']} 个，增量模式 {incremental['listing']} 个，"
+          f"目录产出阈值 {catalog['listing']} 个")
+
+
+def test_graph_discovery():
+    """推荐关系发现不需要列表请求，按最大深度限制层数"""
+    print("测试推荐关系发现...")
+    settings = dict(max_tags=2, max_pages=2, recommendations=3)
+    plain = CrawlSimulator(**settings).run()
+    depth_one = CrawlSimulator(graph_discovery=True, graph_max_depth=1, **settings).run()
+    depth_two = CrawlSimulator(graph_discovery=True, graph_max_depth=2, **settings).run()
+
+    assert depth_one['listing'] == plain['listing']
+    assert depth_one['graph_discovered'] == 3 * plain['movies']
+    assert depth_two['graph_discovered'] == 3 * plain['movies'] + 9 * plain['movies']
+    assert depth_two['movies'] == plain['movies'] + depth_two['graph_discovered']
+    try:
+        CrawlSimulator(graph_discovery=True)
+        assert False, "电影总数不限时应该要求最大深度"
+    except ValueError:
+        pass
+    print(f"✓ 深度1发现 {depth_one['graph_discovered']} 部，深度2发现 {depth_two['graph_discovered']} 部")
+
+
+def test_run_metrics_calibration():
+    """运行记录写入后可以读回，并用来估计模拟参数"""
+    print("测试运行记录...")
+    work_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(work_dir, 'crawl_runs.jsonl')
+        metrics = collect_run_metrics(DoubanMovieCrawlerUnlimited(), 12.0)
+        assert metrics['elapsed'] == 12.0 and set(metrics['rate']) == {'listing', 'detail'}
+
+        run = {'requests': 1000, 'errors': 30, 'cache_hits': 250, 'avg_time': 1.2,
+               'rate': {'listing': {'throttled': 5}, 'detail': {'throttled': 15}},
+               'listing_pages': 150, 'listing_new': 2000}
+        append_run_metrics(metrics, path)
+        append_run_metrics(run, path)
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write('{"requests": 5')
+        runs = load_run_metrics(path)
+        assert runs[-1] == run and len(runs) == 2
+        assert load_run_metrics(os.path.join(work_dir, 'missing.jsonl')) == []
+
+        params = calibrate([run])
+        assert params['latency'] == 1.2
+        assert params['throttle_rate'] == 0.02 and params['error_rate'] == 0.01
+        assert params['cache_hit_rate'] == 0.2
+        assert params['population'] == estimate_population(3000, 2000)
+        assert calibrate([dict(run, catalog_estimate=4321.4)])['population'] == 4321
+
+        simulator = CrawlSimulator.from_runs([run], max_tags=3, max_pages=2)
+        assert simulator.population == params['population'] and simulator.latency == 1.2
+        assert simulator.run()['cache_hits'] > 0
+        print(f"✓ 参数: {params}")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def main():
+    """主测试函数"""
+    print("爬取模拟器测试")
+    print("=" * 50)
+
+    test_estimate_population()
+    test_request_counts_and_fixed_rate()
+    test_settings_change_prediction()
+    test_throttling_and_retries()
+    test_stop_conditions()
+    test_graph_discovery()
+    test_run_metrics_calibration()
+
+    print("\n✓ 所有测试通过")
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,7 @@
 用于验证爬虫程序的基本功能
 """
 
-import requests
+from douban_transport import get_transport
 from bs4 import BeautifulSoup
 import json
 
@@ -20,7 +20,7 @@ def test_douban_connection():
     }
     
     try:
-        response = requests.get('https://movie.douban.com/top250', headers=headers, timeout=10)
+        response = get_transport().get('https://movie.douban.com/top250', headers=headers, timeout=10)
         response.raise_for_status()
         print("✓ 豆瓣网站连接成功")
         return True
@@ -39,7 +39,7 @@ def test_parse_movie_list():
     }
     
     try:
-        response = requests.get('https://movie.douban.com/top250', headers=headers, timeout=10)
+        response = get_transport().get('https://movie.douban.com/top250', headers=headers, timeout=10)
         response.raise_for_status()
         
         soup = BeautifulSoup(response.text, 'html.parser')
@@ -80,7 +80,7 @@ def test_single_movie():
     test_url = 'https://movie.douban.com/subject/1292052/'
     
     try:
-        response = requests.get(test_url, headers=headers, timeout=15)
+        response = get_transport().get(test_url, headers=headers, timeout=15)
         response.raise_for_status()
         
         soup = BeautifulSoup(response.text, 'html.parser')
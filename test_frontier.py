@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试持久化任务队列
+"""
+
+import sys
+import os
+import shutil
+import tempfile
+
+# 添加当前目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from douban_frontier import CrawlFrontier
+from offline_crawler import OfflineCrawler
+
+
+class FrontierCrawler(OfflineCrawler):
+    """每个标签2页，每页3部电影，没有Top250；可以在第N个请求之后中断"""
+
+    def __init__(self, interrupt_after=None):
+        super().__init__()
+        self.popular_tags = ['热门', '经典']
+        self.interrupt_after = interrupt_after
+
+    def _request(self, url, kind, timeout, use_cache=True):
+        response = super()._request(url, kind, timeout, use_cache)
+        if self.interrupt_after is not None and len(self.requests) > self.interrupt_after:
+            raise KeyboardInterrupt
+        return response
+
+    def tag_page(self, tag, start, sort):
+        if start >= 40:
+            return []
+        base = 1000 + start + (0 if tag == '热门' else 100)
+        return [{'url': f"https://movie.douban.com/subject/{base + i}/", 'title': f"电影{base + i}", 'rate': str(7 + i)}
+                for i in range(3)]
+
+
+def test_priority_and_retry():
+    """按优先级取任务，失败的任务推迟重试，超过次数后标记失败"""
+    print("测试优先级和重试...")
+    work_dir = tempfile.mkdtemp()
+    try:
+        frontier = CrawlFrontier(os.path.join(work_dir, 'frontier.db'), max_attempts=2, retry_delay=10)
+        assert frontier.push('tag', 'tag:热门:0', priority=10)
+        assert frontier.push('detail', 'detail:1', url='https://movie.douban.com/subject/1/', priority=100)
+        assert not frontier.push('tag', 'tag:热门:0', priority=20)
+
+        task = frontier.pop(now=0)
+        assert task['task_key'] == 'detail:1'
+        frontier.fail(task['task_id'], '超时', now=0)
+        assert frontier.pop(now=0)['task_key'] == 'tag:热门:0'
+        assert frontier.pop(now=0) is None
+        assert frontier.next_wait(now=0) is not None
+
+        retry = frontier.pop(now=11)
+        assert retry['task_key'] == 'detail:1' and retry['attempts'] == 1
+        frontier.fail(retry['task_id'], '超时', now=11)
+        assert frontier.counts().get('failed') == 1
+        frontier.close()
+        print("✓ 优先级、退避重试和失败标记正确")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def test_resume_after_interrupt():
+    """中断后重新运行，从中断的地方继续，不重复请求已完成的任务"""
+    print("测试中断恢复...")
+    work_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(work_dir, 'frontier.db')
+
+        # 不中断时的完整请求列表
+        full = FrontierCrawler()
+        full.use_frontier(os.path.join(work_dir, 'full.db'))
+        full_movies = full.crawl_all_movies()
+        full.close_frontier()
+        assert len(full_movies) == 12
+
+        first = FrontierCrawler(interrupt_after=12)
+        first.use_frontier(path)
+        try:
+            first.crawl_all_movies()
+            assert False, "应该被中断"
+        except KeyboardInterrupt:
+            pass
+        first.close_frontier()
+
+        second = FrontierCrawler()
+        second.crawled_urls = first.crawled_urls
+        second.use_frontier(path)
+        second.crawl_all_movies()
+        second.close_frontier()
+
+        # 中断时正在执行的任务会重新执行一次，其余请求不重复
+        completed_first = first.requests[:-1]
+        assert sorted(completed_first + second.requests) == sorted(full.requests)
+        assert len(first.crawled_urls) == 12
+        print(f"✓ 第一次执行 {len(completed_first)} 个请求，恢复后执行 {len(second.requests)} 个，没有重复")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def main():
+    """主测试函数"""
+    print("任务队列测试")
+    print("=" * 50)
+
+    test_priority_and_retry()
+    test_resume_after_interrupt()
+
+    print("\n✓ 所有测试通过")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试推荐关系发现（从详情页"喜欢这部电影的人也喜欢"中发现新电影）
+"""
+
+import sys
+import os
+import json
+import shutil
+import tempfile
+
+# 添加当前目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from douban_parsers import extract_recommendations
+from douban_subject_id import extract_subject_id
+from offline_crawler import OfflineCrawler, detail_html
+
+# 每部电影推荐3部：条目i推荐 3i+1、3i+2、3i+3，共40部电影，最深3层
+SUBJECT_COUNT = 40
+
+
+def _url(subject_id):
+    return f"https://movie.douban.com/subject/{1000 + subject_id}/"
+
+
+class GraphCrawler(OfflineCrawler):
+    """只有一个标签，它的列表页只有第0部电影"""
+
+    def __init__(self):
+        super().__init__(parser='lxml')
+        self.popular_tags = ['热门']
+
+    def tag_page(self, tag, start, sort):
+        return [{'url': _url(0), 'title': '电影0'}] if start == 0 else []
+
+    def detail_page(self, subject_id):
+        subject_id -= 1000
+        related = [(1000 + i, f"电影{i}", f"8.{i % 10}")
+                   for i in range(3 * subject_id + 1, 3 * subject_id + 4) if i < SUBJECT_COUNT]
+        return detail_html(f"电影{subject_id}", recommendations=related)
+
+    @property
+    def detail_order(self):
+        return [extract_subject_id(url) - 1000 for url in self.detail_requests]
+
+
+def _depth(subject_id):
+    depth = 0
+    while subject_id:
+        subject_id = (subject_id - 1) // 3
+        depth += 1
+    return depth
+
+
+def test_extract_recommendations():
+    """从样例详情页提取10部推荐电影，链接规范为条目链接"""
+    print("测试提取推荐电影...")
+    page = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'douban_detail_debug.html')
+    with open(page, 'r', encoding='utf-8') as f:
+        links = extract_recommendations(f.read())
+    assert len(links) == 10
+    assert links[0] == {'url': "https://movie.douban.com/subject/1292720/", 'title': '阿甘正传', 'rate': '9.5'}
+    assert extract_recommendations('<html></html>') == []
+    print(f"✓ 提取到 {len(links)} 部推荐电影")
+
+
+# 推荐条目中嵌套了 <div> 和 <dl>，区块之后还有其他电影链接
+NESTED_RECOMMENDATIONS = '''
+<div id="recommendations">
+  <div class="recommendations-bd">
+    <div class="item-wrapper">
+      <dl>
+        <dt><a href="https://movie.douban.com/subject/1292720/?from=subject-page"><img alt="阿甘正传"/></a></dt>
+        <dd><div class="title"><a href="https://movie.douban.com/subject/1292720/?from=subject-page">阿甘正传</a></div>
+            <span class="subject-rate">9.5</span></dd>
+      </dl>
+    </div>
+    <dl>
+      <dt><a href="https://movie.douban.com/subject/1292064/?from=subject-page"><img alt="楚门的世界"/></a></dt>
+      <dd><dl class="inner"><dd><a href="https://movie.douban.com/subject/1292064/">楚门&amp;世界</a></dd></dl>
+          <span class="subject-rate">9.4</span></dd>
+    </dl>
+    <dl>
+      <dt><a href="https://movie.douban.com/subject/1849031/?from=subject-page"><img alt="当幸福来敲门"/></a></dt>
+      <dd><a href="https://movie.douban.com/subject/1849031/?from=subject-page">当幸福来敲门</a></dd>
+    </dl>
+  </div>
+</div>
+<div class="aside"><a href="https://movie.douban.com/subject/1291546/">霸王别姬</a></div>
+'''
+
+
+def test_extract_nested_recommendations():
+    """推荐条目中有嵌套的 <div>/<dl> 时仍能取到整个区块，区块之外的链接不算推荐"""
+    print("测试嵌套的推荐区块...")
+    links = extract_recommendations(f"<html><body>{NESTED_RECOMMENDATIONS}</body></html>")
+    assert links == [
+        {'url': "https://movie.douban.com/subject/1292720/", 'title': '阿甘正传', 'rate': '9.5'},
+        {'url': "https://movie.douban.com/subject/1292064/", 'title': '楚门&世界', 'rate': '9.4'},
+        {'url': "https://movie.douban.com/subject/1849031/", 'title': '当幸福来敲门', 'rate': ''},
+    ], links
+    print(f"✓ 嵌套结构中提取到 {len(links)} 部推荐电影")
+
+
+def test_graph_discovery():
+    """一个列表请求出发，沿推荐关系按层爬完全部电影；推荐链接不写入结果"""
+    print("测试推荐关系发现...")
+    work_dir = tempfile.mkdtemp()
+    try:
+        crawler = GraphCrawler()
+        crawler.use_result_sink(os.path.join(work_dir, 'movies.jsonl'))
+        crawler.use_frontier(os.path.join(work_dir, 'frontier.db'))
+        crawler.use_graph_discovery()
+        crawler.crawl_all_movies()
+        crawler.close_frontier()
+        crawler.close_result_sink()
+
+        assert sorted(crawler.detail_order) == list(range(SUBJECT_COUNT))
+        assert crawler.graph_discovered == SUBJECT_COUNT - 1
+        # 先广度后深度
+        depths = [_depth(subject_id) for subject_id in crawler.detail_order]
+        assert depths == sorted(depths)
+
+        output = os.path.join(work_dir, 'movies.json')
+        assert crawler.result_sink.export_json(output) == SUBJECT_COUNT
+        with open(output, 'r', encoding='utf-8') as f:
+            assert not any('recommendations' in movie for movie in json.load(f))
+        print(f"✓ {len(crawler.listing_requests)} 个标签列表请求发现了 {SUBJECT_COUNT} 部电影")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def test_max_depth():
+    """限制深度时只沿推荐关系走指定的层数"""
+    print("测试最大深度...")
+    work_dir = tempfile.mkdtemp()
+    try:
+        crawler = GraphCrawler()
+        crawler.use_frontier(os.path.join(work_dir, 'frontier.db'))
+        crawler.use_graph_discovery(max_depth=2)
+        crawler.crawl_all_movies()
+        crawler.close_frontier()
+        # 第0层1部，第1层3部，第2层9部
+        assert sorted(crawler.detail_order) == list(range(13))
+        print("✓ 深度2时爬取了13部电影")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def main():
+    """主测试函数"""
+    print("推荐关系发现测试")
+    print("=" * 50)
+
+    test_extract_recommendations()
+    test_extract_nested_recommendations()
+    test_graph_discovery()
+    test_max_depth()
+
+    print("\n✓ 所有测试通过")
+
+if __name__ == "__main__":
+    main()
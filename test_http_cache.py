@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试磁盘HTTP缓存和条件请求
+"""
+
+import sys
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# 添加当前目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import requests
+
+from douban_http_cache import HttpCache
+from douban_transport import DoubanTransport
+
+
+class EtagHandler(BaseHTTPRequestHandler):
+    """带ETag的模拟详情页，记录完整响应和304响应的次数"""
+
+    body = '<html><h1>肖申克的救赎</h1></html>'.encode('utf-8')
+    etag = '"v1"'
+    full_responses = 0
+    not_modified = 0
+
+    def do_GET(self):
+        if self.headers.get('If-None-Match') == self.etag:
+            EtagHandler.not_modified += 1
+            self.send_response(304)
+            self.send_header('ETag', self.etag)
+            self.end_headers()
+            return
+
+        EtagHandler.full_responses += 1
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('ETag', self.etag)
+        self.send_header('Content-Length', str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def test_conditional_revalidation():
+    """过期后发起条件请求，304时复用缓存内容"""
+    print("测试条件请求...")
+    server = ThreadingHTTPServer(('127.0.0.1', 0), EtagHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/subject/1292052/"
+    cache_dir = tempfile.mkdtemp()
+
+    transport = DoubanTransport()
+    # 有效期为0，每次都需要重新验证
+    transport.enable_cache(cache_dir, ttl_policies=[('subject', re.compile(r'/subject/'), 0)])
+    try:
+        first = transport.get(url, timeout=5)
+        assert first.status_code == 200
+        assert transport.get_cached(url) is None
+
+        second = transport.get(url, timeout=5)
+        assert second.status_code == 200
+        assert second.text == first.text
+        assert getattr(second, 'from_cache', False)
+        assert EtagHandler.full_responses == 1
+        assert EtagHandler.not_modified == 1
+        print("✓ 304响应复用了缓存内容")
+    finally:
+        server.shutdown()
+        transport.close()
+        shutil.rmtree(cache_dir)
+
+
+def test_fresh_cache_hit():
+    """有效期内直接命中缓存"""
+    print("测试缓存命中...")
+    server = ThreadingHTTPServer(('127.0.0.1', 0), EtagHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/subject/1291546/"
+    cache_dir = tempfile.mkdtemp()
+
+    transport = DoubanTransport()
+    transport.enable_cache(cache_dir)
+    try:
+        full_before = EtagHandler.full_responses
+        transport.get(url, timeout=5)
+        cached = transport.get_cached(url)
+        assert cached is not None
+        assert cached.text == '<html><h1>肖申克的救赎</h1></html>'
+        assert EtagHandler.full_responses == full_before + 1
+        assert transport.get_stats()['cache_hits'] == 1
+        print("✓ 详情页在有效期内直接命中缓存")
+    finally:
+        server.shutdown()
+        transport.close()
+        shutil.rmtree(cache_dir)
+
+
+def make_response(body, content_type='text/html; charset=utf-8'):
+    """构造一个200响应"""
+    response = requests.Response()
+    response.status_code = 200
+    response._content = body
+    response.headers['Content-Type'] = content_type
+    response.encoding = 'utf-8'
+    return response
+
+
+def test_concurrent_store():
+    """多个线程同时保存同一个URL，不留下临时文件，条目完整可读"""
+    print("测试并发写入...")
+    cache_dir = tempfile.mkdtemp()
+    cache = HttpCache(cache_dir)
+    url = 'https://movie.douban.com/subject/1292052/'
+    errors = []
+
+    def store(i):
+        try:
+            for _ in range(20):
+                cache.store(url, make_response(f'<html>{i}</html>'.encode('utf-8')))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=store, args=(i,)) for i in range(8)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert errors == [], errors
+        leftovers = [name for _, _, names in os.walk(cache_dir) for name in names if name.endswith('.tmp')]
+        assert leftovers == []
+        meta = cache.lookup(url)
+        assert meta is not None
+        assert re.fullmatch(r'<html>\d</html>', cache.build_response(url, meta).text)
+        print("✓ 8个线程同时写入后条目完整，没有残留临时文件")
+    finally:
+        shutil.rmtree(cache_dir)
+
+
+def test_empty_listing_not_cached():
+    """没有电影的标签列表页不缓存"""
+    print("测试空列表页...")
+    cache_dir = tempfile.mkdtemp()
+    cache = HttpCache(cache_dir)
+    url = 'https://movie.douban.com/j/search_subjects?type=movie&tag=%E5%89%A7%E6%83%85&page_limit=20&page_start='
+    try:
+        cache.store(url + '9980', make_response(b'{"subjects": []}', 'application/json'))
+        cache.store(url + '0', make_response('{"subjects": [{"title": "肖申克的救赎"}]}'.encode('utf-8'),
+                                             'application/json'))
+        assert cache.lookup(url + '9980') is None
+        assert cache.lookup(url + '0') is not None
+        print("✓ 空列表页未缓存，有电影的列表页正常缓存")
+    finally:
+        shutil.rmtree(cache_dir)
+
+
+def test_prune_over_max_bytes():
+    """超过大小上限时先删除过期的条目，再删除最早保存的条目"""
+    print("测试缓存大小上限...")
+    cache_dir = tempfile.mkdtemp()
+    body = os.urandom(2000)
+    cache = HttpCache(cache_dir, ttl_policies=[('subject', re.compile(r'/subject/'), 3600)], max_bytes=None)
+    urls = [f'https://movie.douban.com/subject/{i}/' for i in range(5)]
+    try:
+        for url in urls:
+            cache.store(url, make_response(body))
+        # 第4个条目已过期，其余按保存时间从早到晚
+        for i, url in enumerate(urls):
+            _, meta_path, _ = cache._paths(url)
+            meta = cache.lookup(url)
+            meta['stored_at'] = time.time() - (7200 if i == 3 else 100 - i)
+            cache._write_meta(meta_path, meta)
+
+        entry_size = cache.prune() // len(urls)
+        # 上限为4个条目：删除到3.6个以内，即删除过期的第4个和最早的第1个
+        cache.max_bytes = entry_size * 4
+        cache.prune()
+
+        kept = [i for i, url in enumerate(urls) if cache.lookup(url) is not None]
+        assert kept == [1, 2, 4], kept
+        assert cache.size <= cache.max_bytes * 0.9
+        print(f"✓ 超过上限后删除了过期的和最早的条目，剩余 {cache.size} 字节")
+    finally:
+        shutil.rmtree(cache_dir)
+
+
+def test_store_failure_does_not_fail_request():
+    """写入缓存失败时请求仍然成功"""
+    print("测试写入缓存失败...")
+    server = ThreadingHTTPServer(('127.0.0.1', 0), EtagHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/subject/1295644/"
+    cache_dir = tempfile.mkdtemp()
+
+    transport = DoubanTransport()
+    cache = transport.enable_cache(cache_dir)
+
+    def disk_full(url, response):
+        raise OSError(28, 'No space left on device')
+
+    cache.store = disk_full
+    try:
+        response = transport.get(url, timeout=5)
+        assert response.status_code == 200
+        assert response.text == '<html><h1>肖申克的救赎</h1></html>'
+        assert transport.get_cached(url) is None
+        print("✓ 写入缓存失败只打印日志，请求正常返回")
+    finally:
+        server.shutdown()
+        transport.close()
+        shutil.rmtree(cache_dir)
+
+
+def main():
+    """主测试函数"""
+    print("HTTP缓存测试")
+    print("=" * 50)
+
+    test_conditional_revalidation()
+    test_fresh_cache_hit()
+    test_concurrent_store()
+    test_empty_listing_not_cached()
+    test_prune_over_max_bytes()
+    test_store_failure_does_not_fail_request()
+
+    print("\n✓ 所有测试通过")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试增量模式提前停止翻页
+"""
+
+import sys
+import os
+import shutil
+import tempfile
+
+# 添加当前目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from douban_tag_cursor import TagCursorStore
+from offline_crawler import OfflineCrawler
+
+
+class IncrementalCrawler(OfflineCrawler):
+    """标签共20页，每页10部电影，只有前2页有新电影"""
+
+    def __init__(self, work_dir):
+        super().__init__()
+        self.popular_tags = ['热门']
+        self.tag_cursors = TagCursorStore(os.path.join(work_dir, 'tag_cursors.json'))
+        # 第3页以后的电影都已经爬取过
+        self.crawled_urls.update(1000 + start + i for start in range(40, 400, 20) for i in range(10))
+
+    def tag_page(self, tag, start, sort):
+        if start >= 400:
+            return []
+        return [{'url': f"https://movie.douban.com/subject/{1000 + start + i}/", 'title': f"电影{start + i}"}
+                for i in range(10)]
+
+
+def test_crawl_from_tag_stops_early():
+    """连续多页没有新电影时停止翻页，并统计节省的请求"""
+    print("测试按标签爬取时提前停止...")
+    work_dir = tempfile.mkdtemp()
+    try:
+        full = IncrementalCrawler(work_dir)
+        full.crawl_from_tag('热门', max_pages=30)
+        assert len(full.listing_requests) == 21
+
+        crawler = IncrementalCrawler(work_dir)
+        crawler.use_incremental(novelty_threshold=0.1, patience=3)
+        movies = crawler.crawl_from_tag('热门', max_pages=30)
+        assert len(movies) == 20
+        assert len(crawler.listing_requests) == 5
+        assert crawler.listing_requests_saved == 25
+        print(f"✓ 列表请求从 {len(full.listing_requests)} 个减少到 {len(crawler.listing_requests)} 个")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def test_frontier_stops_early():
+    """任务队列模式下同样提前停止"""
+    print("测试任务队列模式提前停止...")
+    work_dir = tempfile.mkdtemp()
+    try:
+        crawler = IncrementalCrawler(work_dir)
+        crawler.use_incremental(novelty_threshold=0.1, patience=3)
+        crawler.use_frontier(os.path.join(work_dir, 'frontier.db'))
+        movies = crawler.crawl_all_movies()
+        crawler.close_frontier()
+        assert len(movies) == 20
+        assert len(crawler.listing_requests) == 5
+        print(f"✓ 任务队列模式只请求了 {len(crawler.listing_requests)} 个列表页")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def main():
+    """主测试函数"""
+    print("增量模式测试")
+    print("=" * 50)
+
+    test_crawl_from_tag_stops_early()
+    test_frontier_stops_early()
+
+    print("\n✓ 所有测试通过")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试快速模式（只保存列表页信息）和按需抓取详情
+"""
+
+import sys
+import os
+import json
+import shutil
+import tempfile
+
+# 添加当前目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from douban_result_sink import JsonlResultSink
+from douban_sqlite_store import SqliteMovieStore
+from offline_crawler import OfflineCrawler, detail_html
+
+
+class ListingCrawler(OfflineCrawler):
+    """每个标签2页，每页20部电影，两个标签有一半重叠"""
+
+    def __init__(self):
+        super().__init__()
+        self.popular_tags = ['热门', '经典']
+
+    def tag_page(self, tag, start, sort):
+        if start >= 40:
+            return []
+        offset = 0 if tag == '热门' else 20
+        return [{'url': f"https://movie.douban.com/subject/{1000 + offset + start + i}/",
+                 'title': f"电影{offset + start + i}", 'rate': '8.5', 'cover': 'https://img.example/p.jpg'}
+                for i in range(20)]
+
+    def detail_page(self, subject_id):
+        return detail_html('详情标题', rating='8.6', genres=['剧情'], summary='简介')
+
+
+def test_listing_records_and_lazy_details():
+    """快速模式每个请求写入约20部电影，详情只按需抓取，导出时详情记录优先"""
+    print("测试快速模式...")
+    work_dir = tempfile.mkdtemp()
+    try:
+        crawler = ListingCrawler()
+        crawler.result_sink = JsonlResultSink(os.path.join(work_dir, 'movies.jsonl'))
+        crawler.use_frontier(os.path.join(work_dir, 'frontier.db'))
+
+        movies = crawler.crawl_listings()
+        assert len(movies) == 60
+        assert crawler.detail_requests == []
+        print(f"✓ {len(crawler.listing_requests)} 个列表请求写入 {len(movies)} 部电影")
+
+        # 只有缺少简介的前3部需要详情
+        movies[3]['summary'] = '已有简介'
+        assert crawler.request_details(movies[:4], fields=['summary']) == 3
+        crawler.crawl_frontier()
+        assert len(crawler.detail_requests) == 3
+
+        crawler.close_result_sink()
+        crawler.close_frontier()
+        output = os.path.join(work_dir, 'movies.json')
+        assert crawler.result_sink.export_json(output) == 60
+        with open(output, 'r', encoding='utf-8') as f:
+            exported = {movie['douban_url']: movie for movie in json.load(f)}
+        assert exported[movies[0]['douban_url']]['title'] == '详情标题'
+        assert exported[movies[10]['douban_url']]['record_level'] == 'listing'
+        print("✓ 按需抓取了3个详情页，导出时详情记录替换了列表记录")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def test_sqlite_keeps_detail_records():
+    """SQLite中列表记录不会覆盖已有的详情记录"""
+    print("测试SQLite记录优先级...")
+    work_dir = tempfile.mkdtemp()
+    try:
+        crawler = ListingCrawler()
+        url = "https://movie.douban.com/subject/1000/"
+        listing = crawler.build_listing_info({'url': url, 'title': '电影0', 'rate': '8.5'})
+        detail = crawler.get_movie_detail(url)
+
+        with SqliteMovieStore(os.path.join(work_dir, 'movies.db')) as store:
+            store.write(listing)
+            store.write(detail)
+            store.write(listing)
+            assert store.get(1000)['title'] == '详情标题'
+            assert len(store.query(genre='剧情')) == 1
+        print("✓ 详情记录不会被之后的列表记录覆盖")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def main():
+    """主测试函数"""
+    print("快速模式测试")
+    print("=" * 50)
+
+    test_listing_records_and_lazy_details()
+    test_sqlite_keeps_detail_records()
+
+    print("\n✓ 所有测试通过")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试列表页预取（抓取详情页期间提前请求之后的列表页）
+"""
+
+import sys
+import os
+import asyncio
+import shutil
+import tempfile
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+# 添加当前目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from douban_movie_crawler_async import DoubanMovieCrawlerAsync
+from douban_subject_id import extract_subject_id
+from douban_tag_cursor import TagCursorStore
+from offline_crawler import OfflineCrawler
+
+PAGE_COUNT = 4
+LISTING_DELAY = 0.05
+DETAIL_DELAY = 0.02
+
+
+def _tag_data(start):
+    if start >= PAGE_COUNT * 20:
+        return {'subjects': []}
+    return {'subjects': [{'url': f"https://movie.douban.com/subject/{1000 + start + i}/", 'title': f"电影{start + i}"}
+                         for i in range(5)]}
+
+
+class PrefetchCrawler(OfflineCrawler):
+    """列表请求50毫秒，每个详情请求20毫秒；记录事件顺序"""
+
+    def __init__(self, work_dir):
+        super().__init__()
+        self.tag_cursors = TagCursorStore(os.path.join(work_dir, 'tag_cursors.json'))
+        self.events = []
+        self._events_lock = threading.Lock()
+
+    def _request(self, url, kind, timeout, use_cache=True):
+        time.sleep(LISTING_DELAY if kind == 'listing' else DETAIL_DELAY)
+        response = super()._request(url, kind, timeout, use_cache)
+        with self._events_lock:
+            if kind == 'listing':
+                self.events.append(('listed', int(parse_qs(urlparse(url).query)['page_start'][0]) // 20))
+            else:
+                self.events.append(('detail', (extract_subject_id(url) - 1000) // 20))
+        return response
+
+    def tag_page(self, tag, start, sort):
+        return _tag_data(start)['subjects']
+
+
+class AsyncPrefetchCrawler(DoubanMovieCrawlerAsync):
+    """异步版本：同样的列表和详情耗时"""
+
+    def __init__(self, work_dir, listing_window):
+        super().__init__(concurrency=2, max_rate=0, parse_workers=0, listing_window=listing_window)
+        self.tag_cursors = TagCursorStore(os.path.join(work_dir, 'tag_cursors.json'))
+        self.events = []
+
+    async def get_movie_list_from_tag(self, tag, start=0, sort='recommend'):
+        await asyncio.sleep(LISTING_DELAY)
+        self.events.append(('listed', start // 20))
+        return _tag_data(start)
+
+    async def _fetch_detail_page(self, movie_url, use_cache=True):
+        await asyncio.sleep(DETAIL_DELAY)
+        self.events.append(('detail', (int(movie_url.rstrip('/').split('/')[-1]) - 1000) // 20))
+        return b'', 'utf-8'
+
+    async def _parse_detail_page(self, movie_url, content, encoding):
+        return {'title': movie_url, 'douban_url': movie_url}
+
+
+def _listing_ready_before_details(events):
+    """每一页的列表请求都在上一页的详情抓取结束之前完成"""
+    for page in range(1, PAGE_COUNT):
+        listed = events.index(('listed', page))
+        last_detail = max(i for i, event in enumerate(events) if event == ('detail', page - 1))
+        if listed > last_detail:
+            return False
+    return True
+
+
+def test_sync_prefetch():
+    """启用预取后详情页不再等待列表请求，翻页进度仍按完成的页记录"""
+    print("测试预取...")
+    work_dir = tempfile.mkdtemp()
+    try:
+        serial = PrefetchCrawler(work_dir)
+        started = time.time()
+        serial.crawl_from_tag('热门', max_pages=10)
+        serial_time = time.time() - started
+        assert not _listing_ready_before_details(serial.events)
+
+        crawler = PrefetchCrawler(work_dir)
+        crawler.use_listing_prefetch(window=2)
+        started = time.time()
+        movies = crawler.crawl_from_tag('热门', max_pages=10)
+        prefetch_time = time.time() - started
+
+        assert len(movies) == PAGE_COUNT * 5
+        assert _listing_ready_before_details(crawler.events)
+        assert crawler.tag_cursors.get('热门')['exhausted']
+        print(f"✓ 用时从 {serial_time:.2f} 秒减少到 {prefetch_time:.2f} 秒")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def test_prefetch_window_limit():
+    """列表页最多领先window页，提前停止时不再发出新的列表请求"""
+    print("测试预取窗口...")
+    work_dir = tempfile.mkdtemp()
+    try:
+        crawler = PrefetchCrawler(work_dir)
+        crawler.use_listing_prefetch(window=1)
+        crawler.crawl_from_tag('热门', max_pages=10)
+
+        # 每一页的详情开始抓取时，之后最多只有1页已经完成列表请求
+        for page in range(PAGE_COUNT):
+            first_detail = crawler.events.index(('detail', page))
+            listed = [event[1] for event in crawler.events[:first_detail] if event[0] == 'listed']
+            assert max(listed) <= page + 1
+        # 空页（第5页）之后最多再预取1页
+        assert len([event for event in crawler.events if event[0] == 'listed']) <= PAGE_COUNT + 2
+        print("✓ 列表页最多领先1页")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def test_async_prefetch():
+    """异步版本同样提前请求列表页"""
+    print("测试异步预取...")
+    work_dir = tempfile.mkdtemp()
+    try:
+        serial = AsyncPrefetchCrawler(work_dir, listing_window=0)
+        crawler = AsyncPrefetchCrawler(work_dir, listing_window=2)
+        try:
+            asyncio.run(serial.crawl_from_tag('热门', max_pages=10))
+            movies = asyncio.run(crawler.crawl_from_tag('热门', max_pages=10))
+        finally:
+            serial.close()
+            crawler.close()
+
+        assert not _listing_ready_before_details(serial.events)
+        assert _listing_ready_before_details(crawler.events)
+        assert len(movies) == PAGE_COUNT * 5
+        print("✓ 异步版本的详情页不再等待列表请求")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def main():
+    """主测试函数"""
+    print("列表页预取测试")
+    print("=" * 50)
+
+    test_sync_prefetch()
+    test_prefetch_window_limit()
+    test_async_prefetch()
+
+    print("\n✓ 所有测试通过")
+
+if __name__ == "__main__":
+    main()
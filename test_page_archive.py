@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试详情页归档的写入、崩溃恢复和离线重新解析
+"""
+
+import sys
+import os
+import gzip
+import shutil
+import tempfile
+
+# 添加当前目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from douban_page_archive import PageArchive, iter_segment, list_segments, reextract_archive
+
+
+def detail_html(title):
+    return f'<html><h1><span>{title}</span></h1></html>'.encode('utf-8')
+
+
+def write_torn_record(path, url, content):
+    """模拟写到一半时进程被杀：只写入一条记录的前半段"""
+    header = (
+        f"DOUBAN-ARCHIVE/1.0\r\nSubject-ID: 2\r\nURL: {url}\r\n"
+        f"Fetched-At: 2024-01-01 00:00:00\r\nEncoding: utf-8\r\n"
+        f"Content-Length: {len(content)}\r\n\r\n"
+    ).encode('utf-8')
+    record = gzip.compress(header + content + b"\r\n\r\n")
+    with open(path, 'ab') as f:
+        f.write(record[:len(record) // 2])
+
+
+def test_write_and_iter_roundtrip():
+    """写入的记录原样读回"""
+    print("测试归档读写...")
+    archive_dir = tempfile.mkdtemp()
+    try:
+        archive = PageArchive(archive_dir)
+        content = detail_html('肖申克的救赎')
+        archive.write('https://movie.douban.com/subject/1292052/', content,
+                      fetched_at='2024-01-01 00:00:00')
+        archive.write('https://movie.douban.com/subject/1291546/', b'', encoding=None)
+
+        segments = list_segments(archive_dir)
+        assert len(segments) == 1
+        records = list(iter_segment(segments[0]))
+        assert [r['subject_id'] for r in records] == [1292052, 1291546]
+        assert records[0]['content'] == content
+        assert records[0]['fetched_at'] == '2024-01-01 00:00:00'
+        assert records[1]['content'] == b''
+        assert records[1]['encoding'] == 'utf-8'
+        print("✓ 读写一致")
+    finally:
+        shutil.rmtree(archive_dir)
+
+
+def test_torn_tail_ignored():
+    """末尾写了一半的记录被忽略，之前的记录照常返回"""
+    print("测试不完整的末尾记录...")
+    archive_dir = tempfile.mkdtemp()
+    try:
+        archive = PageArchive(archive_dir)
+        archive.write('https://movie.douban.com/subject/1/', detail_html('A'))
+        path = list_segments(archive_dir)[0]
+        write_torn_record(path, 'https://movie.douban.com/subject/2/', detail_html('B') * 50)
+
+        records = list(iter_segment(path))
+        assert [r['subject_id'] for r in records] == [1]
+        print("✓ 不完整记录已忽略")
+    finally:
+        shutil.rmtree(archive_dir)
+
+
+def test_resume_after_torn_tail():
+    """崩溃后重新打开归档继续写，之前的记录和新记录都能读出"""
+    print("测试崩溃后继续写入...")
+    archive_dir = tempfile.mkdtemp()
+    try:
+        archive = PageArchive(archive_dir)
+        archive.write('https://movie.douban.com/subject/1/', detail_html('A'),
+                      fetched_at='2024-01-01 00:00:00')
+        write_torn_record(list_segments(archive_dir)[0],
+                          'https://movie.douban.com/subject/2/', detail_html('B') * 50)
+
+        archive = PageArchive(archive_dir)
+        archive.write('https://movie.douban.com/subject/3/', detail_html('C'),
+                      fetched_at='2024-01-02 00:00:00')
+
+        segments = list_segments(archive_dir)
+        assert len(segments) == 2
+        subject_ids = [r['subject_id'] for path in segments for r in iter_segment(path)]
+        assert subject_ids == [1, 3]
+
+        movies = reextract_archive(archive_dir, workers=1)
+        assert sorted(movie['title'] for movie in movies) == ['A', 'C']
+        print("✓ 崩溃前后的记录均可读取")
+    finally:
+        shutil.rmtree(archive_dir)
+
+
+def test_reextract_keeps_newest():
+    """同一条目被多次归档时，保留抓取时间最新的版本"""
+    print("测试重新解析去重...")
+    archive_dir = tempfile.mkdtemp()
+    try:
+        url = 'https://movie.douban.com/subject/1292052/'
+        archive = PageArchive(archive_dir)
+        archive.write(url, detail_html('新标题'), fetched_at='2024-03-01 00:00:00')
+        archive.write(url, detail_html('旧标题'), fetched_at='2024-01-01 00:00:00')
+        # 另一个分段里还有一个更早的版本
+        archive = PageArchive(archive_dir)
+        archive.write(url, detail_html('最旧标题'), fetched_at='2023-01-01 00:00:00')
+
+        movies = reextract_archive(archive_dir, workers=2)
+        assert len(movies) == 1
+        assert movies[0]['title'] == '新标题'
+        assert movies[0]['crawl_time'] == '2024-03-01 00:00:00'
+        print("✓ 保留了最新版本")
+    finally:
+        shutil.rmtree(archive_dir)
+
+
+def main():
+    """主测试函数"""
+    print("详情页归档测试")
+    print("=" * 50)
+
+    test_write_and_iter_roundtrip()
+    test_torn_tail_ignored()
+    test_resume_after_torn_tail()
+    test_reextract_keeps_newest()
+
+    print("\n✓ 所有测试通过")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+详情页解析后端差异测试
+在仓库中的样例页面上对比 bs4、lxml 和 jsonld 三个后端的输出，要求完全一致
+"""
+
+import sys
+import os
+import time
+
+# 添加当前目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from douban_parsers import get_detail_parser
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 仓库中保存的真实页面
+FIXTURE_FILES = [
+    'douban_detail_debug.html',
+    'douban_debug.html',
+    'debug_raw.html',
+]
+
+# 覆盖边界情况的页面片段
+EDGE_CASES = [
+    '',
+    '<html><body><p>没有电影信息</p></body></html>',
+    '<h1> 标题 <span class="year">(2001)</span></h1><h1>第二个标题</h1>',
+    '<h1>\n    <span>名字</span>\n        <span class="year">(1994)</span>\n</h1>',
+    '<h1>\t<span>名字</span><!-- 注释 -->  \t<span>副标题</span>\xa0</h1>',
+    '<strong class="rating_num ll">8.0</strong><strong class="ll rating_num">9.1</strong>',
+    '<a class="x rating_people y"><span>123</span>人评价</a>',
+    '<a rel="nofollow v:directedBy">导演甲</a><a rel="v:directedBy">导演乙</a>',
+    ''.join(f'<a rel="v:starring">演员{i}</a>' for i in range(8)),
+    '<span property="v:genre">剧情</span><span property="v:genre"> 犯罪 </span>',
+    '<span property="v:summary">\n  第一段<br/>\n  第二段&nbsp;</span>',
+    '<img rel="v:image" src="https://img.example/p1.webp"><img rel="v:image" src="p2.webp">',
+    # ld+json不完整时，缺失字段由完整解析补齐
+    '<script type="application/ld+json">{"name": "无名", "genre": "剧情"}</script>'
+    '<h1><span>无名</span>\n<span class="year">(2020)</span></h1><span property="v:genre">剧情</span>',
+    '<script type="application/ld+json">{not json}</script><h1>坏数据</h1>',
+]
+
+
+def load_fixture(name):
+    with open(os.path.join(BASE_DIR, name), 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def test_fixture_pages_identical():
+    """样例页面上各后端输出一致"""
+    print("对比样例页面...")
+    bs4_parser = get_detail_parser('bs4')
+    parsers = [get_detail_parser('lxml'), get_detail_parser('jsonld')]
+
+    for name in FIXTURE_FILES:
+        html = load_fixture(name)
+        expected = bs4_parser.parse(html)
+        for parser in parsers:
+            actual = parser.parse(html)
+            assert list(actual.items()) == list(expected.items()), (parser.name, name)
+        print(f"✓ {name}: {len(expected)} 个字段一致")
+
+    detail = parsers[-1].parse(load_fixture('douban_detail_debug.html'))
+    assert detail['rating'] == '9.7'
+    assert detail['director'] == '弗兰克·德拉邦特'
+    assert len(detail['actors']) == 5
+
+
+def test_edge_cases_identical():
+    """边界情况下各后端输出一致"""
+    print("对比边界情况...")
+    bs4_parser = get_detail_parser('bs4')
+    parsers = [get_detail_parser('lxml'), get_detail_parser('jsonld')]
+
+    for html in EDGE_CASES:
+        expected = bs4_parser.parse(html)
+        for parser in parsers:
+            actual = parser.parse(html)
+            assert list(actual.items()) == list(expected.items()), (parser.name, html)
+    print(f"✓ {len(EDGE_CASES)} 个边界情况一致")
+
+
+def test_jsonld_fast_path():
+    """详情页应走快速路径，不需要构建完整DOM"""
+    print("测试ld+json快速路径...")
+    parser = get_detail_parser('jsonld')
+    parser.parse(load_fixture('douban_detail_debug.html'))
+    assert parser.stats == {'fast': 1, 'fallback': 0}
+    print("✓ 详情页命中快速路径")
+
+
+def benchmark(rounds=20):
+    """比较两个后端在详情页上的解析耗时"""
+    html = load_fixture('douban_detail_debug.html')
+    for name in ('bs4', 'lxml', 'jsonld'):
+        parser = get_detail_parser(name)
+        start = time.perf_counter()
+        for _ in range(rounds):
+            parser.parse(html)
+        elapsed = (time.perf_counter() - start) / rounds
+        print(f"   {name}: 每页 {elapsed * 1000:.1f} ms")
+
+
+def main():
+    """主测试函数"""
+    print("解析后端差异测试")
+    print("=" * 50)
+
+    test_fixture_pages_identical()
+    test_edge_cases_identical()
+    test_jsonld_fast_path()
+
+    print("\n解析耗时:")
+    benchmark()
+
+    print("\n✓ 所有测试通过")
+
+if __name__ == "__main__":
+    main()
@@ -4,7 +4,7 @@
 测试解析逻辑
 """
 
-import requests
+from douban_transport import get_transport
 from bs4 import BeautifulSoup
 
 def test_parsing():
@@ -18,7 +18,7 @@ def test_parsing():
     }
     
     try:
-        response = requests.get('https://movie.douban.com/top250', headers=headers, timeout=15)
+        response = get_transport().get('https://movie.douban.com/top250', headers=headers, timeout=15)
         response.raise_for_status()
         
         soup = BeautifulSoup(response.text, 'html.parser')
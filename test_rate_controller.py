@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试自适应限速控制器
+在本地启动一个模拟豆瓣的服务器，超过速率时返回429和Retry-After，
+检查控制器能否降速、遵守Retry-After并在恢复后重新提速
+"""
+
+import sys
+import os
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# 添加当前目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from douban_rate_controller import AdaptiveRateController, TokenBucket, parse_retry_after
+from douban_transport import DoubanTransport
+
+
+class ThrottlingHandler(BaseHTTPRequestHandler):
+    """每秒超过max_rate个请求时返回429"""
+
+    max_rate = 5
+    retry_after = 1
+    request_times = []
+    lock = threading.Lock()
+
+    def do_GET(self):
+        now = time.monotonic()
+        with self.lock:
+            recent = [t for t in self.request_times if now - t < 1.0]
+            recent.append(now)
+            ThrottlingHandler.request_times = recent
+            throttled = len(recent) > self.max_rate
+
+        if throttled:
+            self.send_response(429)
+            self.send_header('Retry-After', str(self.retry_after))
+            body = b'too many requests'
+        else:
+            self.send_response(200)
+            body = b'ok'
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server():
+    """启动本地模拟服务器，返回(server, url)"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ThrottlingHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/subject/1292052/"
+
+
+def test_token_bucket():
+    """测试令牌桶的预约等待时间"""
+    print("测试令牌桶...")
+    bucket = TokenBucket(rate=2.0, capacity=1.0)
+    now = bucket.updated
+
+    assert bucket.reserve(now) == 0.0
+    assert abs(bucket.reserve(now) - 0.5) < 1e-9
+    assert abs(bucket.reserve(now) - 1.0) < 1e-9
+
+    bucket.pause(3.0, now)
+    assert bucket.reserve(now) >= 3.0
+    print("✓ 令牌桶等待时间正确")
+
+
+def test_parse_retry_after():
+    """测试Retry-After解析"""
+    print("测试Retry-After解析...")
+    assert parse_retry_after('120') == 120.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after('not a date') is None
+    assert parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0.0
+    print("✓ Retry-After解析正确")
+
+
+def test_aimd_adjustment():
+    """测试加性增、乘性减"""
+    print("测试AIMD速率调整...")
+    controller = AdaptiveRateController(
+        budgets={'detail': {'rate': 1.0, 'min_rate': 0.1, 'max_rate': 1.2}},
+        increase_step=0.1, cooldown=0
+    )
+
+    for _ in range(5):
+        controller.record('detail', 0.1, 200)
+    assert abs(controller.get_rate('detail') - 1.2) < 1e-9
+
+    controller.record('detail', 0.1, 429)
+    assert abs(controller.get_rate('detail') - 0.6) < 1e-9
+
+    # 列表页预算不受详情页影响
+    assert controller.get_rate('listing') == controller.budgets['listing']['rate']
+
+    # 延迟过高也会降速
+    controller.record('detail', 10.0, 200)
+    assert controller.get_rate('detail') < 0.6
+    print("✓ 速率调整正确")
+
+
+def test_against_throttling_server():
+    """对本地限流服务器发起请求，检查控制器的反应"""
+    print("测试本地限流服务器...")
+    server, url = start_server()
+    transport = DoubanTransport()
+    controller = AdaptiveRateController(
+        budgets={'detail': {'rate': 20.0, 'min_rate': 1.0, 'max_rate': 20.0, 'capacity': 5.0}},
+        cooldown=0.5
+    )
+
+    statuses = []
+    pause_respected = True
+    throttled_at = None
+    try:
+        start = time.monotonic()
+        while time.monotonic() - start < 3.0:
+            controller.acquire('detail')
+            now = time.monotonic()
+            if throttled_at is not None and now - throttled_at < ThrottlingHandler.retry_after - 0.05:
+                pause_respected = False
+
+            response = transport.get(url, timeout=5)
+            statuses.append(response.status_code)
+            controller.record('detail', response.request_time, response.status_code,
+                              response.headers.get('Retry-After'))
+            if response.status_code == 429:
+                throttled_at = time.monotonic()
+    finally:
+        server.shutdown()
+        transport.close()
+
+    print(f"   共请求 {len(statuses)} 次，其中429 {statuses.count(429)} 次")
+    assert 429 in statuses
+    assert pause_respected
+    assert controller.get_rate('detail') < 20.0
+    # 降速后大部分请求应当成功
+    assert statuses.count(200) > statuses.count(429)
+    print("✓ 控制器能够响应限流并遵守Retry-After")
+
+
+def main():
+    """主测试函数"""
+    print("自适应限速控制器测试")
+    print("=" * 50)
+
+    test_token_bucket()
+    test_parse_retry_after()
+    test_aimd_adjustment()
+    test_against_throttling_server()
+
+    print("\n✓ 所有测试通过")
+
+if __name__ == "__main__":
+    main()
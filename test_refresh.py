@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试刷新模式（只在列表信息变化或记录过旧时重新抓取详情页）
+"""
+
+import sys
+import os
+import json
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+
+# 添加当前目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from douban_result_sink import JsonlResultSink
+from douban_subject_id import canonical_subject_url, extract_subject_id
+from douban_tag_cursor import TagCursorStore
+from offline_crawler import OfflineCrawler, detail_html
+
+NOW = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+OLD = (datetime.now() - timedelta(days=60)).strftime('%Y-%m-%d %H:%M:%S')
+
+# 已保存的记录：条目ID -> (标题, 评分, 爬取时间)
+STORED = {
+    1001: ('肖申克的救赎 The Shawshank Redemption', '9.7', NOW),  # 未变化
+    1002: ('霸王别姬', '9.6', NOW),                               # 列表评分变为9.5
+    1003: ('阿甘正传 Forrest Gump', '9.5', OLD),                  # 记录过旧
+    1004: ('泰坦尼克号 Titanic', '9.4', NOW),                     # 未变化
+}
+LISTING = [
+    {'url': "https://movie.douban.com/subject/1001/", 'title': '肖申克的救赎', 'rate': '9.7'},
+    {'url': "https://movie.douban.com/subject/1002/", 'title': '霸王别姬', 'rate': '9.5'},
+    {'url': "https://movie.douban.com/subject/1003/", 'title': '阿甘正传', 'rate': '9.5'},
+    {'url': "https://movie.douban.com/subject/1004/", 'title': '泰坦尼克号', 'rate': '9.4'},
+    {'url': "https://movie.douban.com/subject/1005/", 'title': '新电影', 'rate': '8.0'},
+]
+
+
+class RefreshCrawler(OfflineCrawler):
+    """标签只有一页；刷新后的详情页评分与列表页一致"""
+
+    def __init__(self, work_dir):
+        super().__init__()
+        self.tag_cursors = TagCursorStore(os.path.join(work_dir, 'tag_cursors.json'))
+
+    def tag_page(self, tag, start, sort):
+        return LISTING if start == 0 else []
+
+    def detail_page(self, subject_id):
+        rate = next(link['rate'] for link in LISTING if link['url'] == canonical_subject_url(subject_id))
+        return detail_html('刷新后', rating=rate)
+
+
+def test_refresh_only_changed_or_stale():
+    """只重新抓取评分变化和记录过旧的电影，导出时使用刷新后的记录"""
+    print("测试刷新模式...")
+    work_dir = tempfile.mkdtemp()
+    try:
+        sink_path = os.path.join(work_dir, 'movies.jsonl')
+        with JsonlResultSink(sink_path) as sink:
+            for subject_id, (title, rating, crawl_time) in STORED.items():
+                sink.write({'title': title, 'rating': rating, 'crawl_time': crawl_time,
+                            'douban_url': f"https://movie.douban.com/subject/{subject_id}/"})
+
+        crawler = RefreshCrawler(work_dir)
+        crawler.crawled_urls.update(STORED)
+        crawler.use_result_sink(sink_path)
+        crawler.use_refresh(max_age_days=30)
+        crawler.crawl_from_tag('热门', max_pages=5)
+        crawler.close_result_sink()
+
+        assert crawler.detail_requests == [
+            "https://movie.douban.com/subject/1002/",
+            "https://movie.douban.com/subject/1003/",
+            "https://movie.douban.com/subject/1005/",
+        ]
+        assert crawler.refresh_stats == {'changed': 1, 'stale': 1, 'unchanged': 2}
+
+        output = os.path.join(work_dir, 'movies.json')
+        assert crawler.result_sink.export_json(output) == 5
+        with open(output, 'r', encoding='utf-8') as f:
+            movies = json.load(f)
+        # 刷新后的记录替换旧记录，顺序不变
+        assert [movie['title'] for movie in movies] == [
+            '肖申克的救赎 The Shawshank Redemption', '刷新后', '刷新后', '泰坦尼克号 Titanic', '刷新后'
+        ]
+        assert movies[1]['rating'] == '9.5'
+        print(f"✓ 5部电影中只抓取了 {len(crawler.detail_requests)} 个详情页（含1部新电影）")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+class Top250RefreshCrawler(OfflineCrawler):
+    """Top250只有第一页（仓库中保存的真实页面）"""
+
+    def top250_page(self, start):
+        if start:
+            return ''
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'douban_debug.html'),
+                  'r', encoding='utf-8') as f:
+            return f.read()
+
+
+def test_top250_titles_unchanged():
+    """Top250列表页的标题包含多个译名，与详情页标题相同的电影不会被当作标题变化"""
+    print("测试Top250刷新...")
+    work_dir = tempfile.mkdtemp()
+    try:
+        stored = {
+            1292052: '肖申克的救赎 The Shawshank Redemption\n(1994)',
+            1291546: '霸王别姬\n(1993)',
+        }
+        sink_path = os.path.join(work_dir, 'movies.jsonl')
+        with JsonlResultSink(sink_path) as sink:
+            for subject_id, title in stored.items():
+                sink.write({'title': title, 'rating': '9.7', 'crawl_time': NOW,
+                            'douban_url': f"https://movie.douban.com/subject/{subject_id}/"})
+
+        crawler = Top250RefreshCrawler()
+        crawler.crawled_urls.update(stored)
+        crawler.use_result_sink(sink_path)
+        crawler.use_refresh(max_age_days=30)
+        crawler.crawl_from_top250()
+        crawler.close_result_sink()
+
+        assert crawler.refresh_stats == {'changed': 0, 'stale': 0, 'unchanged': 2}
+        assert not any(extract_subject_id(url) in stored for url in crawler.detail_requests)
+        assert len(crawler.detail_requests) == 23
+        print("✓ 已保存的Top250电影没有重新抓取")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def main():
+    """主测试函数"""
+    print("刷新模式测试")
+    print("=" * 50)
+
+    test_refresh_only_changed_or_stale()
+    test_top250_titles_unchanged()
+
+    print("\n✓ 所有测试通过")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试按变化可能性安排刷新
+"""
+
+import sys
+import os
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+
+# 添加当前目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from douban_refresh_scheduler import RefreshScheduler
+from douban_result_sink import JsonlResultSink
+from offline_crawler import OfflineCrawler, detail_html
+
+NOW = datetime.now()
+
+
+def _url(subject_id):
+    return f"https://movie.douban.com/subject/{subject_id}/"
+
+
+def _record(subject_id, votes, rating, days_ago, year=2000):
+    return {'douban_url': _url(subject_id), 'votes': f"{votes}人评价", 'rating': str(rating), 'year': str(year),
+            'crawl_time': (NOW - timedelta(days=days_ago)).strftime('%Y-%m-%d %H:%M:%S')}
+
+
+def _simulated_history():
+    """200部电影各爬取过两次：10部评价人数快速增长，10部评分在变化，其余基本不变
+
+    返回 (两次爬取记录, 现在实际已经变化的条目ID)
+    """
+    records = []
+    changed = set()
+    for subject_id in range(1000, 1200):
+        # 越早爬取的电影越先被轮流刷新，变化快的电影不在最前面
+        last_crawl = 10 + (1200 - subject_id) / 20
+        if subject_id % 20 == 7:
+            # 每天增长0.5%
+            votes = [100000, int(100000 * 1.05)]
+            ratings = [8.0, 8.0]
+            changed.add(subject_id)
+        elif subject_id % 20 == 13:
+            votes = [50000, 50010]
+            ratings = [7.0, 7.2]
+            changed.add(subject_id)
+        else:
+            votes = [200000, 200020]
+            ratings = [9.0, 9.0]
+        records.append(_record(subject_id, votes[0], ratings[0], last_crawl + 10))
+        records.append(_record(subject_id, votes[1], ratings[1], last_crawl))
+    return records, changed
+
+
+def test_change_likelihood_beats_round_robin():
+    """相同请求数下，按变化概率刷新发现的变化远多于按顺序轮流刷新"""
+    print("测试刷新效率...")
+    work_dir = tempfile.mkdtemp()
+    try:
+        records, changed = _simulated_history()
+        scheduler = RefreshScheduler(os.path.join(work_dir, 'history.db'))
+        scheduler.observe_all(records)
+        assert scheduler.count() == 200
+
+        budget = 20
+        plan = scheduler.plan(budget, now=NOW.timestamp())
+        assert len(plan) == budget
+        scheduled_hits = sum(item['subject_id'] in changed for item in plan)
+
+        # 轮流刷新：每次刷新最久没有爬取的电影，即条目ID最小的电影
+        round_robin_hits = sum(subject_id in changed for subject_id in range(1000, 1000 + budget))
+
+        assert scheduled_hits == budget
+        assert round_robin_hits <= 2
+        assert plan[0]['probability'] > 0.9 and plan[-1]['probability'] > 0.5
+        scheduler.close()
+        print(f"✓ {budget} 个刷新请求发现 {scheduled_hits} 部变化的电影，轮流刷新只发现 {round_robin_hits} 部")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def test_single_observation_uses_release_recency():
+    """只爬取过一次时，新上映的电影比评价人数相同的老电影更可能变化"""
+    print("测试只有一次记录的估计...")
+    work_dir = tempfile.mkdtemp()
+    try:
+        scheduler = RefreshScheduler(os.path.join(work_dir, 'history.db'))
+        scheduler.observe(_record(1, 20000, 7.5, days_ago=5, year=NOW.year))
+        scheduler.observe(_record(2, 20000, 7.5, days_ago=5, year=1995))
+        # 1970年以前上映的电影
+        scheduler.observe(_record(3, 20000, 7.5, days_ago=5, year=1931))
+        probabilities = {subject_id: probability
+                         for probability, subject_id, url in scheduler.iter_probabilities(NOW.timestamp())}
+        assert probabilities[1] > 10 * probabilities[2]
+        assert probabilities[2] > probabilities[3] > 0
+        scheduler.close()
+        print(f"✓ 新片变化概率 {probabilities[1]:.1%}，老片 {probabilities[2]:.2%}")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def test_daily_budget():
+    """每天的刷新请求数不超过预算，第二天重新计算"""
+    print("测试每日预算...")
+    work_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(work_dir, 'history.db')
+        scheduler = RefreshScheduler(path)
+        scheduler.observe_all(_simulated_history()[0])
+        now = NOW.timestamp()
+        for _ in range(15):
+            scheduler.record_refresh(now)
+        scheduler.close()
+
+        # 重新打开后仍记得今天已经使用的请求数
+        scheduler = RefreshScheduler(path)
+        assert len(scheduler.plan(20, now=now)) == 5
+        scheduler.record_refresh(now)
+        assert scheduler.remaining_budget(16, now) == 0
+        assert scheduler.plan(16, now=now) == []
+        assert len(scheduler.plan(20, now=now + 86400)) == 20
+        scheduler.close()
+        print("✓ 预算用完后不再安排刷新，第二天恢复")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+class ScheduledRefreshCrawler(OfflineCrawler):
+    """刷新时评价人数继续增长"""
+
+    def detail_page(self, subject_id):
+        return detail_html(f"电影{subject_id}", rating='8.0', votes=120000, year=2000)
+
+
+def test_crawler_refresh():
+    """爬虫根据已保存的结果初始化历史，在预算内强制重新抓取变化最快的电影"""
+    print("测试爬虫刷新...")
+    work_dir = tempfile.mkdtemp()
+    try:
+        records, changed = _simulated_history()
+        sink_path = os.path.join(work_dir, 'movies.jsonl')
+        with JsonlResultSink(sink_path) as sink:
+            for record in records:
+                sink.write(record)
+
+        crawler = ScheduledRefreshCrawler()
+        crawler.crawled_urls.update(range(1000, 1200))
+        crawler.use_result_sink(sink_path)
+        crawler.use_refresh_scheduler(os.path.join(work_dir, 'history.db'))
+        assert crawler.refresh_scheduler.count() == 200
+
+        movies = crawler.refresh_by_change_likelihood(daily_budget=5)
+        assert len(crawler.detail_requests) == 5
+        assert all(int(url.rstrip('/').split('/')[-1]) in changed for url in crawler.detail_requests)
+        assert crawler.result_sink.written == 5 and movies == []
+
+        # 预算用完后同一天不再发出请求
+        crawler.refresh_by_change_likelihood(daily_budget=5)
+        assert len(crawler.detail_requests) == 5
+        crawler.close_refresh_scheduler()
+        crawler.close_result_sink()
+        print("✓ 5个刷新请求都用在了变化的电影上")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def main():
+    """主测试函数"""
+    print("刷新计划测试")
+    print("=" * 50)
+
+    test_change_likelihood_beats_round_robin()
+    test_single_observation_uses_release_recency()
+    test_daily_budget()
+    test_crawler_refresh()
+
+    print("\n✓ 所有测试通过")
+
+if __name__ == "__main__":
+    main()
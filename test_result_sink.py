@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试流式JSONL结果输出
+"""
+
+import sys
+import os
+import json
+import shutil
+import tempfile
+import time
+
+# 添加当前目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from douban_result_sink import JsonlResultSink, convert_jsonl_to_json, iter_jsonl, list_parts
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_sample_movies():
+    with open(os.path.join(BASE_DIR, 'douban_movies.json'), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_convert_matches_json_dump():
+    """转换结果与原来的 json.dump(indent=2) 输出逐字节一致"""
+    print("测试JSON转换格式...")
+    movies = load_sample_movies()
+    work_dir = tempfile.mkdtemp()
+    try:
+        sink_path = os.path.join(work_dir, 'movies.jsonl')
+        with JsonlResultSink(sink_path) as sink:
+            for movie in movies + movies[:3]:
+                sink.write(movie)
+
+        output = os.path.join(work_dir, 'movies.json')
+        count = convert_jsonl_to_json(sink_path, output)
+
+        with open(output, 'r', encoding='utf-8') as f:
+            actual = f.read()
+        expected = json.dumps(movies, ensure_ascii=False, indent=2)
+        assert count == len(movies)
+        assert actual == expected
+
+        convert_jsonl_to_json(os.path.join(work_dir, 'empty.jsonl'), output)
+        with open(output, 'r', encoding='utf-8') as f:
+            assert f.read() == '[]'
+        print(f"✓ {count} 部电影转换后与原格式一致，重复记录已去除")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def test_rotation_and_truncated_line():
+    """按大小切换文件，中断时写了一半的行会被跳过"""
+    print("测试文件切换和中断恢复...")
+    movies = load_sample_movies()
+    work_dir = tempfile.mkdtemp()
+    try:
+        sink_path = os.path.join(work_dir, 'movies.jsonl')
+        sink = JsonlResultSink(sink_path, commit_every=5, max_file_size=4096)
+        for movie in movies:
+            sink.write(movie)
+        sink.close()
+
+        parts = list_parts(sink_path)
+        assert len(parts) > 1
+
+        # 模拟写到一半时进程被杀
+        with open(parts[-1], 'a', encoding='utf-8') as f:
+            f.write('{"title": "写了一半')
+
+        # 重新打开后接着最后一个分片写
+        with JsonlResultSink(sink_path, max_file_size=4096) as sink:
+            sink.write({'title': '新电影', 'douban_url': 'https://movie.douban.com/subject/1/'})
+
+        records = list(iter_jsonl(sink_path))
+        assert len(records) == len(movies) + 1
+        assert records[-1]['title'] == '新电影'
+        print(f"✓ 共 {len(parts)} 个分片，不完整记录已去除")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def test_timed_commit_without_new_writes():
+    """之后没有新记录（爬虫在休眠或退避）时，commit_interval 秒后仍会落盘"""
+    print("测试定时落盘...")
+    work_dir = tempfile.mkdtemp()
+    try:
+        sink_path = os.path.join(work_dir, 'movies.jsonl')
+        with JsonlResultSink(sink_path, commit_every=100, commit_interval=0.2) as sink:
+            sink.write({'title': '肖申克的救赎', 'douban_url': 'https://movie.douban.com/subject/1292052/'})
+            assert sink._pending == 1
+
+            time.sleep(0.6)
+            assert sink._pending == 0
+            records = list(iter_jsonl(sink_path))
+            assert [record['title'] for record in records] == ['肖申克的救赎']
+        print("✓ 没有新记录时由定时器落盘")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def main():
+    """主测试函数"""
+    print("流式结果输出测试")
+    print("=" * 50)
+
+    test_convert_matches_json_dump()
+    test_rotation_and_truncated_line()
+    test_timed_commit_without_new_writes()
+
+    print("\n✓ 所有测试通过")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试合并在途的重复详情页请求
+"""
+
+import sys
+import os
+import asyncio
+import threading
+import time
+
+# 添加当前目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from douban_movie_crawler_async import DoubanMovieCrawlerAsync
+from douban_single_flight import AsyncSingleFlight, SingleFlight
+from offline_crawler import OfflineCrawler
+
+URL = "https://movie.douban.com/subject/1292052/"
+OTHER_URL = "https://movie.douban.com/subject/1291546/"
+
+
+class ThreadedCrawler(OfflineCrawler):
+    """每个请求耗时50毫秒"""
+
+    def _request(self, url, kind, timeout, use_cache=True):
+        time.sleep(0.05)
+        return super()._request(url, kind, timeout, use_cache)
+
+
+class PipelineCrawler(DoubanMovieCrawlerAsync):
+    """抓取耗时20毫秒，统计抓取和解析次数"""
+
+    def __init__(self):
+        super().__init__(concurrency=4, max_rate=0, parse_workers=0)
+        self.fetches = []
+        self.parses = 0
+
+    async def _fetch_detail_page(self, movie_url, use_cache=True):
+        self.fetches.append(movie_url)
+        await asyncio.sleep(0.02)
+        return b'<html></html>', 'utf-8'
+
+    async def _parse_detail_page(self, movie_url, content, encoding):
+        self.parses += 1
+        return {'title': movie_url, 'douban_url': movie_url}
+
+
+def test_single_flight():
+    """同一key同时只执行一次，结束后可以再次执行"""
+    print("测试线程版本...")
+    flight = SingleFlight()
+    calls = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait()
+        return 'result'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do(1292052, slow))) for _ in range(8)]
+    threads[0].start()
+    started.wait()
+    for thread in threads[1:]:
+        thread.start()
+    while flight.coalesced < 7:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert sorted(results) == [('result', False)] + [('result', True)] * 7
+    assert flight.do(1292052, lambda: 'again') == ('again', False)
+    print("✓ 8个线程同时请求只执行1次")
+
+
+def test_crawler_threads():
+    """多个线程同时抓取同一部电影只发出一个请求，只有一个线程得到结果"""
+    print("测试多线程抓取详情页...")
+    crawler = ThreadedCrawler()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(crawler.get_movie_detail(URL))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert crawler.requests == [URL]
+    assert len([movie for movie in results if movie is not None]) == 1
+    assert URL in crawler.crawled_urls
+    print(f"✓ 8个线程只发出1个请求，合并了 {crawler.detail_flight.coalesced} 个重复请求")
+
+
+def test_async_pipeline():
+    """流水线中重复的链接和同时调用 get_movie_detail 都只抓取和解析一次"""
+    print("测试异步流水线...")
+    crawler = PipelineCrawler()
+
+    async def run():
+        links = [{'url': URL}, {'url': URL}, {'url': OTHER_URL}, {'url': URL}]
+        movies = await crawler._crawl_movie_links(links)
+        assert sorted(movie['douban_url'] for movie in movies) == sorted([URL, OTHER_URL])
+
+        third_url = "https://movie.douban.com/subject/1295644/"
+        results = await asyncio.gather(*(crawler.get_movie_detail(third_url, force=True) for _ in range(5)))
+        assert len([movie for movie in results if movie is not None]) == 1
+        return third_url
+
+    try:
+        third_url = asyncio.run(run())
+    finally:
+        crawler.close()
+    assert sorted(crawler.fetches) == sorted([URL, OTHER_URL, third_url])
+    assert crawler.parses == 3
+    assert crawler.detail_flight.coalesced == 6
+    print(f"✓ 9次抓取请求只发出3个，合并了 {crawler.detail_flight.coalesced} 个重复请求")
+
+
+def test_async_failure_releases_claim():
+    """发起调用的一方失败时，等待的一方得到None，之后可以重新领取"""
+    print("测试异步失败后释放...")
+
+    async def run():
+        flight = AsyncSingleFlight()
+
+        async def failing():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("请求失败")
+
+        async def leader():
+            try:
+                await flight.do('key', failing)
+            except RuntimeError:
+                return 'failed'
+
+        results = await asyncio.gather(leader(), flight.do('key', failing))
+        assert results == ['failed', (None, True)]
+        assert flight.claim('key')
+        flight.release('key')
+
+    asyncio.run(run())
+    print("✓ 失败后不会一直占用")
+
+
+def main():
+    """主测试函数"""
+    print("合并重复请求测试")
+    print("=" * 50)
+
+    test_single_flight()
+    test_crawler_threads()
+    test_async_pipeline()
+    test_async_failure_releases_claim()
+
+    print("\n✓ 所有测试通过")
+
+if __name__ == "__main__":
+    main()
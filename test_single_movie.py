@@ -4,7 +4,7 @@
 测试单个电影爬取
 """
 
-import requests
+from douban_transport import get_transport
 import json
 from bs4 import BeautifulSoup
 from datetime import datetime
@@ -24,7 +24,7 @@ def test_single_movie():
     
     try:
         print(f"正在请求: {test_url}")
-        response = requests.get(test_url, headers=headers, timeout=15)
+        response = get_transport().get(test_url, headers=headers, timeout=15)
         response.raise_for_status()
         
         print(f"响应状态码: {response.status_code}")
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试SQLite电影存储
+"""
+
+import sys
+import os
+import json
+import shutil
+import tempfile
+
+# 添加当前目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from douban_sqlite_store import SqliteMovieStore
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def test_import_and_upsert():
+    """导入已有JSON文件，同一条目重复写入时更新而不是新增"""
+    print("测试导入和更新...")
+    work_dir = tempfile.mkdtemp()
+    try:
+        db_path = os.path.join(work_dir, 'movies.db')
+        with SqliteMovieStore(db_path, batch_size=2) as store:
+            count = store.import_json(os.path.join(BASE_DIR, 'douban_movies.json'))
+            assert store.count() == count
+
+            movie = store.get(1292052)
+            assert movie['title'].startswith('肖申克的救赎')
+
+            updated = dict(movie, rating='9.8', genres=['剧情'])
+            store.write(updated)
+            assert store.count() == count
+            assert store.get(1292052)['rating'] == '9.8'
+            # 旧的类型关系已被替换
+            crime_urls = [m['douban_url'] for m in store.query(genre='犯罪', limit=1000)]
+            assert movie['douban_url'] not in crime_urls
+            assert movie['douban_url'] in [m['douban_url'] for m in store.query(genre='剧情', limit=1000)]
+            print(f"✓ 导入 {count} 部电影，重复写入按条目ID更新")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def test_query_and_export():
+    """按类型、年份、评分查询，导出格式与JSON数组一致"""
+    print("测试查询和导出...")
+    with open(os.path.join(BASE_DIR, 'douban_movies.json'), 'r', encoding='utf-8') as f:
+        movies = json.load(f)
+    work_dir = tempfile.mkdtemp()
+    try:
+        db_path = os.path.join(work_dir, 'movies.db')
+        store = SqliteMovieStore(db_path)
+        for movie in movies:
+            store.write(movie)
+
+        dramas = store.query(genre='剧情', min_rating=9.0)
+        assert dramas
+        assert all('剧情' in m['genres'] and float(m['rating']) >= 9.0 for m in dramas)
+        ratings = [float(m['rating']) for m in dramas]
+        assert ratings == sorted(ratings, reverse=True)
+
+        year = movies[0]['year']
+        assert all(m['year'] == year for m in store.query(year=int(year)))
+
+        # 关闭后仍可导出
+        store.close()
+        output = os.path.join(work_dir, 'movies.json')
+        assert store.export_json(output) == len(movies)
+        with open(output, 'r', encoding='utf-8') as f:
+            exported = json.load(f)
+        assert sorted(m['douban_url'] for m in exported) == sorted(m['douban_url'] for m in movies)
+        print(f"✓ 查询到 {len(dramas)} 部9分以上剧情片，导出 {len(exported)} 部")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def main():
+    """主测试函数"""
+    print("SQLite存储测试")
+    print("=" * 50)
+
+    test_import_and_upsert()
+    test_query_and_export()
+
+    print("\n✓ 所有测试通过")
+
+if __name__ == "__main__":
+    main()
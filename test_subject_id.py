@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试电影链接规范化（同一部电影的不同写法按条目ID去重）
+"""
+
+import sys
+import os
+import json
+import shutil
+import tempfile
+
+# 添加当前目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from douban_movie_crawler_unlimited import LEGACY_CRAWLED_URLS_FILE
+from douban_result_sink import JsonlResultSink, iter_unique_movies
+from douban_subject_id import canonical_subject_url, extract_subject_id, subject_key
+from offline_crawler import OfflineCrawler
+
+CANONICAL = "https://movie.douban.com/subject/1292052/"
+VARIANTS = [
+    "https://movie.douban.com/subject/1292052/",
+    "http://movie.douban.com/subject/1292052/",
+    "https://movie.douban.com/subject/1292052",
+    "https://movie.douban.com/subject/1292052/?from=showing",
+    "https://movie.douban.com/subject/1292052/comments?status=P",
+    "https://m.douban.com/movie/subject/1292052/",
+    "//movie.douban.com/subject/1292052/",
+]
+
+
+def test_canonical_subject_url():
+    """所有写法都规范为同一个条目ID和链接"""
+    print("测试链接规范化...")
+    assert {extract_subject_id(url) for url in VARIANTS} == {1292052}
+    assert {canonical_subject_url(url) for url in VARIANTS} == {CANONICAL}
+    assert canonical_subject_url(1292052) == CANONICAL
+    assert extract_subject_id("https://movie.douban.com/subject_search?search_text=1") is None
+    assert subject_key("https://movie.douban.com/top250") == "https://movie.douban.com/top250"
+    assert extract_subject_id("/subject/1292052/") == 1292052
+    # 读书、音乐等站点的条目ID是另一套编号，不改写为电影链接
+    for url in ("https://book.douban.com/subject/1292052/", "https://music.douban.com/subject/1292052/",
+                "https://m.douban.com/book/subject/1292052/", "https://www.douban.com/subject/1292052/"):
+        assert extract_subject_id(url) is None
+        assert canonical_subject_url(url) == url
+        assert subject_key(url) == url
+    print(f"✓ {len(VARIANTS)} 种写法都规范为 {CANONICAL}，其他豆瓣站点的链接保持原样")
+
+
+def test_crawler_dedupes_variants():
+    """发现链接时就规范化，同一部电影的不同写法只请求一次"""
+    print("测试爬虫去重...")
+    crawler = OfflineCrawler()
+    links = crawler.parse_tag_movies({'subjects': [{'url': url, 'title': '肖申克的救赎'} for url in VARIANTS]})
+    assert {link['url'] for link in links} == {CANONICAL}
+
+    movies = [crawler.get_movie_detail(url) for url in VARIANTS]
+    assert crawler.requests == [CANONICAL]
+    assert [movie['douban_url'] for movie in movies if movie] == [CANONICAL]
+
+    html = ''.join(f'<a href="{url}">肖申克的救赎</a>' for url in VARIANTS)
+    assert crawler.parse_top250_movies(html) == [{'url': CANONICAL, 'title': '肖申克的救赎'}]
+    print("✓ 7种写法只发出1个请求")
+
+
+def test_output_keys():
+    """导出时不同写法的记录按条目ID合并"""
+    print("测试导出去重...")
+    work_dir = tempfile.mkdtemp()
+    try:
+        records = [{'title': f"第{i}次", 'douban_url': url} for i, url in enumerate(VARIANTS)]
+        assert len(list(iter_unique_movies(records))) == 1
+
+        sink_path = os.path.join(work_dir, 'movies.jsonl')
+        with JsonlResultSink(sink_path) as sink:
+            for record in records:
+                sink.write(record)
+        movies = list(sink.iter_movies())
+        assert len(movies) == 1 and movies[0]['title'] == f"第{len(VARIANTS) - 1}次"
+        print("✓ 导出结果中只保留1条记录（最后写入的一条）")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def test_legacy_migration():
+    """旧版本的URL列表迁移时按条目ID合并"""
+    print("测试旧记录迁移...")
+    work_dir = tempfile.mkdtemp()
+    cwd = os.getcwd()
+    try:
+        os.chdir(work_dir)
+        with open(LEGACY_CRAWLED_URLS_FILE, 'w', encoding='utf-8') as f:
+            json.dump(VARIANTS + ["http://movie.douban.com/subject/1291546"], f)
+
+        crawler = OfflineCrawler()
+        crawler.load_crawled_urls()
+        assert len(crawler.crawled_urls) == 2
+        assert crawler.get_movie_detail("https://m.douban.com/movie/subject/1291546/?from=home") is None
+        assert crawler.requests == []
+        crawler.crawled_urls.close()
+
+        # 迁移只进行一次
+        crawler = OfflineCrawler()
+        crawler.load_crawled_urls()
+        assert sorted(crawler.crawled_urls) == [1291546, 1292052]
+        crawler.crawled_urls.close()
+        print("✓ 8个旧URL合并为2部电影")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(work_dir)
+
+
+def main():
+    """主测试函数"""
+    print("链接规范化测试")
+    print("=" * 50)
+
+    test_canonical_subject_url()
+    test_crawler_dedupes_variants()
+    test_output_keys()
+    test_legacy_migration()
+
+    print("\n✓ 所有测试通过")
+
+if __name__ == "__main__":
+    main()
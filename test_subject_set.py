@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试已爬取条目ID集合
+"""
+
+import sys
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+
+# 添加当前目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from douban_subject_set import MAX_SUBJECT_ID, SubjectIdSet
+
+
+def test_log_replay_and_compaction():
+    """未压缩的日志在重启后回放，压缩后写入位图"""
+    print("测试日志回放和压缩...")
+    work_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(work_dir, 'subjects.bitmap')
+        subjects = SubjectIdSet(path)
+        subjects.update([1292052, "https://movie.douban.com/subject/1291546/", 1292052])
+        subjects.flush()
+        assert len(subjects) == 2
+
+        # 模拟中断：不压缩，日志末尾还有半个ID
+        with open(path + '.log', 'ab') as f:
+            f.write(b'\x01\x02')
+        reopened = SubjectIdSet(path)
+        assert len(reopened) == 2
+        assert "https://movie.douban.com/subject/1292052/" in reopened
+        assert 1292720 not in reopened
+
+        reopened.add(35000000)
+        reopened.compact()
+        assert os.path.getsize(path + '.log') == 0
+        reopened.close()
+
+        final = SubjectIdSet(path)
+        assert sorted(final) == [1291546, 1292052, 35000000]
+        assert len(final) == 3
+        final.close()
+        print("✓ 重启后记录完整，压缩后日志已清空")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def test_automatic_compaction():
+    """日志累积到阈值时自动合并进位图"""
+    print("测试自动压缩...")
+    work_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(work_dir, 'subjects.bitmap')
+        ids = random.Random(1).sample(range(1000000, 36000000), 2500)
+        subjects = SubjectIdSet(path, compact_every=1000)
+        subjects.update(ids)
+        subjects.flush()
+        assert os.path.getsize(path + '.log') == 500 * 4
+        subjects.close()
+
+        reopened = SubjectIdSet(path)
+        assert len(reopened) == len(ids)
+        assert all(subject_id in reopened for subject_id in ids)
+        assert list(reopened) == sorted(ids)
+        reopened.close()
+        print(f"✓ {len(ids)} 个ID自动压缩后完整保留")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def test_header_and_iteration():
+    """压缩后的位图带文件头，重启时直接读出数量；稀疏和连续的ID都能按顺序遍历"""
+    print("测试文件头和遍历...")
+    work_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(work_dir, 'subjects.bitmap')
+        ids = [0, 7, 63, 64, 65] + list(range(1000, 1200)) + [35000001]
+        subjects = SubjectIdSet(path)
+        subjects.update(reversed(ids))
+        subjects.close()
+        with open(path, 'rb') as f:
+            assert f.read(8) == b'DBSUBJ1\n'
+
+        reopened = SubjectIdSet(path)
+        assert len(reopened) == len(ids)
+        assert list(reopened) == ids
+        reopened.add(66)
+        assert list(reopened) == sorted(ids + [66])
+
+        # 无法识别条目ID的链接排在最后，遍历结果与长度一致
+        reopened.add("https://movie.douban.com/subject_search?search_text=1")
+        assert len(list(reopened)) == len(reopened) == len(ids) + 2
+        assert list(reopened)[-1] == "https://movie.douban.com/subject_search?search_text=1"
+
+        # 超出日志格式范围的ID直接拒绝，不写入半条记录
+        try:
+            reopened.add(MAX_SUBJECT_ID + 1)
+            assert False, "超出范围的ID应被拒绝"
+        except ValueError as e:
+            assert str(MAX_SUBJECT_ID) in str(e)
+        assert MAX_SUBJECT_ID + 1 not in reopened
+        reopened.flush()
+        assert os.path.getsize(path + '.log') % 4 == 0
+        reopened.close()
+
+        # 只保存在内存中的集合不受限制
+        in_memory = SubjectIdSet()
+        in_memory.add(MAX_SUBJECT_ID + 1)
+        assert list(in_memory) == [MAX_SUBJECT_ID + 1]
+        print("✓ 文件头数量正确，遍历结果有序，超出范围的ID被拒绝")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def test_lookup_during_compaction():
+    """压缩替换位图期间的查询不会报错，也不会漏掉已有的ID"""
+    print("测试压缩期间查询...")
+    work_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(work_dir, 'subjects.bitmap')
+        subjects = SubjectIdSet(path, compact_every=50)
+        subjects.add(1292052)
+        errors = []
+        done = threading.Event()
+
+        def lookup():
+            try:
+                while not done.is_set():
+                    if 1292052 not in subjects:
+                        errors.append('missing')
+            except Exception as e:
+                errors.append(e)
+
+        reader = threading.Thread(target=lookup)
+        reader.start()
+        subjects.update(range(2000000, 2002000))
+        done.set()
+        reader.join()
+        subjects.close()
+        assert not errors, errors[:3]
+        print("✓ 压缩期间查询正常")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def test_large_set_startup():
+    """一千万个ID时的启动和查询耗时"""
+    print("测试大规模集合...")
+    work_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(work_dir, 'subjects.bitmap')
+        # 直接写出一个包含一千万个ID的位图文件
+        with open(path, 'wb') as f:
+            f.write(b'\xff' * (10000000 // 8))
+
+        start = time.perf_counter()
+        subjects = SubjectIdSet(path)
+        load_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        hits = sum(1 for subject_id in range(9990000, 10010000) if subject_id in subjects)
+        lookup_time = (time.perf_counter() - start) / 20000
+
+        start = time.perf_counter()
+        total = sum(1 for _ in subjects)
+        iter_time = time.perf_counter() - start
+
+        assert len(subjects) == 10000000
+        assert hits == 10000
+        assert total == 10000000
+        subjects.close()
+        print(f"✓ 位图文件 {os.path.getsize(path) // 1024} KB，"
+              f"启动 {load_time * 1000:.1f}ms，单次查询 {lookup_time * 1e6:.2f}μs，"
+              f"遍历 {iter_time:.2f}s")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def main():
+    """主测试函数"""
+    print("已爬取集合测试")
+    print("=" * 50)
+
+    test_log_replay_and_compaction()
+    test_automatic_compaction()
+    test_header_and_iteration()
+    test_lookup_during_compaction()
+    test_large_set_startup()
+
+    print("\n✓ 所有测试通过")
+
+if __name__ == "__main__":
+    main()
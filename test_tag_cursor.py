@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试标签翻页进度和断点续爬
+"""
+
+import sys
+import os
+import shutil
+import tempfile
+
+# 添加当前目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from douban_tag_cursor import TagCursorStore
+from offline_crawler import OfflineCrawler
+
+
+class TagCursorCrawler(OfflineCrawler):
+    """标签共3页，每页2部电影；可以在请求某一页时中断"""
+
+    def __init__(self, cursor_path, fail_at_start=None, failing_subjects=(), broken_links=()):
+        super().__init__()
+        self.tag_cursors = TagCursorStore(cursor_path)
+        self.fail_at_start = fail_at_start
+        self.failing_subjects.update(failing_subjects)
+        # 每页额外附带的没有条目ID的链接
+        self.broken_links = broken_links
+
+    def tag_page(self, tag, start, sort):
+        if start == self.fail_at_start:
+            raise KeyboardInterrupt
+        if start >= 60:
+            return []
+        links = [{'url': f"https://movie.douban.com/subject/{1000 + start + i}/", 'title': f"电影{start + i}"}
+                 for i in range(2)]
+        return links + [{'url': url, 'title': '无法识别'} for url in self.broken_links]
+
+
+def test_resume_skips_finished_pages():
+    """中断后继续时不再请求已完成的列表页"""
+    print("测试断点续爬...")
+    work_dir = tempfile.mkdtemp()
+    try:
+        cursor_path = os.path.join(work_dir, 'tag_cursors.json')
+
+        first = TagCursorCrawler(cursor_path, fail_at_start=40)
+        try:
+            first.crawl_from_tag('热门', max_pages=10)
+            assert False, "应该被中断"
+        except KeyboardInterrupt:
+            pass
+        assert [start for _, start in first.listing_requests] == [0, 20, 40]
+        assert TagCursorStore(cursor_path).get('热门')['next_start'] == 40
+        assert not os.path.exists(cursor_path + '.tmp')
+
+        second = TagCursorCrawler(cursor_path)
+        second.crawled_urls = first.crawled_urls
+        movies = second.crawl_from_tag('热门', max_pages=10, resume=True)
+        assert [start for _, start in second.listing_requests] == [40, 60]
+        assert len(movies) == 2
+        assert TagCursorStore(cursor_path).get('热门')['exhausted']
+
+        # 已经爬完的标签不再发出任何列表请求
+        third = TagCursorCrawler(cursor_path)
+        assert third.crawl_from_tag('热门', max_pages=10, resume=True) == []
+        assert third.listing_requests == []
+
+        # 不同排序方式分别记录进度
+        assert third.tag_cursors.get('热门', 'time') is None
+        print("✓ 继续爬取时跳过已完成的列表页，爬完的标签不再请求")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def test_failed_details_hold_cursor():
+    """有详情抓取失败的页不推进翻页进度，继续爬取时重试这些电影"""
+    print("测试失败页重试...")
+    work_dir = tempfile.mkdtemp()
+    try:
+        cursor_path = os.path.join(work_dir, 'tag_cursors.json')
+        failing_url = "https://movie.douban.com/subject/1021/"
+
+        first = TagCursorCrawler(cursor_path, failing_subjects=[1021])
+        assert len(first.crawl_from_tag('热门', max_pages=10)) == 5
+        cursor = TagCursorStore(cursor_path).get('热门')
+        assert cursor['next_start'] == 20
+        assert not cursor['exhausted']
+
+        second = TagCursorCrawler(cursor_path)
+        second.crawled_urls = first.crawled_urls
+        movies = second.crawl_from_tag('热门', max_pages=10, resume=True)
+        assert [start for _, start in second.listing_requests] == [20, 40, 60]
+        assert [movie['douban_url'] for movie in movies] == [failing_url]
+        assert TagCursorStore(cursor_path).get('热门')['exhausted']
+        print("✓ 失败的电影在继续爬取时重新抓取")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def test_links_without_subject_id_do_not_hold_cursor():
+    """没有链接或链接中没有条目ID的条目不算抓取失败，翻页进度照常推进"""
+    print("测试无法识别的链接...")
+    work_dir = tempfile.mkdtemp()
+    try:
+        cursor_path = os.path.join(work_dir, 'tag_cursors.json')
+        crawler = TagCursorCrawler(cursor_path, broken_links=['', "https://movie.douban.com/subject_search?search_text=1"])
+        assert len(crawler.crawl_from_tag('热门', max_pages=10)) == 6
+        cursor = TagCursorStore(cursor_path).get('热门')
+        assert cursor['next_start'] == 60
+        assert cursor['exhausted']
+        print("✓ 无法识别的链接不会停住翻页进度")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def main():
+    """主测试函数"""
+    print("标签翻页进度测试")
+    print("=" * 50)
+
+    test_resume_skips_finished_pages()
+    test_failed_details_hold_cursor()
+    test_links_without_subject_id_do_not_hold_cursor()
+
+    print("\n✓ 所有测试通过")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试任务队列中各标签按新电影比例交替爬取
+"""
+
+import sys
+import os
+import shutil
+import tempfile
+
+# 添加当前目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from offline_crawler import OfflineCrawler
+
+# 前3个标签每页18部是同一批电影，只有2部新电影；后3个标签每页20部都是新电影
+SATURATED_TAGS = ['剧情', '经典', '喜剧']
+RICH_TAGS = ['科幻', '动画', '纪录片']
+PAGES = 10
+BUDGET = 20
+
+
+def _page(tag, page):
+    tag_index = (SATURATED_TAGS + RICH_TAGS).index(tag)
+    if tag in SATURATED_TAGS:
+        ids = list(range(18)) + [10000 + tag_index * 1000 + page * 2 + i for i in range(2)]
+    else:
+        ids = [10000 + tag_index * 1000 + page * 20 + i for i in range(20)]
+    return [{'url': f"https://movie.douban.com/subject/{subject_id}/", 'title': str(subject_id)} for subject_id in ids]
+
+
+def _unique_within_budget(requests):
+    seen = set()
+    for tag, page in requests[:BUDGET]:
+        seen.update(link['url'] for link in _page(tag, page))
+    return len(seen)
+
+
+class TagCrawler(OfflineCrawler):
+    """六个标签各有 PAGES 页"""
+
+    def __init__(self):
+        super().__init__()
+        self.popular_tags = SATURATED_TAGS + RICH_TAGS
+
+    def tag_page(self, tag, start, sort):
+        page = start // 20
+        return _page(tag, page) if page < PAGES else []
+
+
+def test_novelty_weighted_interleaving():
+    """先爬完每个标签的第一页，之后新电影比例高的标签先翻页"""
+    print("测试按新电影比例交替爬取标签...")
+    work_dir = tempfile.mkdtemp()
+    try:
+        crawler = TagCrawler()
+        crawler.use_frontier(os.path.join(work_dir, 'frontier.db'))
+        crawler.crawl_all_movies(max_tags=None)
+        crawler.close_frontier()
+
+        requests = [(tag, start // 20) for tag, start in crawler.listing_requests]
+        # 每个标签的第一页最先请求，尽早覆盖所有类型
+        assert sorted(requests[:6]) == sorted((tag, 0) for tag in crawler.popular_tags)
+        # 新电影多的标签翻页更多
+        budget_tags = [tag for tag, _ in requests[:BUDGET]]
+        assert all(budget_tags.count(tag) > budget_tags.count(other)
+                   for tag in RICH_TAGS for other in SATURATED_TAGS)
+        # 所有页最终都会爬到
+        assert len(requests) == len(crawler.popular_tags) * (PAGES + 1)
+
+        # 对比逐个标签爬完再换下一个
+        sequential = [(tag, page) for tag in crawler.popular_tags for page in range(PAGES)]
+        scheduled_unique = _unique_within_budget(requests)
+        sequential_unique = _unique_within_budget(sequential)
+        assert scheduled_unique > 3 * sequential_unique
+        print(f"✓ 前 {BUDGET} 个列表请求发现 {scheduled_unique} 部电影，逐个标签爬取只有 {sequential_unique} 部")
+
+        crawler.print_tag_yields(limit=3)
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def main():
+    """主测试函数"""
+    print("标签调度测试")
+    print("=" * 50)
+
+    test_novelty_weighted_interleaving()
+
+    print("\n✓ 所有测试通过")
+
+if __name__ == "__main__":
+    main()
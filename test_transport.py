@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试共享传输层的长连接复用和请求头处理
+"""
+
+import sys
+import os
+import socket
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# 添加当前目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from douban_transport import DoubanTransport
+
+
+class EchoHandler(BaseHTTPRequestHandler):
+    """记录每个请求的客户端端口和请求头；HTTP/1.1，连接保持打开"""
+
+    protocol_version = 'HTTP/1.1'
+    requests = []
+
+    def do_GET(self):
+        EchoHandler.requests.append((self.client_address[1], dict(self.headers)))
+        status = 404 if self.path.startswith('/missing') else 200
+        body = b'ok'
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server():
+    EchoHandler.requests = []
+    server = ThreadingHTTPServer(('127.0.0.1', 0), EchoHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def test_connection_reuse():
+    """连续的请求复用同一个TCP连接，并且不修改进程全局的DNS解析"""
+    print("测试长连接复用...")
+    original_getaddrinfo = socket.getaddrinfo
+    server, base_url = start_server()
+    transport = DoubanTransport()
+    try:
+        for i in range(5):
+            response = transport.get(f"{base_url}/subject/{i}/", timeout=5)
+            assert response.status_code == 200
+            assert response.request_time > 0
+    finally:
+        transport.close()
+        server.shutdown()
+
+    ports = {port for port, _ in EchoHandler.requests}
+    assert len(EchoHandler.requests) == 5 and len(ports) == 1
+    assert socket.getaddrinfo is original_getaddrinfo
+    print("✓ 5个请求使用同一个连接")
+
+
+def test_headers_and_stats():
+    """每次请求的请求头只用于这一次，统计中记录失败的请求"""
+    print("测试请求头和统计...")
+    server, base_url = start_server()
+    transport = DoubanTransport()
+    try:
+        transport.get(f"{base_url}/subject/1/", headers={'User-Agent': 'douban-test', 'X-Trace': '1'}, timeout=5)
+        transport.get(f"{base_url}/subject/2/", timeout=5)
+        missing = transport.get(f"{base_url}/missing/", timeout=5)
+    finally:
+        transport.close()
+        server.shutdown()
+
+    first, second, _ = [headers for _, headers in EchoHandler.requests]
+    assert first['User-Agent'] == 'douban-test' and first['X-Trace'] == '1'
+    assert first['Connection'] == 'keep-alive' and second['Connection'] == 'keep-alive'
+    assert second['User-Agent'] != 'douban-test' and 'X-Trace' not in second
+    assert missing.status_code == 404
+
+    stats = transport.get_stats()
+    assert stats['requests'] == 3 and stats['errors'] == 1
+    assert stats['bytes'] == 6
+    print(f"✓ 请求头正确，统计: {stats['requests']} 个请求，{stats['errors']} 个失败")
+
+
+def main():
+    """主测试函数"""
+    print("传输层测试")
+    print("=" * 50)
+
+    test_connection_reuse()
+    test_headers_and_stats()
+
+    print("\n✓ 所有测试通过")
+
+if __name__ == "__main__":
+    main()